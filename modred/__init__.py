@@ -37,12 +37,16 @@ from .ltigalerkinproj import (
     compute_derivs_handles, compute_derivs_arrays, standard_basis
 )
 
-from .vectorspace import VectorSpaceHandles, VectorSpaceArrays
+from .vectorspace import (
+    VectorSpaceHandles, VectorSpaceArrays, VecCache, InnerProductArrayStore,
+    PerfStats, Tracer)
 
 from .vectors import (
-    Vector, VecHandle,
-    VecHandlePickle, VecHandleInMemory, VecHandleArrayText,
-    InnerProductTrapz, inner_product_array_uniform
+    Vector, VecHandle, BaseVecCache,
+    VecHandlePickle, VecHandleInMemory, VecHandleArrayText, VecHandleArrayNpy,
+    VecHandleCompressed, SnapshotStore, VecHandleSnapshot,
+    InnerProductTrapz, inner_product_array_uniform,
+    inner_product_block_array_uniform
 )
 
 from . import parallel
@@ -166,6 +166,30 @@ class BPODHandles(object):
 
         ``verbosity``: 1 prints progress and warnings, 0 prints almost nothing.
 
+        ``vec_cache``: A :py:class:`vectorspace.VecCache`, or the maximum
+        number of bytes of a new one, that keeps retrieved vector objects in
+        memory, so that they are not retrieved again in later stages, e.g.,
+        when computing the modes.
+
+        ``IP_array_store``: A :py:class:`vectorspace.InnerProductArrayStore`,
+        or the path of the directory of a new one, in which the inner product
+        arrays are saved, so that computing the decomposition again for
+        unchanged vecs loads them instead.
+
+        ``tracer``: A :py:class:`vectorspace.Tracer` in which the work done by
+        each stage is recorded as timestamped spans.
+
+        ``inner_product_block``: Function that computes the inner products of
+        a list of row vector objects with a list of column vector objects,
+        returning a 2D array, passed to
+        :py:class:`vectorspace.VectorSpaceHandles`.  See
+        :py:func:`vectors.inner_product_block_array_uniform`.
+
+        ``prefetch``, ``write_behind``, ``backend``, ``max_bytes_per_node``:
+        Passed to :py:class:`vectorspace.VectorSpaceHandles`, to retrieve the
+        vectors and put the modes while computing, to use the cores of each
+        MPI worker, and to bound the memory used in bytes.
+
     Computes direct and adjoint BPOD modes from direct and adjoint vector
     objects (or handles).  Uses :py:class:`vectorspace.VectorSpaceHandles` for
     low level functions.
@@ -181,7 +205,10 @@ class BPODHandles(object):
     """
     def __init__(
         self, inner_product, put_array=util.save_array_text,
-        get_array=util.load_array_text,max_vecs_per_node=None, verbosity=1):
+        get_array=util.load_array_text,max_vecs_per_node=None, verbosity=1,
+        vec_cache=None, IP_array_store=None, tracer=None, prefetch=False,
+        write_behind=0, backend=None, max_bytes_per_node=None,
+        inner_product_block=None):
         """Constructor """
         self.get_array = get_array
         self.put_array = put_array
@@ -193,7 +220,11 @@ class BPODHandles(object):
         # Class that contains all of the low-level vec operations
         self.vec_space = VectorSpaceHandles(
             inner_product=inner_product, max_vecs_per_node=max_vecs_per_node,
-            verbosity=verbosity)
+            verbosity=verbosity, vec_cache=vec_cache,
+            IP_array_store=IP_array_store, tracer=tracer, prefetch=prefetch,
+            write_behind=write_behind, backend=backend,
+            max_bytes_per_node=max_bytes_per_node,
+            inner_product_block=inner_product_block)
         self.direct_vec_handles = None
         self.adjoint_vec_handles = None
 
@@ -329,9 +360,10 @@ class BPODHandles(object):
           my_BPOD.compute_direct_modes(
               range(10), mode_handles, direct_vec_handles=direct_vec_handles)
         """
-        self.L_sing_vecs, self.sing_vals, self.R_sing_vecs =\
-            parallel.call_and_bcast(
-            util.svd, self.Hankel_array, atol=atol, rtol=rtol)
+        with self.vec_space.trace_span('SVD'):
+            self.L_sing_vecs, self.sing_vals, self.R_sing_vecs =\
+                parallel.call_and_bcast(
+                util.svd, self.Hankel_array, atol=atol, rtol=rtol)
 
 
     def sanity_check(self, test_vec_handle):
@@ -387,15 +419,16 @@ class BPODHandles(object):
         self.direct_vec_handles = direct_vec_handles
         self.adjoint_vec_handles = adjoint_vec_handles
 
-        # Compute first column (of chunks) of Hankel array
-        all_adjoint_first_direct = np.array(
-            self.vec_space.compute_inner_product_array(
-            self.adjoint_vec_handles, self.direct_vec_handles[:num_inputs]))
-
-        # Compute last row (of chunks) of Hankel array
-        last_adjoint_all_direct = np.array(
-            self.vec_space.compute_inner_product_array(
-            self.adjoint_vec_handles[-num_outputs:], self.direct_vec_handles))
+        # Compute first column and last row (of chunks) of Hankel array.  They
+        # are computed together if that retrieves fewer vecs, e.g., because
+        # the last adjoint vecs are rows of both.
+        all_adjoint_first_direct, last_adjoint_all_direct = [
+            np.array(IP_array) for IP_array in
+            self.vec_space.compute_inner_product_arrays([
+                (self.adjoint_vec_handles,
+                    self.direct_vec_handles[:num_inputs]),
+                (self.adjoint_vec_handles[-num_outputs:],
+                    self.direct_vec_handles)])]
 
         # Convert arrays of inner products into lists of array chunks
         all_adjoint_first_direct_list = [
@@ -500,6 +500,30 @@ class DMDHandles(object):
 
         ``verbosity``: 1 prints progress and warnings, 0 prints almost nothing.
 
+        ``vec_cache``: A :py:class:`vectorspace.VecCache`, or the maximum
+        number of bytes of a new one, that keeps retrieved vector objects in
+        memory, so that they are not retrieved again in later stages, e.g.,
+        when computing the modes.
+
+        ``IP_array_store``: A :py:class:`vectorspace.InnerProductArrayStore`,
+        or the path of the directory of a new one, in which the inner product
+        arrays are saved, so that computing the decomposition again for
+        unchanged vecs loads them instead.
+
+        ``tracer``: A :py:class:`vectorspace.Tracer` in which the work done by
+        each stage is recorded as timestamped spans.
+
+        ``inner_product_block``: Function that computes the inner products of
+        a list of row vector objects with a list of column vector objects,
+        returning a 2D array, passed to
+        :py:class:`vectorspace.VectorSpaceHandles`.  See
+        :py:func:`vectors.inner_product_block_array_uniform`.
+
+        ``prefetch``, ``write_behind``, ``backend``, ``max_bytes_per_node``:
+        Passed to :py:class:`vectorspace.VectorSpaceHandles`, to retrieve the
+        vectors and put the modes while computing, to use the cores of each
+        MPI worker, and to bound the memory used in bytes.
+
     Computes DMD modes from vector objects (or handles).  It uses
     :py:class:`vectorspace.VectorSpaceHandles` for low level functions.
 
@@ -514,7 +538,10 @@ class DMDHandles(object):
     """
     def __init__(
         self, inner_product, get_array=util.load_array_text,
-        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1):
+        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1,
+        vec_cache=None, IP_array_store=None, tracer=None, prefetch=False,
+        write_behind=0, backend=None, max_bytes_per_node=None,
+        inner_product_block=None):
         """Constructor"""
         self.get_array = get_array
         self.put_array = put_array
@@ -532,7 +559,11 @@ class DMDHandles(object):
         self.adv_proj_coeffs = None
         self.vec_space = VectorSpaceHandles(
             inner_product=inner_product, max_vecs_per_node=max_vecs_per_node,
-            verbosity=verbosity)
+            verbosity=verbosity, vec_cache=vec_cache,
+            IP_array_store=IP_array_store, tracer=tracer, prefetch=prefetch,
+            write_behind=write_behind, backend=backend,
+            max_bytes_per_node=max_bytes_per_node,
+            inner_product_block=inner_product_block)
         self.vec_handles = None
         self.adv_vec_handles = None
 
@@ -782,10 +813,11 @@ class DMDHandles(object):
         you may want to call a ``put`` method to save those results somehow.
         """
         # Compute eigendecomposition of correlation array
-        self.correlation_array_eigvals, self.correlation_array_eigvecs =\
-            parallel.call_and_bcast(
-            util.eigh, self.correlation_array, atol=atol, rtol=None,
-            is_positive_definite=True)
+        with self.vec_space.trace_span('eigensolve'):
+            self.correlation_array_eigvals, self.correlation_array_eigvecs =\
+                parallel.call_and_bcast(
+                util.eigh, self.correlation_array, atol=atol, rtol=None,
+                is_positive_definite=True)
 
         # Truncate if necessary
         if max_num_eigvals is not None and (
@@ -795,25 +827,29 @@ class DMDHandles(object):
             self.correlation_array_eigvecs = self.correlation_array_eigvecs[
                 :, :max_num_eigvals]
 
-        # Compute low-order linear map
+        # Compute low-order linear map.  The product with the
+        # cross-correlation array is computed on rank zero, since the
+        # cross-correlation array may only be stored there.
         correlation_array_eigvals_sqrt_inv = np.diag(
             self.correlation_array_eigvals ** -0.5)
         self.low_order_linear_map = correlation_array_eigvals_sqrt_inv.dot(
             self.correlation_array_eigvecs.conj().T.dot(
-                self.cross_correlation_array.dot(
+                parallel.call_and_bcast(
+                    np.dot, self.cross_correlation_array,
                     self.correlation_array_eigvecs.dot(
                         correlation_array_eigvals_sqrt_inv))))
 
         # Compute eigendecomposition of low-order linear map
-        self.eigvals, self.R_low_order_eigvecs, self.L_low_order_eigvecs =\
-            parallel.call_and_bcast(
+        with self.vec_space.trace_span('eigensolve'):
+            (self.eigvals, self.R_low_order_eigvecs,
+            self.L_low_order_eigvecs) = parallel.call_and_bcast(
                 util.eig_biorthog, self.low_order_linear_map,
                 **{'scale_choice':'left'})
 
 
     def compute_decomp(
         self, vec_handles, adv_vec_handles=None, atol=1e-13, rtol=None,
-        max_num_eigvals=None):
+        max_num_eigvals=None, root_only=False):
         """Computes eigendecomposition of low-order linear map approximating
         relationship between vector objects, returning various arrays
         necessary for computing and characterizing DMD modes.
@@ -840,6 +876,11 @@ class DMDHandles(object):
             array. If set to None, no truncation will be performed, and the
             maximum possible number of DMD eigenvalues will be computed.
 
+            ``root_only``: If True, the correlation and cross-correlation
+            arrays are only assembled on rank zero, where the
+            eigendecompositions are computed, and they are ``None`` on the
+            other MPI workers.  This saves memory for large numbers of vectors.
+
         Returns:
             ``eigvals``: 1D array of eigenvalues of low-order linear map, i.e.,
             the DMD eigenvalues.
@@ -873,20 +914,26 @@ class DMDHandles(object):
         if adv_vec_handles is None:
             self.expanded_correlation_array =\
                 self.vec_space.compute_symm_inner_product_array(
-                self.vec_handles)
-            self.correlation_array = self.expanded_correlation_array[:-1, :-1]
-            self.cross_correlation_array = self.expanded_correlation_array[
-                :-1, 1:]
+                self.vec_handles, root_only=root_only)
+            if self.expanded_correlation_array is None:
+                self.correlation_array = None
+                self.cross_correlation_array = None
+            else:
+                self.correlation_array = self.expanded_correlation_array[
+                    :-1, :-1]
+                self.cross_correlation_array = self.expanded_correlation_array[
+                    :-1, 1:]
         # For non-sequential data, compute the correlation array from the
-        # unadvanced snapshots only.  Compute the cross correlation array
-        # involving the unadvanced and advanced snapshots separately.
+        # unadvanced snapshots only, and the cross correlation array involving
+        # the unadvanced and advanced snapshots.  Both are computed together
+        # if that retrieves fewer vecs, so that the unadvanced snapshots are
+        # only retrieved once as rows.
         else:
-            self.correlation_array =\
-                self.vec_space.compute_symm_inner_product_array(
-                    self.vec_handles)
-            self.cross_correlation_array =\
-                self.vec_space.compute_inner_product_array(
-                self.vec_handles, self.adv_vec_handles)
+            self.correlation_array, self.cross_correlation_array =\
+                self.vec_space.compute_inner_product_arrays([
+                    (self.vec_handles, self.vec_handles),
+                    (self.vec_handles, self.adv_vec_handles)],
+                    root_only=root_only)
 
         # Compute eigendecomposition of low-order linear map.
         self.compute_eigendecomp(
@@ -901,6 +948,87 @@ class DMDHandles(object):
             self.correlation_array_eigvecs)
 
 
+    def _extend_correlation_arrays(
+        self, new_vec_handles, new_adv_vec_handles, root_only):
+        """Appends vector objects to ``vec_handles`` (and ``adv_vec_handles``)
+        and extends the correlation arrays, computing only the new inner
+        products."""
+        new_vec_handles = util.make_iterable(new_vec_handles)
+
+        # For a sequential dataset, extend the expanded correlation array and
+        # slice it as in compute_decomp
+        if new_adv_vec_handles is None:
+            self.expanded_correlation_array =\
+                self.vec_space.extend_symm_inner_product_array(
+                    self.expanded_correlation_array, self.vec_handles,
+                    new_vec_handles, root_only=root_only)
+            self.vec_handles = list(self.vec_handles) + list(new_vec_handles)
+            if self.expanded_correlation_array is None:
+                self.correlation_array = None
+                self.cross_correlation_array = None
+            else:
+                self.correlation_array = self.expanded_correlation_array[
+                    :-1, :-1]
+                self.cross_correlation_array = self.expanded_correlation_array[
+                    :-1, 1:]
+        else:
+            new_adv_vec_handles = util.make_iterable(new_adv_vec_handles)
+            if len(new_vec_handles) != len(new_adv_vec_handles):
+                raise ValueError(('Number of new_vec_handles and '
+                    'new_adv_vec_handles is not equal.'))
+            self.correlation_array =\
+                self.vec_space.extend_symm_inner_product_array(
+                    self.correlation_array, self.vec_handles, new_vec_handles,
+                    root_only=root_only)
+            self.cross_correlation_array =\
+                self.vec_space.extend_inner_product_array(
+                    self.cross_correlation_array, self.vec_handles,
+                    self.adv_vec_handles,
+                    new_row_vec_handles=new_vec_handles,
+                    new_col_vec_handles=new_adv_vec_handles,
+                    root_only=root_only)
+            self.vec_handles = list(self.vec_handles) + list(new_vec_handles)
+            self.adv_vec_handles = (
+                list(self.adv_vec_handles) + list(new_adv_vec_handles))
+
+
+    def update_decomp(
+        self, new_vec_handles, new_adv_vec_handles=None, atol=1e-13,
+        rtol=None, max_num_eigvals=None, root_only=False):
+        """Appends vector objects to those used in :py:meth:`compute_decomp`
+        and recomputes the eigendecomposition of the low-order linear map,
+        computing only the new rows and columns of the correlation arrays.
+
+        Args:
+            ``new_vec_handles``: List of handles for new vector objects.  For
+            a sequential time-series, these continue the series passed to
+            :py:meth:`compute_decomp`.
+
+        Kwargs:
+            ``new_adv_vec_handles``: List of handles for new vector objects
+            advanced in time.  Must be given if and only if
+            ``adv_vec_handles`` was given to :py:meth:`compute_decomp`.
+
+            ``atol``, ``rtol``, ``max_num_eigvals``, ``root_only``: See
+            :py:meth:`compute_decomp`.
+
+        Returns:
+            Same as :py:meth:`compute_decomp`.
+
+        See :py:meth:`VectorSpaceHandles.extend_symm_inner_product_array`.
+        """
+        self._extend_correlation_arrays(
+            new_vec_handles, new_adv_vec_handles, root_only)
+        self.compute_eigendecomp(
+            atol=atol, rtol=rtol, max_num_eigvals=max_num_eigvals)
+        return (
+            self.eigvals,
+            self.R_low_order_eigvecs,
+            self.L_low_order_eigvecs,
+            self.correlation_array_eigvals,
+            self.correlation_array_eigvecs)
+
+
     def _compute_build_coeffs_exact(self):
         """Compute build coefficients for exact DMD modes."""
         return self.correlation_array_eigvecs.dot(
@@ -923,6 +1051,52 @@ class DMDHandles(object):
                 self.L_low_order_eigvecs))
 
 
+    def _get_exact_basis_vec_handles(self, num_bases):
+        """Returns the handles for the vector objects that are combined to
+        form exact modes, given the number of rows of the build coefficient
+        array."""
+        # If the internal attribute is set, then use the advanced vecs
+        if self.adv_vec_handles is not None:
+            return self.adv_vec_handles
+        # If the internal attribute is not set, then check to see if
+        # vec_handles is set.  If so, assume a sequential dataset, in which
+        # case adv_vec_handles can be taken from a slice of vec_handles.
+        elif self.vec_handles is not None:
+            if len(self.vec_handles) - num_bases == 1:
+                return self.vec_handles[1:]
+            else:
+                raise ValueError(
+                    'Number of vec_handles is not correct for a sequential '
+                    'dataset.')
+        else:
+            raise ValueError(
+                'Neither vec_handles nor adv_vec_handles is defined.')
+
+
+    def _get_proj_basis_vec_handles(self, num_bases):
+        """Returns the handles for the vector objects that are combined to
+        form projected and adjoint modes, given the number of rows of the
+        build coefficient array."""
+        # For sequential data, the user will provide a list vec_handles that
+        # whose length is one larger than the number of rows of the
+        # build_coeffs array.  This is to be expected, as vec_handles is
+        # essentially partitioned into two sets of handles, each of length one
+        # less than vec_handles.
+        if len(self.vec_handles) - num_bases == 1:
+            return self.vec_handles[:-1]
+        # For a non-sequential dataset, the user will provide a list
+        # vec_handles whose length is equal to the number of rows in the
+        # build_coeffs array.
+        elif len(self.vec_handles) == num_bases:
+            return self.vec_handles
+        # Otherwise, raise an error, as the number of handles should fit one of
+        # the two cases described above.
+        else:
+            raise ValueError((
+                'Number of vec_handles does not match number of columns in '
+                'build_coeffs_proj array.'))
+
+
     def compute_exact_modes(
         self, mode_indices, mode_handles, adv_vec_handles=None):
         """Computes exact DMD modes and calls ``put`` on them using mode
@@ -945,28 +1119,10 @@ class DMDHandles(object):
         # Compute build coefficient array
         build_coeffs_exact = self._compute_build_coeffs_exact()
 
-        # If the internal attribute is set, then compute the modes
-        if self.adv_vec_handles is not None:
-            self.vec_space.lin_combine(
-                mode_handles, self.adv_vec_handles, build_coeffs_exact,
-                coeff_array_col_indices=mode_indices)
-        # If the internal attribute is not set, then check to see if
-        # vec_handles is set.  If so, assume a sequential dataset, in which
-        # case adv_vec_handles can be taken from a slice of vec_handles.
-        elif self.vec_handles is not None:
-            if len(self.vec_handles) - build_coeffs_exact.shape[0] == 1:
-                self.vec_space.lin_combine(
-                    mode_handles, self.vec_handles[1:], build_coeffs_exact,
-                    coeff_array_col_indices=mode_indices)
-            else:
-                raise(
-                    ValueError, (
-                    'Number of vec_handles is not correct for a sequential '
-                    'dataset.'))
-        else:
-            raise(
-                ValueError,
-                'Neither vec_handles nor adv_vec_handles is defined.')
+        self.vec_space.lin_combine(
+            mode_handles,
+            self._get_exact_basis_vec_handles(build_coeffs_exact.shape[0]),
+            build_coeffs_exact, coeff_array_col_indices=mode_indices)
 
 
     def compute_proj_modes(self, mode_indices, mode_handles, vec_handles=None):
@@ -989,28 +1145,10 @@ class DMDHandles(object):
         # Compute build coefficient array
         build_coeffs_proj = self._compute_build_coeffs_proj()
 
-        # For sequential data, the user will provide a list vec_handles that
-        # whose length is one larger than the number of rows of the
-        # build_coeffs array.  This is to be expected, as vec_handles is
-        # essentially partitioned into two sets of handles, each of length one
-        # less than vec_handles.
-        if len(self.vec_handles) - build_coeffs_proj.shape[0] == 1:
-            self.vec_space.lin_combine(
-                mode_handles, self.vec_handles[:-1], build_coeffs_proj,
-                coeff_array_col_indices=mode_indices)
-        # For a non-sequential dataset, the user will provide a list
-        # vec_handles whose length is equal to the number of rows in the
-        # build_coeffs array.
-        elif len(self.vec_handles) == build_coeffs_proj.shape[0]:
-            self.vec_space.lin_combine(
-                mode_handles, self.vec_handles, build_coeffs_proj,
-                coeff_array_col_indices=mode_indices)
-        # Otherwise, raise an error, as the number of handles should fit one of
-        # the two cases described above.
-        else:
-            raise ValueError((
-                'Number of vec_handles does not match number of columns in '
-                'build_coeffs_proj array.'))
+        self.vec_space.lin_combine(
+            mode_handles,
+            self._get_proj_basis_vec_handles(build_coeffs_proj.shape[0]),
+            build_coeffs_proj, coeff_array_col_indices=mode_indices)
 
 
     def compute_adjoint_modes(
@@ -1034,28 +1172,103 @@ class DMDHandles(object):
         # Compute build coefficient array
         build_coeffs_adjoint = self._compute_build_coeffs_adjoint()
 
-        # For sequential data, the user will provide a list vec_handles that
-        # whose length is one larger than the number of rows of the
-        # build_coeffs array.  This is to be expected, as vec_handles is
-        # essentially partitioned into two sets of handles, each of length one
-        # less than vec_handles.
-        if len(self.vec_handles) - build_coeffs_adjoint.shape[0] == 1:
-            self.vec_space.lin_combine(
-                mode_handles, self.vec_handles[:-1], build_coeffs_adjoint,
-                coeff_array_col_indices=mode_indices)
-        # For a non-sequential dataset, the user will provide a list
-        # vec_handles whose length is equal to the number of rows in the
-        # build_coeffs array.
-        elif len(self.vec_handles) == build_coeffs_adjoint.shape[0]:
-            self.vec_space.lin_combine(
-                mode_handles, self.vec_handles, build_coeffs_adjoint,
-                coeff_array_col_indices=mode_indices)
-        # Otherwise, raise an error, as the number of handles should fit one of
-        # the two cases described above.
-        else:
-            raise ValueError((
-                'Number of vec_handles does not match number of columns in '
-                'build_coeffs_proj array.'))
+        self.vec_space.lin_combine(
+            mode_handles,
+            self._get_proj_basis_vec_handles(build_coeffs_adjoint.shape[0]),
+            build_coeffs_adjoint, coeff_array_col_indices=mode_indices)
+
+
+    def compute_modes(
+        self, mode_indices, exact_mode_handles=None, proj_mode_handles=None,
+        adjoint_mode_handles=None, vec_handles=None, adv_vec_handles=None):
+        """Computes several families of DMD modes at once and calls ``put``
+        on them using mode handles.
+
+        Args:
+            ``mode_indices``: List of indices describing which modes of each
+            family to compute, e.g. ``range(10)`` or ``[3, 0, 5]``.
+
+        Kwargs:
+            ``exact_mode_handles``: List of handles for exact modes to compute.
+
+            ``proj_mode_handles``: List of handles for projected modes to
+            compute.
+
+            ``adjoint_mode_handles``: List of handles for adjoint modes to
+            compute.
+
+            ``vec_handles``: List of handles for vector objects. Optional if
+            given when calling :py:meth:`compute_decomp`.
+
+            ``adv_vec_handles``: List of handles for vector objects advanced in
+            time.  Optional if given when calling :py:meth:`compute_decomp`.
+
+        Families whose handles are ``None`` are not computed.  The modes are
+        the same as those of :py:meth:`compute_exact_modes`,
+        :py:meth:`compute_proj_modes`, and :py:meth:`compute_adjoint_modes`,
+        but families built from overlapping sets of vector objects are
+        computed in one pass with
+        :py:meth:`vectorspace.VectorSpaceHandles.lin_combine_multiple`, so
+        each vector object is only retrieved once.  For a sequential dataset,
+        all of the families are computed in one pass.
+        """
+        if vec_handles is not None:
+            self.vec_handles = vec_handles
+        if adv_vec_handles is not None:
+            self.adv_vec_handles = adv_vec_handles
+
+        # Find the basis vecs and build coefficients of each family
+        families = []
+        if exact_mode_handles is not None:
+            build_coeffs_exact = self._compute_build_coeffs_exact()
+            families.append((
+                self._get_exact_basis_vec_handles(build_coeffs_exact.shape[0]),
+                exact_mode_handles, build_coeffs_exact))
+        for mode_handles, compute_build_coeffs in [
+            (proj_mode_handles, self._compute_build_coeffs_proj),
+            (adjoint_mode_handles, self._compute_build_coeffs_adjoint)]:
+            if mode_handles is not None:
+                build_coeffs = compute_build_coeffs()
+                families.append((
+                    self._get_proj_basis_vec_handles(build_coeffs.shape[0]),
+                    mode_handles, build_coeffs))
+
+        # Group the families whose basis vecs overlap, and combine the union
+        # of their basis vecs in one pass.  Build coefficients are padded with
+        # zero rows for the basis vecs a family does not use.
+        groups = []
+        for basis_vec_handles, mode_handles, build_coeffs in families:
+            basis_ids = set(id(vec_handle) for vec_handle in basis_vec_handles)
+            for group_vec_handles, group_ids, group_families in groups:
+                if basis_ids & group_ids:
+                    group_vec_handles.extend(
+                        vec_handle for vec_handle in basis_vec_handles
+                        if id(vec_handle) not in group_ids)
+                    group_ids.update(basis_ids)
+                    group_families.append(
+                        (basis_vec_handles, mode_handles, build_coeffs))
+                    break
+            else:
+                groups.append((
+                    list(basis_vec_handles), basis_ids,
+                    [(basis_vec_handles, mode_handles, build_coeffs)]))
+        for group_vec_handles, group_ids, group_families in groups:
+            positions = dict(
+                (id(vec_handle), index)
+                for index, vec_handle in enumerate(group_vec_handles))
+            requests = []
+            for basis_vec_handles, mode_handles, build_coeffs in (
+                group_families):
+                build_coeffs = util.atleast_2d_col(
+                    build_coeffs[:, mode_indices])
+                padded_build_coeffs = np.zeros(
+                    (len(group_vec_handles), build_coeffs.shape[1]),
+                    dtype=build_coeffs.dtype)
+                padded_build_coeffs[[
+                    positions[id(vec_handle)]
+                    for vec_handle in basis_vec_handles]] = build_coeffs
+                requests.append((mode_handles, padded_build_coeffs))
+            self.vec_space.lin_combine_multiple(group_vec_handles, requests)
 
 
     def compute_spectrum(self):
@@ -1104,7 +1317,8 @@ class DMDHandles(object):
                 self.correlation_array_eigvecs.conj().T))
         self.adv_proj_coeffs = self.L_low_order_eigvecs.conj().T.dot(
             np.diag(self.correlation_array_eigvals ** -0.5).dot(
-                self.correlation_array_eigvecs.conj().T.dot(
+                parallel.call_and_bcast(
+                    np.dot, self.correlation_array_eigvecs.conj().T,
                     self.cross_correlation_array)))
         return self.proj_coeffs, self.adv_proj_coeffs
 
@@ -1629,6 +1843,30 @@ class TLSqrDMDHandles(DMDHandles):
 
         ``verbosity``: 1 prints progress and warnings, 0 prints almost nothing.
 
+        ``vec_cache``: A :py:class:`vectorspace.VecCache`, or the maximum
+        number of bytes of a new one, that keeps retrieved vector objects in
+        memory, so that they are not retrieved again in later stages, e.g.,
+        when computing the modes.
+
+        ``IP_array_store``: A :py:class:`vectorspace.InnerProductArrayStore`,
+        or the path of the directory of a new one, in which the inner product
+        arrays are saved, so that computing the decomposition again for
+        unchanged vecs loads them instead.
+
+        ``tracer``: A :py:class:`vectorspace.Tracer` in which the work done by
+        each stage is recorded as timestamped spans.
+
+        ``inner_product_block``: Function that computes the inner products of
+        a list of row vector objects with a list of column vector objects,
+        returning a 2D array, passed to
+        :py:class:`vectorspace.VectorSpaceHandles`.  See
+        :py:func:`vectors.inner_product_block_array_uniform`.
+
+        ``prefetch``, ``write_behind``, ``backend``, ``max_bytes_per_node``:
+        Passed to :py:class:`vectorspace.VectorSpaceHandles`, to retrieve the
+        vectors and put the modes while computing, to use the cores of each
+        MPI worker, and to bound the memory used in bytes.
+
     Computes Total-Least-Squares DMD modes from vector objects (or handles).
     It uses :py:class:`vectorspace.VectorSpaceHandles` for low level functions.
 
@@ -1666,7 +1904,10 @@ class TLSqrDMDHandles(DMDHandles):
     """
     def __init__(
         self, inner_product, get_array=util.load_array_text,
-        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1):
+        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1,
+        vec_cache=None, IP_array_store=None, tracer=None, prefetch=False,
+        write_behind=0, backend=None, max_bytes_per_node=None,
+        inner_product_block=None):
         """Constructor"""
         self.get_array = get_array
         self.put_array = put_array
@@ -1688,7 +1929,11 @@ class TLSqrDMDHandles(DMDHandles):
         self.proj_coeffs = None
         self.adv_proj_coeffs = None
         self.vec_space = VectorSpaceHandles(inner_product=inner_product,
-            max_vecs_per_node=max_vecs_per_node, verbosity=verbosity)
+            max_vecs_per_node=max_vecs_per_node, verbosity=verbosity,
+            vec_cache=vec_cache, IP_array_store=IP_array_store,
+            tracer=tracer, prefetch=prefetch, write_behind=write_behind,
+            backend=backend, max_bytes_per_node=max_bytes_per_node,
+            inner_product_block=inner_product_block)
         self.vec_handles = None
         self.adv_vec_handles = None
 
@@ -1763,10 +2008,11 @@ class TLSqrDMDHandles(DMDHandles):
         # Compute eigendecomposition of stacked correlation array
         self.sum_correlation_array = (
             self.correlation_array + self.adv_correlation_array)
-        (self.sum_correlation_array_eigvals,
-        self.sum_correlation_array_eigvecs) = parallel.call_and_bcast(
-            util.eigh, self.sum_correlation_array,
-            atol=atol, rtol=None, is_positive_definite=True)
+        with self.vec_space.trace_span('eigensolve'):
+            (self.sum_correlation_array_eigvals,
+            self.sum_correlation_array_eigvecs) = parallel.call_and_bcast(
+                util.eigh, self.sum_correlation_array,
+                atol=atol, rtol=None, is_positive_definite=True)
 
         # Truncate if necessary
         if max_num_eigvals is not None and (
@@ -1782,10 +2028,11 @@ class TLSqrDMDHandles(DMDHandles):
                 self.correlation_array.dot(
                     self.sum_correlation_array_eigvecs.dot(
                         self.sum_correlation_array_eigvecs.conj().T))))
-        (self.proj_correlation_array_eigvals,
-        self.proj_correlation_array_eigvecs) = parallel.call_and_bcast(
-            util.eigh, self.proj_correlation_array,
-            atol=atol, rtol=None, is_positive_definite=True)
+        with self.vec_space.trace_span('eigensolve'):
+            (self.proj_correlation_array_eigvals,
+            self.proj_correlation_array_eigvecs) = parallel.call_and_bcast(
+                util.eigh, self.proj_correlation_array,
+                atol=atol, rtol=None, is_positive_definite=True)
 
         # Truncate if necessary
         if max_num_eigvals is not None and (
@@ -1810,10 +2057,11 @@ class TLSqrDMDHandles(DMDHandles):
                                     ))))))))
 
         # Compute eigendecomposition of low-order linear map
-        self.eigvals, self.R_low_order_eigvecs, self.L_low_order_eigvecs =\
-            parallel.call_and_bcast(
-            util.eig_biorthog, self.low_order_linear_map,
-            **{'scale_choice':'left'})
+        with self.vec_space.trace_span('eigensolve'):
+            (self.eigvals, self.R_low_order_eigvecs,
+            self.L_low_order_eigvecs) = parallel.call_and_bcast(
+                util.eig_biorthog, self.low_order_linear_map,
+                **{'scale_choice':'left'})
 
 
     def compute_decomp(
@@ -1895,19 +2143,17 @@ class TLSqrDMDHandles(DMDHandles):
             self.cross_correlation_array = self.expanded_correlation_array[
                 :-1, 1:]
             self.adv_correlation_array = self.expanded_correlation_array[1:, 1:]
-        # For non-sequential data, compute the correlation array from the
-        # unadvanced snapshots only.  Compute the cross correlation array
-        # involving the unadvanced and advanced snapshots separately.
+        # For non-sequential data, compute the correlation arrays of the
+        # unadvanced and advanced snapshots, and the cross correlation array
+        # involving both.  All three are computed together if that retrieves
+        # fewer vecs, so that each snapshot is only retrieved once as a row.
         else:
-            self.correlation_array =\
-                self.vec_space.compute_symm_inner_product_array(
-                    self.vec_handles)
-            self.cross_correlation_array =\
-                self.vec_space.compute_inner_product_array(
-                self.vec_handles, self.adv_vec_handles)
-            self.adv_correlation_array =\
-                self.vec_space.compute_symm_inner_product_array(
-                    self.adv_vec_handles)
+            (self.correlation_array, self.cross_correlation_array,
+            self.adv_correlation_array) =\
+                self.vec_space.compute_inner_product_arrays([
+                    (self.vec_handles, self.vec_handles),
+                    (self.vec_handles, self.adv_vec_handles),
+                    (self.adv_vec_handles, self.adv_vec_handles)])
 
         # Compute eigendecomposition of low-order linear map.
         self.compute_eigendecomp(
@@ -1923,6 +2169,59 @@ class TLSqrDMDHandles(DMDHandles):
             self.proj_correlation_array_eigvals,
             self.proj_correlation_array_eigvecs)
 
+    def _extend_correlation_arrays(
+        self, new_vec_handles, new_adv_vec_handles, root_only):
+        """Appends vector objects to ``vec_handles`` (and ``adv_vec_handles``)
+        and extends the correlation arrays, including the advanced correlation
+        array, computing only the new inner products."""
+        if new_adv_vec_handles is not None:
+            self.adv_correlation_array =\
+                self.vec_space.extend_symm_inner_product_array(
+                    self.adv_correlation_array, self.adv_vec_handles,
+                    new_adv_vec_handles, root_only=root_only)
+        DMDHandles._extend_correlation_arrays(
+            self, new_vec_handles, new_adv_vec_handles, root_only)
+        if new_adv_vec_handles is None:
+            self.adv_correlation_array = self.expanded_correlation_array[
+                1:, 1:]
+
+
+    def update_decomp(
+        self, new_vec_handles, new_adv_vec_handles=None, atol=1e-13,
+        rtol=None, max_num_eigvals=None):
+        """Appends vector objects to those used in :py:meth:`compute_decomp`
+        and recomputes the eigendecomposition of the low-order linear map,
+        computing only the new rows and columns of the correlation arrays.
+
+        Args:
+            ``new_vec_handles``: List of handles for new vector objects.  For
+            a sequential time-series, these continue the series passed to
+            :py:meth:`compute_decomp`.
+
+        Kwargs:
+            ``new_adv_vec_handles``: List of handles for new vector objects
+            advanced in time.  Must be given if and only if
+            ``adv_vec_handles`` was given to :py:meth:`compute_decomp`.
+
+            ``atol``, ``rtol``, ``max_num_eigvals``: See
+            :py:meth:`compute_decomp`.
+
+        Returns:
+            Same as :py:meth:`compute_decomp`.
+        """
+        self._extend_correlation_arrays(
+            new_vec_handles, new_adv_vec_handles, False)
+        self.compute_eigendecomp(
+            atol=atol, rtol=rtol, max_num_eigvals=max_num_eigvals)
+        return (
+            self.eigvals,
+            self.R_low_order_eigvecs,
+            self.L_low_order_eigvecs,
+            self.sum_correlation_array_eigvals,
+            self.sum_correlation_array_eigvecs,
+            self.proj_correlation_array_eigvals,
+            self.proj_correlation_array_eigvecs)
+
 
     def _compute_build_coeffs_exact(self):
         """Compute build coefficients for exact DMD modes."""
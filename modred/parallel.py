@@ -1,4 +1,7 @@
-"""Parallel class and functions for distributed memory"""
+"""Parallel class and functions for distributed memory, and execution backends
+for the cores of a single node"""
+import os
+import pickle
 import socket
 
 import numpy as np
@@ -142,6 +145,21 @@ def bcast(vals):
     return outputs
 
 
+def allgather(val):
+    """Gathers a value from every processor/MPI worker on all of them.
+
+    Args:
+        ``val``: Value to send from this processor/MPI worker.
+
+    Returns:
+        ``vals``: List of the values from all processors/MPI workers, in order
+        of rank.
+    """
+    if _is_distributed:
+        return comm.allgather(val)
+    return [val]
+
+
 def call_and_bcast(func, *args, **kwargs):
     """Calls function on rank zero processor/MPI worker and broadcasts
     outputs to all others.
@@ -169,6 +187,284 @@ def call_and_bcast(func, *args, **kwargs):
     return outputs
 
 
+def _can_send_buffer(vecs):
+    """Returns True if ``vecs`` is a non-empty list of numpy arrays or
+    memory-mapped arrays (not other subclasses, such as matrices or masked
+    arrays) with the same shape and a non-object dtype, which can be sent as
+    a single contiguous buffer."""
+    if len(vecs) == 0:
+        return False
+    for vec in vecs:
+        if type(vec) not in (np.ndarray, np.memmap) or vec.dtype.hasobject:
+            return False
+        if vec.shape != vecs[0].shape or vec.dtype != vecs[0].dtype:
+            return False
+    return True
+
+
+# Bytes of the header at the start of each message sent by VecExchange, and
+# the alignment of the data after the metadata
+_EXCHANGE_HEADER_NBYTES = 24
+_EXCHANGE_DATA_ALIGNMENT = 64
+
+# Room left for the metadata (e.g., the indices) to grow from one message to
+# the next between the same ranks with the same tag, see VecExchange
+_EXCHANGE_RECV_SLACK_NBYTES = 4096
+
+
+def _get_data_offset(meta_nbytes):
+    """Returns the offset of the data in a message of VecExchange."""
+    return (
+        (_EXCHANGE_HEADER_NBYTES + meta_nbytes + _EXCHANGE_DATA_ALIGNMENT - 1)
+        // _EXCHANGE_DATA_ALIGNMENT * _EXCHANGE_DATA_ALIGNMENT)
+
+
+def _pack_vecs(vecs, indices):
+    """Returns a uint8 array holding a header, the pickled indices, shape, and
+    dtype of the data, and the data: the vector objects copied into one
+    contiguous buffer if they are numpy arrays, otherwise pickled."""
+    if _can_send_buffer(vecs):
+        is_buffer = True
+        data_shape = (len(vecs),) + vecs[0].shape
+        data_dtype = vecs[0].dtype
+        data_nbytes = len(vecs) * vecs[0].nbytes
+    else:
+        is_buffer = False
+        pickled_vecs = pickle.dumps(vecs, protocol=pickle.HIGHEST_PROTOCOL)
+        data_shape = (len(pickled_vecs),)
+        data_dtype = np.dtype(np.uint8)
+        data_nbytes = len(pickled_vecs)
+    meta = pickle.dumps(
+        (indices, data_shape, data_dtype.str),
+        protocol=pickle.HIGHEST_PROTOCOL)
+    data_offset = _get_data_offset(len(meta))
+    message = np.empty(data_offset + data_nbytes, dtype=np.uint8)
+    message[:_EXCHANGE_HEADER_NBYTES].view(np.int64)[:] = [
+        is_buffer, len(meta), data_nbytes]
+    message[_EXCHANGE_HEADER_NBYTES:_EXCHANGE_HEADER_NBYTES + len(meta)] = (
+        np.frombuffer(meta, dtype=np.uint8))
+    data = message[data_offset:]
+    if is_buffer:
+        data_array = data.view(data_dtype).reshape(data_shape)
+        for vec_index, vec in enumerate(vecs):
+            data_array[vec_index] = vec
+    else:
+        data[:] = np.frombuffer(pickled_vecs, dtype=np.uint8)
+    return message
+
+
+def _get_message_nbytes(message):
+    """Returns the number of bytes of a message of VecExchange, from its
+    header."""
+    is_buffer, meta_nbytes, data_nbytes = (
+        message[:_EXCHANGE_HEADER_NBYTES].view(np.int64))
+    return int(_get_data_offset(meta_nbytes) + data_nbytes)
+
+
+def _unpack_vecs(message):
+    """Returns the vector objects and indices in a message made by
+    :py:func:`_pack_vecs`.  Arrays are views of the message."""
+    is_buffer, meta_nbytes, data_nbytes = (
+        message[:_EXCHANGE_HEADER_NBYTES].view(np.int64))
+    indices, data_shape, data_dtype = pickle.loads(
+        message[
+            _EXCHANGE_HEADER_NBYTES:_EXCHANGE_HEADER_NBYTES + meta_nbytes
+        ].tobytes())
+    data_offset = _get_data_offset(meta_nbytes)
+    data = message[data_offset:data_offset + data_nbytes]
+    if is_buffer:
+        vecs = list(data.view(np.dtype(data_dtype)).reshape(data_shape))
+    else:
+        vecs = pickle.loads(data.tobytes())
+    return vecs, indices
+
+
+class VecExchange(object):
+    """Non-blocking exchange of lists of vector objects between processors/MPI
+    workers, started by :py:func:`start_exchange_vecs`.
+
+    Call :py:meth:`wait` to get the received vector objects.
+
+    The vector objects are sent as one message, which is received into a
+    buffer posted when the exchange starts, so that it is transferred while
+    the caller computes.  The buffer is the size of the previous message
+    between the same ranks with the same tag (plus some room for the
+    metadata), which both ranks know.  A message that does not fit is
+    preceded by its header alone, and is received by :py:meth:`wait`.  So
+    the exchanges between two ranks with the same tag must be waited for in
+    the order they are started, before the next one is started.
+    """
+    # Number of bytes of the previous message sent to each (dest, tag) and
+    # received from each (source, tag)
+    _sent_nbytes = {}
+    _received_nbytes = {}
+
+
+    def __init__(self, vecs, indices, dest, source, send_tag, recv_tag):
+        send_message = _pack_vecs(vecs, indices)
+        send_capacity = self._get_capacity(
+            VecExchange._sent_nbytes.get((dest, send_tag)))
+        if send_message.size <= send_capacity:
+            self._send_requests = [
+                comm.Isend(send_message, dest=dest, tag=send_tag)]
+        else:
+            # The header alone is received into the posted buffer, and tells
+            # the receiver to receive the whole message separately.  Messages
+            # with the same tag are received in the order they are sent.
+            self._send_requests = [
+                comm.Isend(
+                    send_message[:_EXCHANGE_HEADER_NBYTES], dest=dest,
+                    tag=send_tag),
+                comm.Isend(send_message, dest=dest, tag=send_tag)]
+        self._send_message = send_message
+        VecExchange._sent_nbytes[(dest, send_tag)] = send_message.size
+
+        self._source = source
+        self._recv_tag = recv_tag
+        self._recv_message = np.empty(
+            self._get_capacity(
+                VecExchange._received_nbytes.get((source, recv_tag))),
+            dtype=np.uint8)
+        self._recv_request = comm.Irecv(
+            self._recv_message, source=source, tag=recv_tag)
+
+
+    @staticmethod
+    def _get_capacity(prev_nbytes):
+        """Returns the size of the buffer posted for a message, given the size
+        of the previous one between the same ranks with the same tag."""
+        if prev_nbytes is None:
+            return _EXCHANGE_HEADER_NBYTES
+        return prev_nbytes + _EXCHANGE_RECV_SLACK_NBYTES
+
+
+    def wait(self):
+        """Waits for the exchange to complete.
+
+        Returns:
+            ``recv_vecs``: List of vector objects received.
+
+            ``recv_indices``: Indices received with the vector objects.
+        """
+        self._recv_request.Wait()
+        recv_nbytes = _get_message_nbytes(self._recv_message)
+        if recv_nbytes > self._recv_message.size:
+            self._recv_message = np.empty(recv_nbytes, dtype=np.uint8)
+            comm.Recv(
+                self._recv_message, source=self._source, tag=self._recv_tag)
+        VecExchange._received_nbytes[(self._source, self._recv_tag)] = (
+            recv_nbytes)
+        MPI.Request.Waitall(self._send_requests)
+        self._send_message = None
+        recv_vecs, recv_indices = _unpack_vecs(
+            self._recv_message[:recv_nbytes])
+        self._recv_message = None
+        return recv_vecs, recv_indices
+
+
+def start_exchange_vecs(vecs, indices, dest, source, send_tag, recv_tag):
+    """Starts sending a list of vector objects to one processor/MPI worker and
+    receiving a list from another, e.g., to pass vectors around a ring.
+
+    Args:
+        ``vecs``: List of vector objects to send.
+
+        ``indices``: List of indices (or any picklable object) that identify
+        the vector objects, sent along with them.
+
+        ``dest``: Rank to send to.
+
+        ``source``: Rank to receive from.
+
+        ``send_tag``: Tag of the messages sent.
+
+        ``recv_tag``: Tag of the messages received.
+
+    Returns:
+        ``exchange``: A :py:class:`VecExchange`.  Its ``wait`` method returns
+        the received vector objects and indices.
+
+    This does not block.  The vector objects are transferred while the
+    caller does other work, such as computing with the vector objects it
+    already has, if they fit in the buffer posted for them, which is the size
+    of the previous exchange with ``source`` and ``recv_tag`` (see
+    :py:class:`VecExchange`); otherwise, they are received by ``wait``.
+    ``vecs`` are copied, and can be modified once this returns.
+
+    If the vector objects are numpy arrays of the same shape and type, they
+    are copied into one contiguous buffer and sent without pickling.  The
+    received arrays are views of a single buffer.  Otherwise, the vector
+    objects are pickled.
+    """
+    return VecExchange(vecs, indices, dest, source, send_tag, recv_tag)
+
+
+def exchange_vecs(vecs, indices, dest, source, send_tag, recv_tag):
+    """Sends a list of vector objects to one processor/MPI worker and receives
+    a list from another, waiting for the exchange to complete.  See
+    :py:func:`start_exchange_vecs` for the arguments.
+
+    Returns:
+        ``recv_vecs``: List of vector objects received.
+
+        ``recv_indices``: Indices received with the vector objects.
+    """
+    return start_exchange_vecs(
+        vecs, indices, dest, source, send_tag, recv_tag).wait()
+
+
+def gather_array_rows(rows, row_indices, num_rows, root_only=False):
+    """Assembles a 2D array from the rows held by each processor/MPI worker.
+
+    Args:
+        ``rows``: 2D array of the rows held by this processor/MPI worker.
+
+        ``row_indices``: List of the indices of ``rows`` in the assembled
+        array.  Each row must be held by only one processor/MPI worker.
+
+        ``num_rows``: Number of rows in the assembled array.
+
+    Kwargs:
+        ``root_only``: If True, the array is only assembled on rank zero, and
+        ``None`` is returned on the other processors/MPI workers.
+
+    Returns:
+        ``array``: Assembled 2D array.  Rows that are not held by any
+        processor/MPI worker are zero.
+
+    The rows are sent as buffers with ``Gatherv`` (or ``Allgatherv``), so
+    only the assembled array, and not a full-size array on each processor/MPI
+    worker, needs to be in memory.
+    """
+    rows = np.ascontiguousarray(rows)
+    if _is_distributed:
+        all_row_indices = comm.allgather(list(row_indices))
+        counts = [
+            len(indices) * rows.shape[1] for indices in all_row_indices]
+        if root_only and not is_rank_zero():
+            comm.Gatherv(rows, None, root=0)
+            return None
+        gathered_rows = np.empty(
+            (sum(counts) // max(rows.shape[1], 1), rows.shape[1]),
+            dtype=rows.dtype)
+        if root_only:
+            comm.Gatherv(rows, [gathered_rows, counts], root=0)
+        else:
+            comm.Allgatherv(rows, [gathered_rows, counts])
+        row_indices = np.concatenate([
+            np.array(indices, dtype=int) for indices in all_row_indices])
+    else:
+        gathered_rows = rows
+        row_indices = np.array(row_indices, dtype=int)
+
+    # Avoid a copy if the rows are already in order
+    if np.array_equal(row_indices, np.arange(num_rows)):
+        return gathered_rows
+    array = np.zeros((num_rows, rows.shape[1]), dtype=rows.dtype)
+    array[row_indices] = gathered_rows
+    return array
+
+
 def find_assignments(tasks, task_weights=None):
     """Evenly distributes tasks among all processors/MPI workers using task
     weights.
@@ -242,3 +538,159 @@ def check_for_empty_tasks(task_assignments):
         if len(assignment) == 0 and not empty_tasks:
             empty_tasks = True
     return empty_tasks
+
+
+class SerialBackend(object):
+    """Execution backend that runs tasks one at a time in the calling
+    process.
+
+    This is the default backend.  When running under MPI, each MPI worker
+    (processor) still does its share of the work, one task at a time.
+    """
+    num_workers = 1
+
+
+    def map(self, func, args):
+        """Returns a list of ``func(arg)`` for each ``arg`` in ``args``."""
+        return [func(arg) for arg in args]
+
+
+    def shutdown(self):
+        """Releases resources used by the backend.  Does nothing."""
+        pass
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+    def __eq__(self, other):
+        return (
+            type(self) == type(other) and
+            self.num_workers == other.num_workers)
+
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class ThreadPoolBackend(SerialBackend):
+    """Execution backend that runs tasks in a pool of threads, using
+    ``concurrent.futures``.
+
+    Kwargs:
+        ``num_workers``: Number of threads.  Defaults to the number of cores
+        on the node divided by the number of MPI workers on the node.
+
+    Threads share memory with the calling process, so no data is copied.
+    They only run in parallel when the tasks release the GIL, e.g., when they
+    read files or do large numpy operations.
+
+    The pool is started by the first call to :py:meth:`map` and runs until
+    :py:meth:`shutdown` is called.  The backend can be used in a ``with``
+    statement, which calls :py:meth:`shutdown` at the end.
+    """
+    def __init__(self, num_workers=None):
+        if num_workers is None:
+            num_workers = max(
+                (os.cpu_count() if hasattr(os, 'cpu_count') else 1) *
+                _num_nodes // _num_MPI_workers, 1)
+        self.num_workers = num_workers
+        self._executor = None
+
+
+    def _make_executor(self):
+        from concurrent.futures import ThreadPoolExecutor
+        return ThreadPoolExecutor(max_workers=self.num_workers)
+
+
+    def map(self, func, args):
+        """Returns a list of ``func(arg)`` for each ``arg`` in ``args``,
+        computed in parallel.  The order of ``args`` is preserved."""
+        args = list(args)
+        if self.num_workers == 1 or len(args) <= 1:
+            return [func(arg) for arg in args]
+        if self._executor is None:
+            self._executor = self._make_executor()
+        return list(self._executor.map(func, args))
+
+
+    def shutdown(self):
+        """Stops the pool.  A new pool is started if :py:meth:`map` is called
+        again."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+class ProcessPoolBackend(ThreadPoolBackend):
+    """Execution backend that runs tasks in a pool of processes, using
+    ``concurrent.futures``.
+
+    Kwargs:
+        ``num_workers``: Number of processes.  Defaults to the number of cores
+        on the node divided by the number of MPI workers on the node.
+
+    The tasks and their arguments and results are pickled and sent between
+    processes, so the vector objects, handles, and inner product function must
+    be picklable (e.g., module-level functions, not lambdas).  Use this backend
+    when the tasks hold the GIL, e.g., inner products written in pure Python.
+
+    The tasks are sent in one batch per process, and each batch pickles
+    ``func`` with the data it holds.  For example, the inner products of a
+    chunk of rows with a chunk of columns send a copy of all of the column
+    vector objects to each process, for every chunk, so this backend only
+    pays off when the work per vector object is large compared to pickling
+    it.
+    """
+    def _make_executor(self):
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(max_workers=self.num_workers)
+
+
+    def map(self, func, args):
+        """Returns a list of ``func(arg)`` for each ``arg`` in ``args``,
+        computed in parallel.  The order of ``args`` is preserved."""
+        args = list(args)
+        if self.num_workers == 1 or len(args) <= 1:
+            return [func(arg) for arg in args]
+        if self._executor is None:
+            self._executor = self._make_executor()
+        # Send the tasks in one batch per process, since ``func`` is pickled
+        # once per batch.
+        chunksize = int(np.ceil(len(args) * 1. / self.num_workers))
+        return list(self._executor.map(func, args, chunksize=chunksize))
+
+
+def get_backend(backend=None):
+    """Returns an execution backend.
+
+    Kwargs:
+        ``backend``: Either an execution backend object, which is returned
+        as is, or one of the strings ``'serial'``, ``'MPI'``, ``'threads'``,
+        or ``'processes'``.  ``None``, ``'serial'``, and ``'MPI'`` give a
+        :py:class:`SerialBackend`, so that the work is only divided among MPI
+        workers (processors), as when running with ``mpiexec``.
+        ``'threads'`` and ``'processes'`` give a :py:class:`ThreadPoolBackend`
+        and :py:class:`ProcessPoolBackend` with the default number of workers.
+
+    Returns:
+        ``backend``: Object with ``map(func, args)`` and ``shutdown()``
+        methods, which can be used in a ``with`` statement.
+
+    The shared-memory backends can be combined with MPI, in which case each
+    MPI worker uses its own pool.
+    """
+    if backend is None or backend in ('serial', 'MPI'):
+        return SerialBackend()
+    if backend == 'threads':
+        return ThreadPoolBackend()
+    if backend == 'processes':
+        return ProcessPoolBackend()
+    if isinstance(backend, str):
+        raise ValueError('Unknown execution backend %s' % backend)
+    return backend
@@ -227,6 +227,30 @@ class PODHandles(object):
 
         ``verbosity``: 1 prints progress and warnings, 0 prints almost nothing.
 
+        ``vec_cache``: A :py:class:`vectorspace.VecCache`, or the maximum
+        number of bytes of a new one, that keeps retrieved vector objects in
+        memory, so that they are not retrieved again in later stages, e.g.,
+        when computing the modes.
+
+        ``IP_array_store``: A :py:class:`vectorspace.InnerProductArrayStore`,
+        or the path of the directory of a new one, in which the inner product
+        arrays are saved, so that computing the decomposition again for
+        unchanged vecs loads them instead.
+
+        ``tracer``: A :py:class:`vectorspace.Tracer` in which the work done by
+        each stage is recorded as timestamped spans.
+
+        ``inner_product_block``: Function that computes the inner products of
+        a list of row vector objects with a list of column vector objects,
+        returning a 2D array, passed to
+        :py:class:`vectorspace.VectorSpaceHandles`.  See
+        :py:func:`vectors.inner_product_block_array_uniform`.
+
+        ``prefetch``, ``write_behind``, ``backend``, ``max_bytes_per_node``:
+        Passed to :py:class:`vectorspace.VectorSpaceHandles`, to retrieve the
+        vectors and put the modes while computing, to use the cores of each
+        MPI worker, and to bound the memory used in bytes.
+
     Computes POD modes from vector objects (or handles).  Uses
     :py:class:`vectorspace.VectorSpaceHandles` for low level functions.
 
@@ -241,7 +265,10 @@ class PODHandles(object):
     """
     def __init__(
         self, inner_product, get_array=util.load_array_text,
-        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1):
+        put_array=util.save_array_text, max_vecs_per_node=None, verbosity=1,
+        vec_cache=None, IP_array_store=None, tracer=None, prefetch=False,
+        write_behind=0, backend=None, max_bytes_per_node=None,
+        inner_product_block=None):
         self.get_array = get_array
         self.put_array = put_array
         self.verbosity = verbosity
@@ -250,7 +277,11 @@ class PODHandles(object):
 
         self.vec_space = VectorSpaceHandles(inner_product=inner_product,
             max_vecs_per_node=max_vecs_per_node,
-            verbosity=verbosity)
+            verbosity=verbosity, vec_cache=vec_cache,
+            IP_array_store=IP_array_store, tracer=tracer, prefetch=prefetch,
+            write_behind=write_behind, backend=backend,
+            max_bytes_per_node=max_bytes_per_node,
+            inner_product_block=inner_product_block)
         self.vec_handles = None
         self.correlation_array = None
 
@@ -362,12 +393,15 @@ class PODHandles(object):
           POD.compute_eigendecomp()
           POD.compute_modes(range(10), mode_handles, vec_handles=vec_handles)
         """
-        self.eigvals, self.eigvecs = parallel.call_and_bcast(
-            util.eigh, self.correlation_array, atol=atol, rtol=rtol,
-            is_positive_definite=True)
+        with self.vec_space.trace_span('eigensolve'):
+            self.eigvals, self.eigvecs = parallel.call_and_bcast(
+                util.eigh, self.correlation_array, atol=atol, rtol=rtol,
+                is_positive_definite=True)
 
 
-    def compute_decomp(self, vec_handles, atol=1e-13, rtol=None):
+    def compute_decomp(
+        self, vec_handles, atol=1e-13, rtol=None, root_only=False,
+        checkpoint_path=None):
         """Computes correlation array :math:`X^*WX` and its eigendecomposition.
 
         Args:
@@ -380,6 +414,16 @@ class PODHandles(object):
             ``rtol``: Maximum relative difference between largest and smallest
             eigenvalues of correlation array.  Smaller ones are truncated.
 
+            ``root_only``: If True, the correlation array is only assembled on
+            rank zero, where the eigendecomposition is computed, and
+            ``correlation_array`` is ``None`` on the other MPI workers.  This
+            saves memory for large numbers of vectors.
+
+            ``checkpoint_path``: Path to a file in which the correlation array
+            is periodically saved while it is computed, and from which an
+            interrupted computation is resumed.  See
+            :py:meth:`VectorSpaceHandles.compute_symm_inner_product_array`.
+
         Returns:
             ``eigvals``: 1D array of eigenvalues of correlation array.
 
@@ -389,7 +433,45 @@ class PODHandles(object):
         self.vec_handles = vec_handles
         self.correlation_array =\
             self.vec_space.compute_symm_inner_product_array(
-                self.vec_handles)
+                self.vec_handles, root_only=root_only,
+                checkpoint_path=checkpoint_path)
+        self.compute_eigendecomp(atol=atol, rtol=rtol)
+        return self.eigvals, self.eigvecs
+
+
+    def update_decomp(
+        self, new_vec_handles, atol=1e-13, rtol=None, root_only=False):
+        """Appends vector objects to those used in :py:meth:`compute_decomp`
+        and recomputes the eigendecomposition, computing only the new rows
+        and columns of the correlation array.
+
+        Args:
+            ``new_vec_handles``: List of handles for new vector objects.
+
+        Kwargs:
+            ``atol``: Level below which eigenvalues of correlation array are
+            truncated.
+
+            ``rtol``: Maximum relative difference between largest and smallest
+            eigenvalues of correlation array.  Smaller ones are truncated.
+
+            ``root_only``: If True, the correlation array is only assembled on
+            rank zero, as in :py:meth:`compute_decomp`.
+
+        Returns:
+            ``eigvals``: 1D array of eigenvalues of correlation array.
+
+            ``eigvecs``: Array whose columns are eigenvectors of correlation
+            array.
+
+        See :py:meth:`VectorSpaceHandles.extend_symm_inner_product_array`.
+        """
+        new_vec_handles = util.make_iterable(new_vec_handles)
+        self.correlation_array =\
+            self.vec_space.extend_symm_inner_product_array(
+                self.correlation_array, self.vec_handles, new_vec_handles,
+                root_only=root_only)
+        self.vec_handles = list(self.vec_handles) + list(new_vec_handles)
         self.compute_eigendecomp(atol=atol, rtol=rtol)
         return self.eigvals, self.eigvecs
 
@@ -26,7 +26,9 @@ parser.add_argument(
     help='Directory in which to save data.')
 parser.add_argument(
     '--function',
-    choices=['lin_combine', 'inner_product_array', 'symm_inner_product_array'],
+    choices=[
+        'lin_combine', 'inner_product_array', 'symm_inner_product_array',
+        'handle_throughput'],
     help='Function to benchmark.')
 args = parser.parse_args()
 data_dir = args.outdir
@@ -140,6 +142,71 @@ def lin_combine(
     return total_time
 
 
+def handle_throughput(num_states, num_vecs, verbosity=1):
+    """
+    Measures the throughput of putting and getting vecs with pickle and
+    compressed handles, and the time to compute a symmetric inner product
+    array with them.
+
+    Throughputs are in MB/s of uncompressed data.  The vecs hold random values
+    rounded to two digits, so that they can be compressed, and are split into
+    several chunks, so that they are (de)compressed by several threads.
+    """
+    handle_kwargs_list = [('pickle', None)] + [
+        ('%s level %d' % (codec, level),
+            {'codec': codec, 'level': level, 'chunk_nbytes': 2**17})
+        for codec, level in [('zlib', 1), ('zlib', 6), ('bz2', 1), ('lzma', 1)]
+        if codec in mr.vectors._compression_codecs]
+    if not os.path.exists(data_dir) and mr.parallel.is_rank_zero():
+        os.mkdir(data_dir)
+    mr.parallel.barrier()
+    vecs = [np.round(np.random.random(num_states), 2) for i in mr.range(4)]
+    nbytes = num_vecs * vecs[0].nbytes
+    my_VS = mr.VectorSpaceHandles(
+        np.vdot, max_vecs_per_node=num_vecs + 1, verbosity=0)
+
+    total_time = 0.
+    for handle_name, handle_kwargs in handle_kwargs_list:
+        if handle_kwargs is None:
+            vec_handles = [
+                mr.VecHandlePickle(join(data_dir, row_vec_name % row_num))
+                for row_num in mr.range(num_vecs)]
+        else:
+            vec_handles = [
+                mr.VecHandleCompressed(
+                    join(data_dir, row_vec_name % row_num), **handle_kwargs)
+                for row_num in mr.range(num_vecs)]
+
+        mr.parallel.barrier()
+        start_time = time.time()
+        if mr.parallel.is_rank_zero():
+            for vec_index, handle in enumerate(vec_handles):
+                handle.put(vecs[vec_index % len(vecs)])
+        mr.parallel.barrier()
+        put_time = time.time() - start_time
+        file_nbytes = sum(
+            os.path.getsize(handle.vec_path) for handle in vec_handles)
+
+        start_time = time.time()
+        for handle in vec_handles:
+            handle.get()
+        get_time = time.time() - start_time
+
+        start_time = time.time()
+        my_VS.compute_symm_inner_product_array(vec_handles)
+        IP_time = time.time() - start_time
+        total_time += put_time + get_time + IP_time
+
+        if verbosity:
+            mr.parallel.print_from_rank_zero(
+                '%-14s ratio %5.2f, put %8.1f MB/s, get %8.1f MB/s, '
+                'symm IP array %.3f s' % (
+                    handle_name, nbytes * 1. / file_nbytes,
+                    nbytes / put_time / 1e6, nbytes / get_time / 1e6,
+                    IP_time))
+    return total_time
+
+
 def clean_up():
     mr.parallel.barrier()
     if mr.parallel.is_rank_zero():
@@ -177,11 +244,20 @@ def main():
         num_vecs = 1200
         time_elapsed = symm_inner_product_array(
             num_states, num_vecs, max_vecs_per_node)
+
+    elif method_to_test == 'handle_throughput':
+        # handle_throughput test
+        num_vecs = 100
+        time_elapsed = handle_throughput(num_states * 100, num_vecs)
     else:
         print(
             'Did not recognize --function argument. Choose from: lin_combine, '
-            'inner_product_array, symm_inner_product_array.')
-    #print('Time for %s is %f' % (method_to_test, time_elapsed))
+            'inner_product_array, symm_inner_product_array, '
+            'handle_throughput.')
+        return
+    mr.parallel.print_from_rank_zero(
+        'Time for %s with %d MPI workers is %f s' % (
+            method_to_test, mr.parallel.get_num_MPI_workers(), time_elapsed))
 
     mr.parallel.barrier()
     clean_up()
@@ -490,6 +490,31 @@ class TestDMDHandles(unittest.TestCase):
                 np.testing.assert_equal(
                     correlation_array_eigvecs, DMD.correlation_array_eigvecs)
 
+                # Check that assembling the correlation arrays on rank zero
+                # only gives the same decomposition
+                DMD_root = dmd.DMDHandles(np.vdot, verbosity=0)
+                DMD_root.compute_decomp(
+                    vecs_arg, adv_vec_handles=adv_vecs_arg,
+                    max_num_eigvals=max_num_eigvals, root_only=True)
+                if parallel.is_rank_zero():
+                    np.testing.assert_allclose(
+                        DMD_root.correlation_array, DMD.correlation_array,
+                        rtol=rtol, atol=atol)
+                    np.testing.assert_allclose(
+                        DMD_root.cross_correlation_array,
+                        DMD.cross_correlation_array, rtol=rtol, atol=atol)
+                else:
+                    self.assertIsNone(DMD_root.correlation_array)
+                    self.assertIsNone(DMD_root.cross_correlation_array)
+                np.testing.assert_allclose(
+                    DMD_root.eigvals, eigvals, rtol=rtol, atol=atol)
+                np.testing.assert_allclose(
+                    DMD_root.low_order_linear_map, DMD.low_order_linear_map,
+                    rtol=rtol, atol=atol)
+                np.testing.assert_allclose(
+                    DMD_root.compute_proj_coeffs()[1],
+                    DMD.compute_proj_coeffs()[1], rtol=rtol, atol=atol)
+
         # Check that if mismatched sets of handles are passed in, an error is
         # raised.
         DMD = dmd.DMDHandles(np.vdot, verbosity=0)
@@ -498,6 +523,55 @@ class TestDMDHandles(unittest.TestCase):
             self.adv_vec_handles[:-1])
 
 
+    #@unittest.skip('Testing something else.')
+    def test_update_decomp(self):
+        """Test appending vecs to the correlation arrays"""
+        rtol = 1e-10
+        atol = 1e-12
+        num_old_vecs = self.num_vecs // 2
+
+        # Consider sequential time series as well as non-sequential.
+        for adv_vecs_arg, new_adv_vecs_arg in zip(
+            [None, self.adv_vec_handles[:num_old_vecs]],
+            [None, self.adv_vec_handles[num_old_vecs:]]):
+            for root_only in [False, True]:
+                DMD = dmd.DMDHandles(np.vdot, verbosity=0)
+                DMD.compute_decomp(
+                    self.vec_handles[:num_old_vecs],
+                    adv_vec_handles=adv_vecs_arg, root_only=root_only)
+                eigvals, R_low_order_eigvecs = DMD.update_decomp(
+                    self.vec_handles[num_old_vecs:],
+                    new_adv_vec_handles=new_adv_vecs_arg,
+                    root_only=root_only)[:2]
+
+                DMD_full = dmd.DMDHandles(np.vdot, verbosity=0)
+                if adv_vecs_arg is None:
+                    eigvals_full, R_low_order_eigvecs_full =\
+                        DMD_full.compute_decomp(self.vec_handles)[:2]
+                else:
+                    eigvals_full, R_low_order_eigvecs_full =\
+                        DMD_full.compute_decomp(
+                            self.vec_handles,
+                            adv_vec_handles=self.adv_vec_handles)[:2]
+                    self.assertEqual(
+                        DMD.adv_vec_handles, self.adv_vec_handles)
+
+                self.assertEqual(DMD.vec_handles, self.vec_handles)
+                if root_only and not parallel.is_rank_zero():
+                    self.assertIsNone(DMD.correlation_array)
+                    self.assertIsNone(DMD.cross_correlation_array)
+                else:
+                    np.testing.assert_allclose(
+                        DMD.correlation_array, DMD_full.correlation_array,
+                        rtol=rtol, atol=atol)
+                    np.testing.assert_allclose(
+                        DMD.cross_correlation_array,
+                        DMD_full.cross_correlation_array,
+                        rtol=rtol, atol=atol)
+                np.testing.assert_allclose(
+                    eigvals, eigvals_full, rtol=rtol, atol=atol)
+
+
     #@unittest.skip('Testing something else.')
     def test_compute_modes(self):
         """Test building of modes."""
@@ -653,6 +727,51 @@ class TestDMDHandles(unittest.TestCase):
                         LHS.get(), RHS.get(), rtol=rtol, atol=atol)
 
 
+    #@unittest.skip('Testing something else.')
+    def test_compute_all_modes(self):
+        """Test computing several families of modes in one pass"""
+        rtol = 1e-10
+        atol = 1e-12
+        mode_path = join(self.test_dir, 'dmd_%s_%s_mode_%03d.pkl')
+        for vecs_arg, adv_vecs_arg in zip(
+            [self.vec_handles, self.vec_handles], [None, self.adv_vec_handles]):
+            DMD = dmd.DMDHandles(np.vdot, verbosity=0)
+            DMD.compute_decomp(vecs_arg, adv_vec_handles=adv_vecs_arg)
+            mode_idxs = [2, 0, DMD.eigvals.size - 1]
+            mode_handles = dict(
+                ((kind, method), [
+                    VecHandlePickle(mode_path % (kind, method, i))
+                    for i in mode_idxs])
+                for kind in ['exact', 'proj', 'adjoint']
+                for method in ['one', 'all'])
+
+            # Count the number of times vecs are retrieved
+            num_gets = [0]
+            get_vecs = DMD.vec_space._get_vecs
+            def counting_get_vecs(vec_handles):
+                num_gets[0] += len(vec_handles)
+                return get_vecs(vec_handles)
+            DMD.vec_space._get_vecs = counting_get_vecs
+
+            DMD.compute_exact_modes(mode_idxs, mode_handles['exact', 'one'])
+            DMD.compute_proj_modes(mode_idxs, mode_handles['proj', 'one'])
+            DMD.compute_adjoint_modes(
+                mode_idxs, mode_handles['adjoint', 'one'])
+            num_gets_one = num_gets[0]
+            num_gets[0] = 0
+            DMD.compute_modes(
+                mode_idxs, exact_mode_handles=mode_handles['exact', 'all'],
+                proj_mode_handles=mode_handles['proj', 'all'],
+                adjoint_mode_handles=mode_handles['adjoint', 'all'])
+            self.assertLess(num_gets[0], num_gets_one)
+
+            for kind in ['exact', 'proj', 'adjoint']:
+                for mode_one, mode_all in zip(
+                    mode_handles[kind, 'one'], mode_handles[kind, 'all']):
+                    np.testing.assert_allclose(
+                        mode_all.get(), mode_one.get(), rtol=rtol, atol=atol)
+
+
     #@unittest.skip('Testing something else.')
     def test_compute_spectrum(self):
         """Test DMD spectrum"""
@@ -1417,6 +1536,46 @@ class TestTLSqrDMDHandles(unittest.TestCase):
             self.adv_vec_handles[:-1])
 
 
+    #@unittest.skip('Testing something else.')
+    def test_update_decomp(self):
+        """Test appending vecs to the correlation arrays"""
+        rtol = 1e-10
+        atol = 1e-12
+        num_old_vecs = self.num_vecs // 2
+        max_num_eigvals = num_old_vecs // 2
+
+        # Consider sequential time series as well as non-sequential.
+        for adv_vecs_arg, new_adv_vecs_arg in zip(
+            [None, self.adv_vec_handles[:num_old_vecs]],
+            [None, self.adv_vec_handles[num_old_vecs:]]):
+            TLSqrDMD = dmd.TLSqrDMDHandles(np.vdot, verbosity=0)
+            TLSqrDMD.compute_decomp(
+                self.vec_handles[:num_old_vecs], adv_vec_handles=adv_vecs_arg,
+                max_num_eigvals=max_num_eigvals)
+            eigvals = TLSqrDMD.update_decomp(
+                self.vec_handles[num_old_vecs:],
+                new_adv_vec_handles=new_adv_vecs_arg,
+                max_num_eigvals=max_num_eigvals)[0]
+
+            TLSqrDMD_full = dmd.TLSqrDMDHandles(np.vdot, verbosity=0)
+            if adv_vecs_arg is None:
+                adv_vec_handles = None
+            else:
+                adv_vec_handles = self.adv_vec_handles
+            eigvals_full = TLSqrDMD_full.compute_decomp(
+                self.vec_handles, adv_vec_handles=adv_vec_handles,
+                max_num_eigvals=max_num_eigvals)[0]
+
+            for array_name in [
+                'correlation_array', 'cross_correlation_array',
+                'adv_correlation_array']:
+                np.testing.assert_allclose(
+                    getattr(TLSqrDMD, array_name),
+                    getattr(TLSqrDMD_full, array_name), rtol=rtol, atol=atol)
+            np.testing.assert_allclose(
+                eigvals, eigvals_full, rtol=rtol, atol=atol)
+
+
     #@unittest.skip('Testing something else.')
     def test_compute_modes(self):
         """Test building of modes."""
@@ -4,6 +4,9 @@ import unittest
 import os
 from os.path import join
 import copy
+import time
+
+import numpy as np
 
 from modred import parallel
 
@@ -114,5 +117,129 @@ class TestParallel(unittest.TestCase):
         self.assertEqual(outputs, (True, 9))
 
 
+    def test_allgather(self):
+        """Gather a value from every MPI worker on all MPI workers."""
+        self.assertEqual(
+            parallel.allgather(parallel.get_rank() * 2),
+            [rank * 2 for rank in range(parallel.get_num_procs())])
+
+
+    def test_gather_array_rows(self):
+        """Assemble an array from rows held by each MPI worker."""
+        num_procs = parallel.get_num_procs()
+        num_rows = 3 * num_procs + 2
+        num_cols = 4
+        array = (
+            np.arange(num_rows * num_cols).reshape((num_rows, num_cols)) *
+            (1 + 1j))
+
+        # Each MPI worker holds every num_procs-th row.  Unowned rows are
+        # zero.
+        row_indices = list(range(self.rank, num_rows - 1, num_procs))
+        true_array = array.copy()
+        true_array[-1] = 0.
+        for root_only in [False, True]:
+            gathered_array = parallel.gather_array_rows(
+                array[row_indices], row_indices, num_rows, root_only=root_only)
+            if root_only and self.rank != 0:
+                self.assertIsNone(gathered_array)
+            else:
+                self.assertEqual(gathered_array.dtype, array.dtype)
+                np.testing.assert_equal(gathered_array, true_array)
+
+
+    def test_backends(self):
+        """Map a function over arguments with each execution backend."""
+        args = list(range(-5, 6))
+        backends = [
+            parallel.get_backend(), parallel.get_backend('MPI'),
+            parallel.get_backend('threads'),
+            parallel.ThreadPoolBackend(num_workers=3)]
+        # Forking MPI processes is not safe in general
+        if not distributed:
+            backends.append(parallel.ProcessPoolBackend(num_workers=2))
+        for backend in backends:
+            self.assertEqual(backend.map(abs, args), [abs(arg) for arg in args])
+            self.assertEqual(backend.map(abs, []), [])
+            backend.shutdown()
+
+        self.assertEqual(parallel.get_backend(), parallel.SerialBackend())
+        self.assertIsInstance(
+            parallel.get_backend('processes'), parallel.ProcessPoolBackend)
+        backend = parallel.ThreadPoolBackend(num_workers=2)
+        self.assertIs(parallel.get_backend(backend), backend)
+        self.assertRaises(ValueError, parallel.get_backend, 'gpu')
+
+        # Backends shut down their pools at the end of a with statement
+        with parallel.ThreadPoolBackend(num_workers=2) as backend:
+            self.assertEqual(backend.map(abs, args), [abs(arg) for arg in args])
+            self.assertIsNotNone(backend._executor)
+        self.assertIsNone(backend._executor)
+
+
+    @unittest.skipIf(not distributed, 'Only test in parallel')
+    def test_exchange_vecs(self):
+        """Pass vectors around a ring, as buffers or pickled objects."""
+        num_procs = parallel.get_num_procs()
+        dest = (self.rank + 1) % num_procs
+        source = (self.rank - 1) % num_procs
+        indices = [self.rank, self.rank + num_procs]
+        source_indices = [source, source + num_procs]
+
+        # Functions that make a list of vector objects from a list of indices
+        make_vecs_list = [
+            lambda indices: [
+                np.arange(6.).reshape(2, 3) + index for index in indices],
+            lambda indices: [np.arange(4) * 1j + index for index in indices],
+            lambda indices: [np.arange(3) + indices[0], list(indices)],
+            lambda indices: [{'index': index} for index in indices],
+            lambda indices: []]
+        for make_vecs in make_vecs_list:
+            recv_vecs, recv_indices = parallel.exchange_vecs(
+                make_vecs(indices), indices, dest, source, self.rank, source)
+            self.assertEqual(recv_indices, source_indices)
+            true_vecs = make_vecs(source_indices)
+            self.assertEqual(len(recv_vecs), len(true_vecs))
+            for recv_vec, true_vec in zip(recv_vecs, true_vecs):
+                if isinstance(true_vec, np.ndarray):
+                    self.assertEqual(recv_vec.dtype, true_vec.dtype)
+                    np.testing.assert_equal(recv_vec, true_vec)
+                else:
+                    self.assertEqual(recv_vec, true_vec)
+
+        # Starting an exchange does not wait for a late source
+        if num_procs > 1:
+            vec = np.ones(3) * self.rank
+            parallel.barrier()
+            if self.rank == 0:
+                time.sleep(0.5)
+            start_time = time.time()
+            exchange = parallel.start_exchange_vecs(
+                [vec], [self.rank], dest, source, self.rank, source)
+            if source == 0:
+                self.assertLess(time.time() - start_time, 0.4)
+            recv_vecs, recv_indices = exchange.wait()
+            self.assertEqual(recv_indices, [source])
+            np.testing.assert_equal(recv_vecs[0], np.ones(3) * source)
+            parallel.barrier()
+
+        # The first message with a new tag is preceded by its header.  Later
+        # messages of about the same size are sent at once, into the buffer
+        # posted by the receiver when the exchange starts.
+        tag = 1000
+        for vec_index in range(3):
+            vecs = [np.arange(100.) + self.rank + vec_index]
+            exchange = parallel.start_exchange_vecs(
+                vecs, [vec_index * 100], dest, source, tag, tag)
+            self.assertEqual(
+                len(exchange._send_requests), 2 if vec_index == 0 else 1)
+            if vec_index > 0:
+                self.assertGreater(exchange._recv_message.nbytes, vecs[0].nbytes)
+            recv_vecs, recv_indices = exchange.wait()
+            self.assertEqual(recv_indices, [vec_index * 100])
+            np.testing.assert_equal(
+                recv_vecs[0], np.arange(100.) + source + vec_index)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -145,6 +145,7 @@ class TestPODHandles(unittest.TestCase):
         def my_load(): pass
         def my_save(): pass
         def my_IP(): pass
+        def my_IP_block(): pass
 
         data_members_default = {
             'put_array': util.save_array_text, 'get_array':util.load_array_text,
@@ -186,6 +187,19 @@ class TestPODHandles(unittest.TestCase):
         for k,v in util.get_data_members(my_POD).items():
             self.assertEqual(v, data_members_modified[k])
 
+        my_POD = pod.PODHandles(
+            my_IP, prefetch=True, write_behind=2, verbosity=0)
+        data_members_modified = copy.deepcopy(data_members_default)
+        data_members_modified['vec_space'] = VectorSpaceHandles(
+            inner_product=my_IP, prefetch=True, write_behind=2, verbosity=0)
+        for k,v in util.get_data_members(my_POD).items():
+            self.assertEqual(v, data_members_modified[k])
+        self.assertEqual(my_POD.vec_space.write_behind, 2)
+
+        my_POD = pod.PODHandles(
+            my_IP, inner_product_block=my_IP_block, verbosity=0)
+        self.assertIs(my_POD.vec_space.inner_product_block, my_IP_block)
+
 
     #@unittest.skip('Testing something else.')
     def test_puts_gets(self):
@@ -258,6 +272,51 @@ class TestPODHandles(unittest.TestCase):
         np.testing.assert_equal(eigvals, POD.eigvals)
         np.testing.assert_equal(eigvecs, POD.eigvecs)
 
+        # Check that assembling the correlation array on rank zero only gives
+        # the same decomposition
+        POD_root = pod.PODHandles(np.vdot, verbosity=0)
+        eigvals_root, eigvecs_root = POD_root.compute_decomp(
+            self.vec_handles, root_only=True)
+        if parallel.is_rank_zero():
+            np.testing.assert_allclose(
+                POD_root.correlation_array, POD.correlation_array,
+                rtol=rtol, atol=atol)
+        else:
+            self.assertIsNone(POD_root.correlation_array)
+        np.testing.assert_allclose(eigvals_root, eigvals, rtol=rtol, atol=atol)
+        np.testing.assert_allclose(
+            np.abs(eigvecs_root), np.abs(eigvecs), rtol=rtol, atol=atol)
+
+
+    #@unittest.skip('Testing something else.')
+    def test_update_decomp(self):
+        """Test appending vecs to the correlation array."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_old_vecs = self.num_vecs // 2
+
+        for root_only in [False, True]:
+            POD = pod.PODHandles(np.vdot, verbosity=0)
+            POD.compute_decomp(
+                self.vec_handles[:num_old_vecs], root_only=root_only)
+            eigvals, eigvecs = POD.update_decomp(
+                self.vec_handles[num_old_vecs:], root_only=root_only)
+            POD_full = pod.PODHandles(np.vdot, verbosity=0)
+            eigvals_full, eigvecs_full = POD_full.compute_decomp(
+                self.vec_handles)
+
+            self.assertEqual(POD.vec_handles, self.vec_handles)
+            if root_only and not parallel.is_rank_zero():
+                self.assertIsNone(POD.correlation_array)
+            else:
+                np.testing.assert_allclose(
+                    POD.correlation_array, POD_full.correlation_array,
+                    rtol=rtol, atol=atol)
+            np.testing.assert_allclose(
+                eigvals, eigvals_full, rtol=rtol, atol=atol)
+            np.testing.assert_allclose(
+                np.abs(eigvecs), np.abs(eigvecs_full), rtol=rtol, atol=atol)
+
 
     #@unittest.skip('Testing something else.')
     def test_compute_modes(self):
@@ -545,5 +545,34 @@ class TestUtil(unittest.TestCase):
                 np.testing.assert_equal(Hankel_test, Hankel_true)
 
 
+    #@unittest.skip('Testing something else.')
+    def test_get_nbytes(self):
+        """Test finding the memory used by objects."""
+        array = np.random.random((3, 4))
+        self.assertEqual(util.get_nbytes(array), array.nbytes)
+        self.assertTrue(util.get_nbytes([1., 2., 3.]) > 0)
+        available_memory = util.get_available_memory()
+        if available_memory is not None:
+            self.assertTrue(available_memory > 0)
+
+
+    #@unittest.skip('Testing something else.')
+    def test_inner_product_block(self):
+        """Test computing blocks of inner products one pair at a time."""
+        vecs1 = [np.random.random(4) * (1 + 1j) for i in range(3)]
+        vecs2 = [np.random.random(4) for i in range(2)]
+        num_IPs = [0]
+        def inner_product(vec1, vec2):
+            num_IPs[0] += 1
+            return np.vdot(vec1, vec2)
+        IP_block = util.InnerProductBlock(inner_product)(vecs1, vecs2)
+        np.testing.assert_allclose(
+            IP_block, np.array(vecs1).conj().dot(np.array(vecs2).T))
+        self.assertEqual(IP_block.dtype, np.complex128)
+
+        # Each inner product is computed once
+        self.assertEqual(num_IPs[0], len(vecs1) * len(vecs2))
+
+
 if __name__ == '__main__':
     unittest.main()
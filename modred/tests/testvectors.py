@@ -2,6 +2,7 @@
 """Test vectors module"""
 import unittest
 import os
+import pickle
 from os.path import join
 from shutil import rmtree
 
@@ -109,7 +110,9 @@ class TestVectors(unittest.TestCase):
             base_path2 = join(self.test_dir, 'base_vec2')
 
             # Test different handle types
-            for VecHandle in [vcs.VecHandleArrayText, vcs.VecHandlePickle]:
+            for VecHandle in [
+                vcs.VecHandleArrayText, vcs.VecHandlePickle,
+                vcs.VecHandleArrayNpy, vcs.VecHandleCompressed]:
 
                 # Save data to disk
                 VecHandle(base_path1).put(base_vec1)
@@ -171,5 +174,339 @@ class TestVectors(unittest.TestCase):
         self.assertTrue(convergence < -1.9)
 
 
+    #@unittest.skip('Testing something else.')
+    def test_IP_block_uniform(self):
+        """Test block inner product of arrays against pairwise inner products"""
+        vecs1 = [
+            np.random.random((3, 4)) + 1j * np.random.random((3, 4))
+            for i in range(5)]
+        vecs2 = [np.random.random((3, 4)) for i in range(2)]
+        IP_block = vcs.inner_product_block_array_uniform(vecs1, vecs2)
+        IP_block_true = np.array([
+            [np.vdot(vec1, vec2) for vec2 in vecs2] for vec1 in vecs1])
+        np.testing.assert_allclose(IP_block, IP_block_true)
+
+
+    #@unittest.skip('Testing something else.')
+    def test_axpy(self):
+        """Test in-place accumulation of scaled vectors"""
+        # Numpy arrays larger than one chunk are updated in place
+        num_states = 2 * vcs.AXPY_CHUNK_SIZE + 3
+        sum_vec = np.random.random(num_states) + 1j * np.random.random(
+            num_states)
+        vec = np.random.random(num_states)
+        sum_vec_true = sum_vec + (2. - 1j) * vec
+        result = vcs.axpy(sum_vec, 2. - 1j, vec)
+        self.assertIs(result, sum_vec)
+        np.testing.assert_allclose(result, sum_vec_true)
+
+        # If the result cannot be stored in the sum, a new array is returned
+        sum_vec = np.random.random((3, 4))
+        vec = np.random.random((3, 4))
+        sum_vec_true = sum_vec + 1j * vec
+        np.testing.assert_allclose(vcs.axpy(sum_vec, 1j, vec), sum_vec_true)
+
+        # Vector objects use their axpy method
+        class ListVec(vcs.Vector):
+            def __init__(self, data):
+                self.data = data
+            def __add__(self, other):
+                return ListVec([a + b for a, b in zip(self.data, other.data)])
+            def __mul__(self, scalar):
+                return ListVec([a * scalar for a in self.data])
+        class InPlaceListVec(ListVec):
+            def axpy(self, scalar, other):
+                for index, value in enumerate(other.data):
+                    self.data[index] += scalar * value
+                return self
+        for vec_class in [ListVec, InPlaceListVec]:
+            sum_vec = vec_class([1., 2.])
+            result = vcs.axpy(sum_vec, 3., vec_class([1., -1.]))
+            self.assertEqual(result.data, [4., -1.])
+            if vec_class is InPlaceListVec:
+                self.assertIs(result, sum_vec)
+
+
+    #@unittest.skip('Testing something else.')
+    def test_npy_handle(self):
+        """Test that npy handles return read-only arrays mapped to files"""
+        vec_path = join(self.test_dir, 'vec.npy')
+        base_vec_path = join(self.test_dir, 'base_vec.npy')
+        vec_true = np.random.random((self.num_states, 2)) * (1 + 1j)
+        base_vec = np.random.random((self.num_states, 2))
+        vcs.VecHandleArrayNpy(vec_path).put(vec_true)
+        vcs.VecHandleArrayNpy(base_vec_path).put(base_vec)
+
+        # By default, the file is mapped to a read-only array
+        vec = vcs.VecHandleArrayNpy(vec_path).get()
+        self.assertTrue(isinstance(vec, np.memmap))
+        self.assertFalse(vec.flags.writeable)
+        np.testing.assert_equal(vec, vec_true)
+
+        # Mapped arrays are exchanged between processors as buffers
+        self.assertTrue(parallel._can_send_buffer([vec, vec]))
+        np.testing.assert_allclose(
+            vcs.inner_product_array_uniform(vec, vec),
+            vcs.inner_product_array_uniform(vec_true, vec_true))
+
+        # Arithmetic returns arrays in memory
+        vec_handle = vcs.VecHandleArrayNpy(
+            vec_path, base_vec_handle=vcs.VecHandleArrayNpy(base_vec_path),
+            scale=2.)
+        vec = vec_handle.get()
+        np.testing.assert_allclose(vec, 2. * (vec_true - base_vec))
+        self.assertTrue(vec.flags.writeable)
+
+        # The file can also be loaded into memory
+        vec = vcs.VecHandleArrayNpy(vec_path, mmap_mode=None).get()
+        self.assertFalse(isinstance(vec, np.memmap))
+        np.testing.assert_equal(vec, vec_true)
+
+        # Putting does not change arrays mapped to the previous file
+        vec = vcs.VecHandleArrayNpy(vec_path).get()
+        vcs.VecHandleArrayNpy(vec_path).put(base_vec)
+        np.testing.assert_equal(vec, vec_true)
+        np.testing.assert_equal(vcs.VecHandleArrayNpy(vec_path).get(), base_vec)
+
+
+    #@unittest.skip('Testing other things')
+    def test_base_vec_cache(self):
+        """Test that each distinct base vec is retrieved once"""
+        num_gets = [0]
+        class CountingHandle(vcs.VecHandlePickle):
+            def _get(self):
+                num_gets[0] += 1
+                return vcs.VecHandlePickle._get(self)
+        base_vecs = [np.random.random(self.num_states) for i in range(3)]
+        base_vec_handles = [
+            CountingHandle(join(self.test_dir, 'base_vec_%d.pkl' % i))
+            for i in range(3)]
+        for base_vec_handle, base_vec in zip(base_vec_handles, base_vecs):
+            base_vec_handle.put(base_vec)
+        vec = np.random.random(self.num_states)
+        vec_handles = [
+            vcs.VecHandleInMemory(vec, base_vec_handle=base_vec_handle)
+            for base_vec_handle in base_vec_handles]
+
+        self.assertIs(
+            vec_handles[0].get_base_vec_handle(), base_vec_handles[0])
+        self.assertIsNone(base_vec_handles[0].get_base_vec_handle())
+
+        base_vec_cache = vcs.VecHandle.base_vec_cache
+        try:
+            # Handles with different bases used in turn, with equal but not
+            # identical base vec handles
+            vcs.VecHandle.base_vec_cache = vcs.BaseVecCache(max_num_vecs=2)
+            for i in range(3):
+                for vec_handle, base_vec in zip(vec_handles[:2], base_vecs):
+                    np.testing.assert_equal(vec_handle.get(), vec - base_vec)
+                np.testing.assert_equal(
+                    vcs.VecHandleInMemory(
+                        vec, base_vec_handle=CountingHandle(
+                            base_vec_handles[0].vec_path)).get(),
+                    vec - base_vecs[0])
+            self.assertEqual(num_gets[0], 2)
+            self.assertEqual(
+                vcs.VecHandle.base_vec_cache.get_stats(),
+                {'num_hits': 7, 'num_misses': 2, 'num_evictions': 0,
+                'num_vecs': 2})
+
+            # A third base evicts the least recently used one
+            vec_handles[2].get()
+            vec_handles[1].get()
+            self.assertEqual(num_gets[0], 4)
+            self.assertEqual(vcs.VecHandle.base_vec_cache.num_evictions, 2)
+
+            # Putting a new base vec drops the cached one
+            base_vec_handles[1].put(base_vecs[2])
+            np.testing.assert_equal(vec_handles[1].get(), vec - base_vecs[2])
+            self.assertEqual(num_gets[0], 5)
+
+            # Putting with other handles does not compare them with the cached
+            # ones, which may not be comparable
+            vcs.VecHandleInMemory(
+                np.ones(3),
+                base_vec_handle=vcs.VecHandleInMemory(np.zeros(3))).get()
+            vcs.VecHandleInMemory(np.zeros(4)).put(np.ones(4))
+
+            # Batch puts drop the cached base vecs too, including those of
+            # snapshot stores
+            vcs.put_vecs(base_vec_handles[1:2], base_vecs[:1])
+            np.testing.assert_equal(vec_handles[1].get(), vec - base_vecs[0])
+            store = vcs.SnapshotStore(join(self.test_dir, 'snapshots.bin'))
+            store.append(base_vecs[0])
+            snapshot_vec_handle = vcs.VecHandleInMemory(
+                vec, base_vec_handle=store.get_handle(0))
+            np.testing.assert_equal(
+                snapshot_vec_handle.get(), vec - base_vecs[0])
+            vcs.VecHandleSnapshot.put_many(
+                [vcs.VecHandleSnapshot(store.path, 0)], base_vecs[1:2])
+            np.testing.assert_equal(
+                snapshot_vec_handle.get(), vec - base_vecs[1])
+
+            # Each handle is dropped from the cache once per batch put
+            num_discards = [0]
+            discard = vcs.VecHandle.base_vec_cache.discard
+            def counting_discard(vec_handle):
+                num_discards[0] += 1
+                discard(vec_handle)
+            vcs.VecHandle.base_vec_cache.discard = counting_discard
+            vcs.put_vecs(
+                [base_vec_handles[1], vcs.VecHandleSnapshot(store.path, 0)],
+                base_vecs[1:3])
+            self.assertEqual(num_discards[0], 2)
+            np.testing.assert_equal(vec_handles[1].get(), vec - base_vecs[1])
+            np.testing.assert_equal(
+                snapshot_vec_handle.get(), vec - base_vecs[2])
+
+            vcs.VecHandle.base_vec_cache.clear()
+            self.assertEqual(len(vcs.VecHandle.base_vec_cache), 0)
+        finally:
+            vcs.VecHandle.base_vec_cache = base_vec_cache
+
+
+    #@unittest.skip('Testing other things')
+    def test_compressed_handle(self):
+        """Test that compressed handles split vecs into chunks"""
+        vec_path = join(self.test_dir, 'vec.z')
+        vec_true = np.round(
+            np.random.random((self.num_states, 100)), 2) * (1 + 1j)
+        vec_nbytes = vec_true.nbytes
+
+        # Arrays are stored as raw data, in compressed chunks, with any codec
+        for codec in ['zlib', 'bz2', 'lzma']:
+            if codec not in vcs._compression_codecs:
+                continue
+            vec_handle = vcs.VecHandleCompressed(
+                vec_path, codec=codec, level=1, chunk_nbytes=vec_nbytes // 3,
+                num_threads=2)
+            vec_handle.put(vec_true)
+            self.assertLess(os.path.getsize(vec_path), vec_nbytes)
+
+            # Decompression does not depend on the settings of the handle
+            vec = vcs.VecHandleCompressed(vec_path).get()
+            np.testing.assert_equal(vec, vec_true)
+            self.assertEqual(vec.dtype, vec_true.dtype)
+            self.assertTrue(vec.flags.writeable)
+
+        # Base vecs and scales are applied to the decompressed vec
+        base_vec_handle = vcs.VecHandleCompressed(
+            join(self.test_dir, 'base_vec.z'))
+        base_vec_handle.put(2. * vec_true)
+        np.testing.assert_allclose(
+            vcs.VecHandleCompressed(
+                vec_path, base_vec_handle=base_vec_handle, scale=3.).get(),
+            -3. * vec_true)
+
+        # Other vector objects are pickled, and empty arrays are supported
+        for vec_true in [[1, 'a', None], np.zeros((0, 3))]:
+            vcs.VecHandleCompressed(vec_path).put(vec_true)
+            vec = vcs.VecHandleCompressed(vec_path).get()
+            np.testing.assert_equal(vec, vec_true)
+            self.assertEqual(type(vec), type(vec_true))
+
+        self.assertRaises(
+            ValueError, vcs.VecHandleCompressed, vec_path, codec='none')
+
+
+    #@unittest.skip('Testing other things')
+    def test_snapshot_store(self):
+        """Test getting and putting vecs in a snapshot store"""
+        store_path = join(self.test_dir, 'snapshots.bin')
+        vecs_true = [
+            np.random.random((self.num_states, 2)) for i in range(5)]
+
+        # The shape and type are found from the first vec added
+        store = vcs.SnapshotStore(store_path)
+        self.assertEqual(len(store), 0)
+        for index, vec in enumerate(vecs_true):
+            self.assertEqual(store.append(vec), index)
+        self.assertEqual(len(store), len(vecs_true))
+        self.assertRaises(ValueError, store.append, np.zeros(3))
+        self.assertRaises(
+            ValueError, store.append, vecs_true[0] * 1j)
+
+        # Reopening the file reads the shape and type from its header, and
+        # handles return read-only arrays mapped to the file
+        for mmap_mode in ['r', None]:
+            store = vcs.SnapshotStore(store_path, mmap_mode=mmap_mode)
+            self.assertEqual(store.shape, (self.num_states, 2))
+            self.assertEqual(store.dtype, np.dtype(float))
+            vec_handles = store.get_handles()
+            for vec_handle, vec_true in zip(vec_handles, vecs_true):
+                vec = vec_handle.get()
+                self.assertEqual(isinstance(vec, np.memmap), bool(mmap_mode))
+                np.testing.assert_equal(vec, vec_true)
+            self.assertTrue(parallel._can_send_buffer(
+                store.get_vecs(range(len(vecs_true)))))
+
+            # Runs of consecutive indices are read together
+            indices = [3, 0, 1, 2, 4, 2]
+            for vec, index in zip(store.get_vecs(indices), indices):
+                np.testing.assert_equal(vec, vecs_true[index])
+        self.assertRaises(
+            ValueError, vcs.SnapshotStore, store_path, shape=(2,))
+        self.assertRaises(IndexError, store.get, len(vecs_true))
+
+        # Handles can be made from the path, and support base vecs and scales
+        vec_handle = vcs.VecHandleSnapshot(
+            store_path, 1, base_vec_handle=store.get_handle(0), scale=2.)
+        np.testing.assert_allclose(
+            vec_handle.get(), 2. * (vecs_true[1] - vecs_true[0]))
+        self.assertEqual(
+            vcs.VecHandleSnapshot(store_path, 1), store.get_handle(1))
+        self.assertNotEqual(store.get_handle(2), store.get_handle(1))
+
+        # Vecs can be put in place, or after resizing, in any order
+        store.get_handle(1).put(vecs_true[4])
+        np.testing.assert_equal(store.get(1), vecs_true[4])
+        store = vcs.SnapshotStore(store_path)
+        store.resize(8)
+        store.get_handle(7).put(vecs_true[0])
+        self.assertEqual(len(store), 8)
+        np.testing.assert_equal(store.get(5), 0.)
+        np.testing.assert_equal(store.get(7), vecs_true[0])
+        self.assertRaises(IndexError, store.put, 9, vecs_true[0])
+
+        # Handles can be pickled
+        vec_handle = pickle.loads(pickle.dumps(store.get_handle(7)))
+        np.testing.assert_equal(vec_handle.get(), vecs_true[0])
+
+
+    #@unittest.skip('Testing other things')
+    def test_get_vecs_put_vecs(self):
+        """Test getting and putting vecs with handles of mixed classes"""
+        store = vcs.SnapshotStore(join(self.test_dir, 'snapshots.bin'))
+        vecs_true = [
+            np.random.random((self.num_states, 2)) for i in range(6)]
+        vec_handles = [
+            store.get_handle(0), store.get_handle(1),
+            vcs.VecHandleInMemory(),
+            vcs.VecHandlePickle(join(self.test_dir, 'vec.pkl')),
+            store.get_handle(2),
+            store.get_handle(3, scale=2.)]
+
+        # Vecs at consecutive indices in the store are read and written
+        # together
+        num_ranges = [0]
+        get_range = store.get_range
+        def counting_get_range(start_index, end_index):
+            num_ranges[0] += 1
+            return get_range(start_index, end_index)
+        store.get_range = counting_get_range
+        vcs.put_vecs(vec_handles, vecs_true)
+        self.assertEqual(len(store), 4)
+        vecs = vcs.get_vecs(vec_handles)
+        self.assertEqual(num_ranges[0], 1)
+        for vec, vec_true in zip(vecs[:5], vecs_true[:5]):
+            np.testing.assert_equal(vec, vec_true)
+        np.testing.assert_allclose(vecs[5], 2. * vecs_true[5])
+
+        # The default batch methods call get and put on each handle
+        vcs.VecHandleInMemory.put_many(vec_handles[2:3], vecs_true[:1])
+        np.testing.assert_equal(
+            vcs.VecHandleInMemory.get_many(vec_handles[2:3])[0], vecs_true[0])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -5,12 +5,25 @@ import os
 from os.path import join
 from shutil import rmtree
 import copy
+import json
+import threading
 
 import numpy as np
 
 from modred import vectorspace as vspc, parallel, util
 from modred.py2to3 import range
-from modred.vectors import Vector, VecHandleInMemory, VecHandlePickle
+from modred.vectors import (
+    AXPY_CHUNK_SIZE, Vector, VecHandleInMemory, VecHandlePickle,
+    inner_product_block_array_uniform)
+
+
+class _CountingVecHandle(VecHandlePickle):
+    """Pickle handle that counts calls to ``get``.  Defined at module level
+    so that it can be pickled."""
+    num_gets = [0]
+    def _get(self):
+        _CountingVecHandle.num_gets[0] += 1
+        return VecHandlePickle._get(self)
 
 
 #@unittest.skip('Testing other things')
@@ -135,10 +148,17 @@ class TestVectorSpaceHandles(unittest.TestCase):
         # Default data members; set verbosity to 0 even though default is 1
         # so messages won't print during tests
         self.default_data_members = {
-            'inner_product': np.vdot, 'max_vecs_per_node': 10000,
+            'inner_product': np.vdot, 'inner_product_block': None,
+            'prefetch': False, 'write_behind': 0, 'max_vecs_per_node': 10000,
             'max_vecs_per_proc': (
                 10000 * parallel.get_num_nodes() // parallel.get_num_procs()),
-            'verbosity': 0, 'print_interval': 10, 'prev_print_time': 0.}
+            'backend': parallel.SerialBackend(), '_owns_backend': True,
+            'verbosity': 0,
+            'print_interval': 10, 'prev_print_time': 0., 'chunk_plan': None,
+            'max_bytes_per_node': None, 'vec_cache': None,
+            'IP_array_store': None, 'perf_stats': vspc.PerfStats(),
+            'perf_stats_summary': None, '_perf_stats_depth': 0,
+            'tracer': None, 'progress_callback': None}
         parallel.barrier()
 
 
@@ -167,6 +187,71 @@ class TestVectorSpaceHandles(unittest.TestCase):
         self.assertEqual(util.get_data_members(vec_space), data_members)
 
 
+    #@unittest.skip('Testing other things')
+    def test_compute_chunk_plan(self):
+        """Test that chunks fit in memory and minimize redundant gets."""
+        num_procs = parallel.get_num_procs()
+
+        # In parallel, there are also send and receive buffers for the cols
+        if parallel.is_distributed():
+            num_col_copies = 3
+        else:
+            num_col_copies = 1
+        for max_vecs_per_proc in [2, 3, 10, 100]:
+            self.vec_space.max_vecs_per_proc = max_vecs_per_proc
+            for num_rows in [1, 7, 40, 300]:
+                for num_cols in [1, 12, 300]:
+                    plan = self.vec_space.compute_chunk_plan(num_rows, num_cols)
+                    max_num_row_tasks = int(np.ceil(num_rows * 1. / num_procs))
+                    max_num_col_tasks = int(np.ceil(num_cols * 1. / num_procs))
+
+                    # Chunks cover all of the tasks
+                    self.assertTrue(
+                        plan.num_rows_per_proc_chunk * plan.num_row_chunks >=
+                        max_num_row_tasks)
+                    self.assertTrue(
+                        plan.num_cols_per_proc_chunk * plan.num_col_chunks >=
+                        max_num_col_tasks)
+                    if max_vecs_per_proc <= num_col_copies:
+                        continue
+
+                    # Chunks fit in memory
+                    self.assertTrue(
+                        plan.num_rows_per_proc_chunk +
+                        num_col_copies * plan.num_cols_per_proc_chunk <=
+                        max_vecs_per_proc)
+
+                    # Cols are retrieved as few times as possible
+                    self.assertEqual(
+                        plan.num_row_chunks,
+                        int(np.ceil(
+                            max_num_row_tasks * 1. /
+                            (max_vecs_per_proc - num_col_copies))))
+
+                    # Leftover memory is used for cols
+                    self.assertEqual(
+                        plan.num_cols_per_proc_chunk,
+                        min(
+                            (max_vecs_per_proc -
+                                plan.num_rows_per_proc_chunk) //
+                            num_col_copies,
+                            max_num_col_tasks))
+
+                    # Prefetched and pending chunks also fit in memory
+                    if max_vecs_per_proc < 3 + 2 * num_col_copies:
+                        continue
+                    self.vec_space.prefetch = True
+                    self.vec_space.write_behind = 1
+                    plan = self.vec_space.compute_chunk_plan(
+                        num_rows, num_cols, rows_are_put=True)
+                    self.assertTrue(
+                        3 * plan.num_rows_per_proc_chunk +
+                        (num_col_copies + 1) * plan.num_cols_per_proc_chunk <=
+                        max_vecs_per_proc)
+                    self.vec_space.prefetch = False
+                    self.vec_space.write_behind = 0
+
+
     #@unittest.skip('Testing other things')
     def test_sanity_check(self):
         """Tests correctly checks user-supplied objects and functions."""
@@ -359,6 +444,107 @@ class TestVectorSpaceHandles(unittest.TestCase):
             coeffs_array_too_fat)
 
 
+    #@unittest.skip('Testing other things')
+    def test_lin_combine_array_block(self):
+        """Test linear combinations of arrays computed as matrix products."""
+        rtol = 1e-10
+        atol = 1e-12
+        vec_shape = (3, 4)
+        num_vecs = self.total_num_vecs_in_mem + 3
+        num_modes = self.total_num_vecs_in_mem + 1
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        mode_path = join(self.test_dir, 'mode_%03d.pkl')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        mode_handles = [
+            VecHandlePickle(mode_path % i) for i in range(num_modes)]
+
+        # Real vecs with complex coefficients, so the sums are complex
+        vec_array = parallel.call_and_bcast(
+            np.random.random, (num_vecs,) + vec_shape)
+        coeff_array = (
+            parallel.call_and_bcast(np.random.random, (num_vecs, num_modes)) +
+            1j * parallel.call_and_bcast(
+                np.random.random, (num_vecs, num_modes)))
+        true_modes = np.tensordot(coeff_array, vec_array, axes=(0, 0))
+        if parallel.is_rank_zero():
+            for vec_index, vec_handle in enumerate(vec_handles):
+                vec_handle.put(vec_array[vec_index])
+        parallel.barrier()
+
+        # The sums are not accumulated one vec at a time
+        def add_to_sum_layers(*args):
+            raise AssertionError('Sums of arrays should use matrix products')
+        self.vec_space._add_to_sum_layers = add_to_sum_layers
+        self.vec_space.lin_combine(mode_handles, vec_handles, coeff_array)
+        self.assertGreater(self.vec_space.chunk_plan.num_col_chunks, 1)
+        for mode_index, mode_handle in enumerate(mode_handles):
+            np.testing.assert_allclose(
+                mode_handle.get(), true_modes[mode_index], rtol=rtol,
+                atol=atol)
+
+        # Stacking buffers are reused for chunks of the same size
+        array_combiner = vspc._ArrayLinCombiner()
+        sum_layers = array_combiner(
+            [None, None], list(vec_array[:2]), coeff_array[:2, :2])
+        basis_buffer = array_combiner.basis_buffer
+        sum_layers = array_combiner(
+            sum_layers, list(vec_array[2:4]), coeff_array[2:4, :2])
+        self.assertIs(array_combiner.basis_buffer, basis_buffer)
+        self.assertLessEqual(
+            basis_buffer.size, max(AXPY_CHUNK_SIZE, 2 * 1024))
+        np.testing.assert_allclose(
+            sum_layers, true_modes[:2] - np.tensordot(
+                coeff_array[4:, :2], vec_array[4:], axes=(0, 0)),
+            rtol=rtol, atol=atol)
+
+        # Arrays of different shapes are not stacked
+        self.assertFalse(array_combiner.can_combine(
+            [None, None], [np.zeros(3), np.zeros(4)]))
+
+
+    #@unittest.skip('Testing other things')
+    def test_lin_combine_multiple(self):
+        """Test several sets of linear combinations of the same basis."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_states = 7
+        num_vecs = self.total_num_vecs_in_mem + 2
+        num_modes = 5
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        mode_path = join(self.test_dir, 'mode_%d_%03d.pkl')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        vec_array, coeff_array, true_modes = parallel.call_and_bcast(
+            self.generate_vecs_modes, num_states, num_vecs,
+            num_modes=num_modes)
+        if parallel.is_rank_zero():
+            for vec_index, vec_handle in enumerate(vec_handles):
+                vec_handle.put(vec_array[:, vec_index])
+        parallel.barrier()
+
+        # Two sets of sums, one of them using a subset of the columns
+        mode_indices = [3, 0, 4]
+        mode_handles_0 = [
+            VecHandlePickle(mode_path % (0, i)) for i in range(num_modes)]
+        mode_handles_1 = [
+            VecHandlePickle(mode_path % (1, i)) for i in mode_indices]
+        self.vec_space.lin_combine_multiple(vec_handles, [
+            (mode_handles_0, coeff_array),
+            (mode_handles_1, 2. * coeff_array, mode_indices)])
+        for mode_index, mode_handle in enumerate(mode_handles_0):
+            np.testing.assert_allclose(
+                mode_handle.get(), true_modes[:, mode_index],
+                rtol=rtol, atol=atol)
+        for mode_index, mode_handle in zip(mode_indices, mode_handles_1):
+            np.testing.assert_allclose(
+                mode_handle.get(), 2. * true_modes[:, mode_index],
+                rtol=rtol, atol=atol)
+
+        # Coefficient arrays must match the basis
+        self.assertRaises(
+            ValueError, self.vec_space.lin_combine_multiple, vec_handles,
+            [(mode_handles_0, coeff_array[:-1])])
+
+
     #@unittest.skip('Testing other things')
     @unittest.skipIf(parallel.is_distributed(), 'Serial only')
     def test_compute_inner_product_array_types(self):
@@ -474,5 +660,1058 @@ class TestVectorSpaceHandles(unittest.TestCase):
                     product_computed, product_true, rtol=rtol, atol=atol)
 
 
+    #@unittest.skip('Testing other things')
+    def test_compute_inner_product_arrays_fused(self):
+        """Test computation of several inner product arrays together."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_states = 6
+        num_vecs = self.total_num_vecs_in_mem + 3
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        vec_handles = [
+            VecHandlePickle(vec_path % i) for i in range(2 * num_vecs)]
+        vec_array = (
+            parallel.call_and_bcast(
+                np.random.random, (num_states, 2 * num_vecs)) +
+            1j * parallel.call_and_bcast(
+                np.random.random, (num_states, 2 * num_vecs)))
+        if parallel.is_rank_zero():
+            for vec_index, vec_handle in enumerate(vec_handles):
+                vec_handle.put(vec_array[:, vec_index])
+        parallel.barrier()
+        X_handles = vec_handles[:num_vecs]
+        Y_handles = vec_handles[num_vecs:]
+        X = vec_array[:, :num_vecs]
+        Y = vec_array[:, num_vecs:]
+
+        # Symmetric, rectangular, and overlapping requests, with all vecs in
+        # memory at once or in chunks
+        requests = [
+            (X_handles, X_handles), (X_handles, Y_handles),
+            (Y_handles[-2:], X_handles[:3]), (Y_handles[:1], Y_handles[1:4])]
+        IP_arrays_true = [
+            X.conj().T.dot(X), X.conj().T.dot(Y),
+            Y[:, -2:].conj().T.dot(X[:, :3]), Y[:, :1].conj().T.dot(Y[:, 1:4])]
+        for max_vecs_per_proc in [4 * num_vecs, self.max_vecs_per_proc]:
+            self.vec_space.max_vecs_per_proc = max_vecs_per_proc
+            for root_only in [False, True]:
+                IP_arrays = self.vec_space.compute_inner_product_arrays(
+                    requests, root_only=root_only)
+                self.assertEqual(len(IP_arrays), len(requests))
+                for IP_array, IP_array_true in zip(IP_arrays, IP_arrays_true):
+                    if root_only and not parallel.is_rank_zero():
+                        self.assertIsNone(IP_array)
+                    else:
+                        np.testing.assert_allclose(
+                            IP_array, IP_array_true, rtol=rtol, atol=atol)
+
+        # When the vecs fit in memory, each is retrieved once, besides the
+        # ones used to time the get method and the inner product.  The arrays
+        # of DMD and the Hankel chunks of BPOD never require more gets than
+        # when computed separately.
+        if parallel.is_distributed():
+            return
+        num_gets = [0]
+        class CountingHandle(VecHandlePickle):
+            def _get(self):
+                num_gets[0] += 1
+                return VecHandlePickle._get(self)
+        counting_handles = [
+            CountingHandle(vec_path % i) for i in range(2 * num_vecs)]
+        X_handles = counting_handles[:num_vecs]
+        Y_handles = counting_handles[num_vecs:]
+        self.vec_space.max_vecs_per_proc = 4 * num_vecs
+        self.vec_space.compute_inner_product_arrays([
+            (X_handles, X_handles), (X_handles, Y_handles)])
+        self.assertEqual(num_gets[0], 2 * num_vecs + 3)
+        for max_vecs_per_proc in [4 * num_vecs, 2 * num_vecs, 6, 4]:
+            self.vec_space.max_vecs_per_proc = max_vecs_per_proc
+            for requests in [
+                [(X_handles, X_handles), (X_handles, Y_handles)],
+                [(X_handles, Y_handles[:2]), (X_handles[-2:], Y_handles)]]:
+                num_gets[0] = 0
+                for row_handles, col_handles in requests:
+                    if row_handles is col_handles:
+                        self.vec_space.compute_symm_inner_product_array(
+                            row_handles)
+                    else:
+                        self.vec_space.compute_inner_product_array(
+                            row_handles, col_handles)
+                num_separate_gets = num_gets[0]
+                num_gets[0] = 0
+                IP_arrays = self.vec_space.compute_inner_product_arrays(
+                    requests)
+                self.assertTrue(num_gets[0] <= num_separate_gets)
+                self.assertEqual(
+                    [IP_array.shape for IP_array in IP_arrays],
+                    [(len(row_handles), len(col_handles))
+                        for row_handles, col_handles in requests])
+
+
+    #@unittest.skip('Testing other things')
+    def test_compute_inner_product_arrays_block(self):
+        """Test computation of array of inner products using a block inner
+        product function."""
+        rtol = 1e-10
+        atol = 1e-12
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot,
+            inner_product_block=inner_product_block_array_uniform,
+            verbosity=0)
+        vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+
+        num_states = 6
+        num_row_vecs = self.total_num_vecs_in_mem * 2 + 1
+        num_col_vecs = self.total_num_vecs_in_mem + 3
+        row_vec_path = join(self.test_dir, 'row_vec_%03d.pkl')
+        col_vec_path = join(self.test_dir, 'col_vec_%03d.pkl')
+
+        # Generate and save vecs
+        row_vec_array = (
+            parallel.call_and_bcast(
+                np.random.random, (num_states, num_row_vecs))
+            + 1j * parallel.call_and_bcast(
+                np.random.random, (num_states, num_row_vecs)))
+        col_vec_array = parallel.call_and_bcast(
+            np.random.random, (num_states, num_col_vecs))
+        row_vec_handles = [
+            VecHandlePickle(row_vec_path % i) for i in range(num_row_vecs)]
+        col_vec_handles = [
+            VecHandlePickle(col_vec_path % i) for i in range(num_col_vecs)]
+        if parallel.is_rank_zero():
+            for i, h in enumerate(row_vec_handles):
+                h.put(row_vec_array[:, i])
+            for i, h in enumerate(col_vec_handles):
+                h.put(col_vec_array[:, i])
+        parallel.barrier()
+
+        # Test both orientations, since rows and cols are swapped internally
+        # when there are more rows than cols.
+        np.testing.assert_allclose(
+            vec_space.compute_inner_product_array(
+                row_vec_handles, col_vec_handles),
+            row_vec_array.conj().T.dot(col_vec_array),
+            rtol=rtol, atol=atol)
+        np.testing.assert_allclose(
+            vec_space.compute_inner_product_array(
+                col_vec_handles, row_vec_handles),
+            col_vec_array.conj().T.dot(row_vec_array),
+            rtol=rtol, atol=atol)
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(row_vec_handles),
+            row_vec_array.conj().T.dot(row_vec_array),
+            rtol=rtol, atol=atol)
+
+        # Symmetric blocks are split until they are small enough to compute in
+        # full, so only a few inner products below the diagonal are computed
+        num_calls = [0]
+        num_IPs = [0]
+        def counting_inner_product_block(vecs1, vecs2):
+            num_calls[0] += 1
+            num_IPs[0] += len(vecs1) * len(vecs2)
+            return inner_product_block_array_uniform(vecs1, vecs2)
+        vec_space.inner_product_block = counting_inner_product_block
+        leaf_size = vspc.SYMM_IP_BLOCK_LEAF_SIZE
+        try:
+            for test_leaf_size, max_num_calls, max_num_IPs in [
+                (num_row_vecs, 1, num_row_vecs ** 2),
+                (1, 2 * num_row_vecs, num_row_vecs * (num_row_vecs + 1) // 2),
+                (4, num_row_vecs, num_row_vecs * (num_row_vecs + 4) // 2)]:
+                vspc.SYMM_IP_BLOCK_LEAF_SIZE = test_leaf_size
+                num_calls[0] = 0
+                num_IPs[0] = 0
+                np.testing.assert_allclose(
+                    vec_space._compute_symm_IP_block(list(row_vec_array.T)),
+                    np.triu(row_vec_array.conj().T.dot(row_vec_array)),
+                    rtol=rtol, atol=atol)
+                self.assertLessEqual(num_calls[0], max_num_calls)
+                self.assertLessEqual(num_IPs[0], max_num_IPs)
+        finally:
+            vspc.SYMM_IP_BLOCK_LEAF_SIZE = leaf_size
+
+
+    #@unittest.skip('Testing other things')
+    def test_prefetch(self):
+        """Test inner products and linear combinations with prefetching."""
+        rtol = 1e-10
+        atol = 1e-12
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot, prefetch=True, verbosity=0)
+        vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+
+        num_states = 7
+        num_vecs = self.total_num_vecs_in_mem + 4
+        num_modes = 2 * self.total_num_vecs_in_mem
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        mode_path = join(self.test_dir, 'mode_%03d.pkl')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        mode_handles = [
+            VecHandlePickle(mode_path % i) for i in range(num_modes)]
+        vec_array, coeff_array, true_modes = parallel.call_and_bcast(
+            self.generate_vecs_modes, num_states, num_vecs,
+            num_modes=num_modes)
+        if parallel.is_rank_zero():
+            for vec_index, vec_handle in enumerate(vec_handles):
+                vec_handle.put(vec_array[:, vec_index])
+        parallel.barrier()
+
+        np.testing.assert_allclose(
+            vec_space.compute_inner_product_array(
+                vec_handles[:3], vec_handles),
+            vec_array[:, :3].conj().T.dot(vec_array),
+            rtol=rtol, atol=atol)
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(vec_handles),
+            vec_array.conj().T.dot(vec_array),
+            rtol=rtol, atol=atol)
+        vec_space.lin_combine(mode_handles, vec_handles, coeff_array)
+        for mode_index, mode_handle in enumerate(mode_handles):
+            np.testing.assert_allclose(
+                mode_handle.get(), true_modes[:, mode_index],
+                rtol=rtol, atol=atol)
+
+        # Errors raised while prefetching are raised by the computation
+        if parallel.is_distributed():
+            return
+        bad_handles = vec_handles + [
+            VecHandlePickle(join(self.test_dir, 'missing.pkl'))]
+        self.assertRaises(
+            IOError, vec_space.compute_symm_inner_product_array, bad_handles)
+
+
+    #@unittest.skip('Testing other things')
+    def test_write_behind(self):
+        """Test linear combinations with sums put in background threads."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_states = 5
+        num_vecs = 12
+        num_modes = 3 * self.total_num_vecs_in_mem
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        mode_path = join(self.test_dir, 'mode_%03d.pkl')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        mode_handles = [
+            VecHandlePickle(mode_path % i) for i in range(num_modes)]
+        vec_array, coeff_array, true_modes = parallel.call_and_bcast(
+            self.generate_vecs_modes, num_states, num_vecs,
+            num_modes=num_modes)
+        if parallel.is_rank_zero():
+            for vec_index, vec_handle in enumerate(vec_handles):
+                vec_handle.put(vec_array[:, vec_index])
+        parallel.barrier()
+
+        for write_behind in [1, 3]:
+            for prefetch in [False, True]:
+                vec_space = vspc.VectorSpaceHandles(
+                    inner_product=np.vdot, prefetch=prefetch,
+                    write_behind=write_behind, verbosity=0)
+                vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+                vec_space.lin_combine(mode_handles, vec_handles, coeff_array)
+                for mode_index, mode_handle in enumerate(mode_handles):
+                    np.testing.assert_allclose(
+                        mode_handle.get(), true_modes[:, mode_index],
+                        rtol=rtol, atol=atol)
+
+        # Errors raised by put are raised by lin_combine
+        if parallel.is_distributed():
+            return
+        bad_mode_handles = [
+            VecHandlePickle(join(self.test_dir, 'missing_dir', 'mode.pkl'))
+            for i in range(num_modes)]
+        self.assertRaises(
+            IOError, vec_space.lin_combine, bad_mode_handles, vec_handles,
+            coeff_array)
+
+        # Errors raised by get stop the threads that put the sums
+        num_threads = threading.active_count()
+        bad_vec_handles = vec_handles[:-1] + [
+            VecHandlePickle(join(self.test_dir, 'missing_vec.pkl'))]
+        self.assertRaises(
+            IOError, vec_space.lin_combine, mode_handles, bad_vec_handles,
+            coeff_array)
+        self.assertLessEqual(threading.active_count(), num_threads)
+
+
+    #@unittest.skip('Testing other things')
+    def test_put_queue(self):
+        """Test that vecs being put count against the pending limit."""
+        can_put = threading.Event()
+        put_vecs = []
+        def put_vecs_func(vec_handles, vecs):
+            can_put.wait()
+            put_vecs.extend(vecs)
+        put_queue = vspc._PutQueue(put_vecs_func, 1, 2)
+
+        # The first batch is being put, so the second must wait for it
+        put_queue.put([None, None], [0, 1])
+        put_thread = threading.Thread(
+            target=put_queue.put, args=([None], [2]))
+        put_thread.start()
+        put_thread.join(0.2)
+        self.assertTrue(put_thread.is_alive())
+        can_put.set()
+        put_thread.join()
+        put_queue.close()
+        self.assertEqual(put_vecs, [0, 1, 2])
+
+
+    #@unittest.skip('Testing other things')
+    def test_backends(self):
+        """Test inner products and linear combinations with shared-memory
+        execution backends."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_states = 7
+        num_vecs = self.total_num_vecs_in_mem + 4
+        num_modes = 2 * self.total_num_vecs_in_mem
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        mode_path = join(self.test_dir, 'mode_%03d.pkl')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        mode_handles = [
+            VecHandlePickle(mode_path % i) for i in range(num_modes)]
+        vec_array, coeff_array, true_modes = parallel.call_and_bcast(
+            self.generate_vecs_modes, num_states, num_vecs,
+            num_modes=num_modes)
+        if parallel.is_rank_zero():
+            for vec_index, vec_handle in enumerate(vec_handles):
+                vec_handle.put(vec_array[:, vec_index])
+        parallel.barrier()
+
+        backends = [parallel.ThreadPoolBackend(num_workers=3)]
+        # Forking MPI processes is not safe in general
+        if not parallel.is_distributed():
+            backends.append(parallel.ProcessPoolBackend(num_workers=2))
+        for backend in backends:
+            for inner_product_block in [None, inner_product_block_array_uniform]:
+                vec_space = vspc.VectorSpaceHandles(
+                    inner_product=np.vdot,
+                    inner_product_block=inner_product_block, backend=backend,
+                    verbosity=0)
+                vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+                np.testing.assert_allclose(
+                    vec_space.compute_inner_product_array(
+                        vec_handles[:3], vec_handles),
+                    vec_array[:, :3].conj().T.dot(vec_array),
+                    rtol=rtol, atol=atol)
+                np.testing.assert_allclose(
+                    vec_space.compute_symm_inner_product_array(vec_handles),
+                    vec_array.conj().T.dot(vec_array),
+                    rtol=rtol, atol=atol)
+                vec_space.lin_combine(mode_handles, vec_handles, coeff_array)
+                for mode_index, mode_handle in enumerate(mode_handles):
+                    np.testing.assert_allclose(
+                        mode_handle.get(), true_modes[:, mode_index],
+                        rtol=rtol, atol=atol)
+
+            # Backends passed in are left running
+            self.assertIsNotNone(backend._executor)
+            backend.shutdown()
+
+        # Pools created from a string are shut down after each operation, and
+        # by close
+        with vspc.VectorSpaceHandles(
+            inner_product=np.vdot, backend='threads', verbosity=0) as vec_space:
+            vec_space.backend.num_workers = 2
+            vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+            vec_space.compute_symm_inner_product_array(vec_handles)
+            self.assertIsNone(vec_space.backend._executor)
+            vec_space.backend.map(abs, [-1, -2])
+            self.assertIsNotNone(vec_space.backend._executor)
+        self.assertIsNone(vec_space.backend._executor)
+
+
+    #@unittest.skip('Testing other things')
+    def test_max_bytes_per_node(self):
+        """Test that the number of vecs in memory is found from a byte
+        budget."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_states = 7
+        # More vecs than fit in memory on all MPI workers at once
+        num_vecs = 6 * parallel.get_num_procs()
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        vec_array = parallel.call_and_bcast(
+            np.random.random, (num_states, num_vecs))
+        if parallel.is_rank_zero():
+            for vec_index, vec_handle in enumerate(vec_handles):
+                vec_handle.put(vec_array[:, vec_index])
+        parallel.barrier()
+
+        # The budget is enough for a fixed number of vecs
+        max_vecs_per_node = (
+            6 * parallel.get_num_procs() // parallel.get_num_nodes())
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot, verbosity=0,
+            max_bytes_per_node=max_vecs_per_node * vec_array[:, 0].nbytes)
+        np.testing.assert_allclose(
+            vec_space.compute_inner_product_array(vec_handles, vec_handles),
+            vec_array.T.dot(vec_array), rtol=rtol, atol=atol)
+        self.assertEqual(vec_space.max_vecs_per_node, max_vecs_per_node)
+        self.assertEqual(
+            vec_space.max_vecs_per_proc,
+            max_vecs_per_node * parallel.get_num_nodes() //
+            parallel.get_num_procs())
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(vec_handles),
+            vec_array.T.dot(vec_array), rtol=rtol, atol=atol)
+        self.assertTrue(vec_space.chunk_plan.num_row_chunks > 1)
+
+        # The budget is found from the available memory
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot, verbosity=0, max_bytes_per_node='auto')
+        if util.get_available_memory() is None:
+            return
+        self.assertTrue(vec_space.max_bytes_per_node > 0)
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(vec_handles),
+            vec_array.T.dot(vec_array), rtol=rtol, atol=atol)
+        self.assertEqual(vec_space.chunk_plan.num_row_chunks, 1)
+
+
+    #@unittest.skip('Testing other things')
+    def test_checkpoint(self):
+        """Test saving and resuming the symmetric inner product array."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_states = 7
+        num_vecs = 3 * self.total_num_vecs_in_mem
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        checkpoint_path = join(self.test_dir, 'checkpoint.npz')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        vec_array = parallel.call_and_bcast(
+            np.random.random, (num_states, num_vecs))
+        if parallel.is_rank_zero():
+            for vec_index, vec_handle in enumerate(vec_handles):
+                vec_handle.put(vec_array[:, vec_index])
+        parallel.barrier()
+        IP_array_true = vec_array.T.dot(vec_array)
+
+        # Save a checkpoint after every set of rows
+        IP_array = self.vec_space.compute_symm_inner_product_array(
+            vec_handles, checkpoint_path=checkpoint_path,
+            checkpoint_interval=0.)
+        np.testing.assert_allclose(IP_array, IP_array_true, rtol=rtol, atol=atol)
+        self.assertTrue(os.path.exists(checkpoint_path))
+
+        # Keep part of the rows, modified so that it is clear they are not
+        # recomputed
+        num_checkpoint_rows = num_vecs // 3
+        checkpoint_key = vspc._get_checkpoint_key(
+            vec_handles, np.vdot, IP_array_true[0, 0])
+        checkpoint_rows = 2. * np.triu(IP_array_true)[:num_checkpoint_rows]
+        parallel.barrier()
+        if parallel.is_rank_zero():
+            saved_rows, saved_done = vspc._load_checkpoint(
+                checkpoint_path, checkpoint_key)
+            np.testing.assert_allclose(
+                saved_rows, np.triu(IP_array_true), rtol=rtol, atol=atol)
+            self.assertIsNone(saved_done)
+            vspc._save_checkpoint(
+                checkpoint_path, checkpoint_key, checkpoint_rows)
+        parallel.barrier()
+
+        # Resume with a different number of vecs in memory
+        IP_array_resumed_true = IP_array_true.copy()
+        IP_array_resumed_true[:num_checkpoint_rows] = (
+            IP_array_resumed_true[:num_checkpoint_rows] + np.triu(
+                IP_array_true)[:num_checkpoint_rows])
+        IP_array_resumed_true = (
+            np.triu(IP_array_resumed_true) +
+            np.triu(IP_array_resumed_true, 1).T)
+        for root_only in [False, True]:
+            self.vec_space.max_vecs_per_proc = 3 + parallel.get_num_procs()
+            IP_array = self.vec_space.compute_symm_inner_product_array(
+                vec_handles, root_only=root_only,
+                checkpoint_path=checkpoint_path)
+            if root_only and not parallel.is_rank_zero():
+                self.assertIsNone(IP_array)
+            else:
+                np.testing.assert_allclose(
+                    IP_array, IP_array_resumed_true, rtol=rtol, atol=atol)
+
+        # A checkpoint for other vecs is not used
+        self.assertRaises(
+            ValueError, self.vec_space.compute_symm_inner_product_array,
+            vec_handles[::-1], checkpoint_path=checkpoint_path)
+
+
+    #@unittest.skip('Testing other things')
+    def test_checkpoint_within_row_set(self):
+        """Test saving and resuming a checkpoint during a set of rows."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_states = 7
+        num_vecs = 12
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        checkpoint_path = join(self.test_dir, 'checkpoint.npz')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        vec_array = parallel.call_and_bcast(
+            np.random.random, (num_states, num_vecs))
+        if parallel.is_rank_zero():
+            for vec_index, vec_handle in enumerate(vec_handles):
+                vec_handle.put(vec_array[:, vec_index])
+        parallel.barrier()
+        IP_array_true = vec_array.T.dot(vec_array)
+
+        # All of the vecs fit in one set of rows.  Keep the first checkpoint
+        # saved, which is incomplete.
+        saved_checkpoints = []
+        def save_checkpoint(checkpoint_path, key, rows, done=None):
+            saved_checkpoints.append((
+                rows.copy(), None if done is None else done.copy()))
+            save_checkpoint_orig(checkpoint_path, key, rows, done=done)
+        save_checkpoint_orig = vspc._save_checkpoint
+        checkpoint_num_cols_orig = vspc.CHECKPOINT_NUM_COLS
+        vspc._save_checkpoint = save_checkpoint
+        vspc.CHECKPOINT_NUM_COLS = 2
+        try:
+            self.vec_space.max_vecs_per_proc = 2 * num_vecs
+            IP_array = self.vec_space.compute_symm_inner_product_array(
+                vec_handles, checkpoint_path=checkpoint_path,
+                checkpoint_interval=0.)
+        finally:
+            vspc._save_checkpoint = save_checkpoint_orig
+            vspc.CHECKPOINT_NUM_COLS = checkpoint_num_cols_orig
+        self.assertEqual(self.vec_space.chunk_plan.num_row_chunks, 1)
+        np.testing.assert_allclose(IP_array, IP_array_true, rtol=rtol, atol=atol)
+        if parallel.is_rank_zero():
+            self.assertTrue(len(saved_checkpoints) > 1)
+            first_rows, first_done = saved_checkpoints[0]
+            self.assertIsNotNone(first_done)
+            self.assertFalse(first_done[np.triu_indices(num_vecs)].all())
+            np.testing.assert_allclose(
+                first_rows[first_done], np.triu(IP_array_true)[
+                    :first_rows.shape[0]][first_done], rtol=rtol, atol=atol)
+            np.testing.assert_allclose(
+                saved_checkpoints[-1][0], np.triu(IP_array_true), rtol=rtol,
+                atol=atol)
+            self.assertIsNone(saved_checkpoints[-1][1])
+
+            # Modify the saved inner products so that it is clear they are not
+            # recomputed
+            checkpoint_key = vspc._get_checkpoint_key(
+                vec_handles, np.vdot, IP_array_true[0, 0])
+            vspc._save_checkpoint(
+                checkpoint_path, checkpoint_key, 2. * first_rows,
+                done=first_done)
+        first_done = parallel.bcast(saved_checkpoints[0][1]
+            if parallel.is_rank_zero() else None)
+        parallel.barrier()
+
+        # Resume with more than one set of rows
+        IP_array_resumed_true = np.triu(IP_array_true)
+        IP_array_resumed_true[:first_done.shape[0]][first_done] *= 2.
+        IP_array_resumed_true += np.triu(IP_array_resumed_true, 1).T
+        for root_only in [False, True]:
+            self.vec_space.max_vecs_per_proc = 3 + parallel.get_num_procs()
+            IP_array = self.vec_space.compute_symm_inner_product_array(
+                vec_handles, root_only=root_only,
+                checkpoint_path=checkpoint_path)
+            if root_only and not parallel.is_rank_zero():
+                self.assertIsNone(IP_array)
+            else:
+                np.testing.assert_allclose(
+                    IP_array, IP_array_resumed_true, rtol=rtol, atol=atol)
+
+
+    #@unittest.skip('Testing other things')
+    def test_extend_inner_product_arrays(self):
+        """Test appending new vecs to inner product arrays."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_states = 6
+        num_vecs = self.total_num_vecs_in_mem + 1
+        num_new_vecs = 3
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        vec_handles = [
+            VecHandlePickle(vec_path % i)
+            for i in range(2 * (num_vecs + num_new_vecs))]
+        vec_array = (
+            parallel.call_and_bcast(
+                np.random.random, (num_states, len(vec_handles))) +
+            1j * parallel.call_and_bcast(
+                np.random.random, (num_states, len(vec_handles))))
+        if parallel.is_rank_zero():
+            for vec_index, vec_handle in enumerate(vec_handles):
+                vec_handle.put(vec_array[:, vec_index])
+        parallel.barrier()
+        num_all_vecs = num_vecs + num_new_vecs
+        row_vec_handles = vec_handles[:num_all_vecs]
+        col_vec_handles = vec_handles[num_all_vecs:]
+        row_vec_array = vec_array[:, :num_all_vecs]
+        col_vec_array = vec_array[:, num_all_vecs:]
+
+        # Symmetric array, including starting from no vecs
+        for num_old_vecs in [0, num_vecs]:
+            if num_old_vecs == 0:
+                IP_array = np.zeros((0, 0))
+            else:
+                IP_array = self.vec_space.compute_symm_inner_product_array(
+                    row_vec_handles[:num_old_vecs])
+            IP_array_extended = self.vec_space.extend_symm_inner_product_array(
+                IP_array, row_vec_handles[:num_old_vecs],
+                row_vec_handles[num_old_vecs:])
+            np.testing.assert_allclose(
+                IP_array_extended, row_vec_array.conj().T.dot(row_vec_array),
+                rtol=rtol, atol=atol)
+
+        # Non-symmetric array, with new rows, new cols, or both
+        IP_array = self.vec_space.compute_inner_product_array(
+            row_vec_handles[:num_vecs], col_vec_handles[:num_vecs])
+        for num_row_vecs, num_col_vecs in [
+            (num_all_vecs, num_vecs), (num_vecs, num_all_vecs),
+            (num_all_vecs, num_all_vecs)]:
+            IP_array_extended = self.vec_space.extend_inner_product_array(
+                IP_array, row_vec_handles[:num_vecs],
+                col_vec_handles[:num_vecs],
+                new_row_vec_handles=row_vec_handles[num_vecs:num_row_vecs],
+                new_col_vec_handles=col_vec_handles[num_vecs:num_col_vecs])
+            np.testing.assert_allclose(
+                IP_array_extended,
+                row_vec_array[:, :num_row_vecs].conj().T.dot(
+                    col_vec_array[:, :num_col_vecs]),
+                rtol=rtol, atol=atol)
+
+        # Assemble on rank zero only
+        IP_array = self.vec_space.compute_symm_inner_product_array(
+            row_vec_handles[:num_vecs], root_only=True)
+        IP_array_extended = self.vec_space.extend_symm_inner_product_array(
+            IP_array, row_vec_handles[:num_vecs], row_vec_handles[num_vecs:],
+            root_only=True)
+        if parallel.is_rank_zero():
+            np.testing.assert_allclose(
+                IP_array_extended, row_vec_array.conj().T.dot(row_vec_array),
+                rtol=rtol, atol=atol)
+        else:
+            self.assertIsNone(IP_array_extended)
+
+        # The array must match the handles
+        self.assertRaises(
+            ValueError, self.vec_space.extend_symm_inner_product_array,
+            np.zeros((num_vecs, num_vecs)), row_vec_handles[:num_vecs - 1],
+            row_vec_handles[num_vecs:])
+
+
+    #@unittest.skip('Testing other things')
+    def test_vec_cache(self):
+        """Test that cached vecs are not retrieved again by later operations."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_states = 6
+        num_vecs = self.total_num_vecs_in_mem + 2
+        num_gets = [0]
+        class CountingHandle(VecHandlePickle):
+            def _get(self):
+                num_gets[0] += 1
+                return VecHandlePickle._get(self)
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        sum_path = join(self.test_dir, 'sum_%03d.pkl')
+        vec_handles = [CountingHandle(vec_path % i) for i in range(num_vecs)]
+        sum_handles = [VecHandlePickle(sum_path % i) for i in range(2)]
+        vec_array = parallel.call_and_bcast(
+            np.random.random, (num_states, num_vecs))
+        if parallel.is_rank_zero():
+            for i, h in enumerate(vec_handles):
+                h.put(vec_array[:, i])
+        parallel.barrier()
+        coeff_array = parallel.call_and_bcast(np.random.random, (num_vecs, 2))
+        vec_nbytes = vec_array[:, 0].nbytes
+
+        # All vecs fit in the cache, so each is retrieved only once
+        vec_cache = vspc.VecCache(num_vecs * vec_nbytes)
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot, verbosity=0, vec_cache=vec_cache)
+        vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(vec_handles),
+            vec_array.T.dot(vec_array), rtol=rtol, atol=atol)
+        num_gets_decomp = num_gets[0]
+        vec_space.lin_combine(sum_handles, vec_handles, coeff_array)
+        sum_array = np.array([h.get() for h in sum_handles]).T
+        np.testing.assert_allclose(
+            sum_array, vec_array.dot(coeff_array), rtol=rtol, atol=atol)
+        stats = vec_cache.get_stats()
+        self.assertEqual(stats['num_evictions'], 0)
+        self.assertEqual(stats['nbytes'], stats['num_vecs'] * vec_nbytes)
+        self.assertEqual(stats['num_misses'], num_gets[0])
+        self.assertTrue(stats['num_hits'] > 0)
+        # In parallel, the vecs are divided among the procs differently by
+        # the two operations, and each proc only caches the vecs it retrieves
+        if not parallel.is_distributed():
+            self.assertEqual(num_gets[0], num_gets_decomp)
+            self.assertEqual(num_gets[0], num_vecs)
+
+        # Putting a vec with a cached handle removes it from the cache
+        vec_space.lin_combine(vec_handles[:1], vec_handles, coeff_array[:, :1])
+        np.testing.assert_allclose(
+            vec_space.compute_inner_product_array(
+                vec_handles[:1], vec_handles[:1]),
+            [[sum_array[:, 0].dot(sum_array[:, 0])]], rtol=rtol, atol=atol)
+
+        # A small cache holds the most recently used vecs
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot, verbosity=0, vec_cache=2 * vec_nbytes)
+        vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+        vec_space.compute_symm_inner_product_array(vec_handles)
+        self.assertTrue(len(vec_space.vec_cache) <= 2)
+        self.assertTrue(vec_space.vec_cache.nbytes <= 2 * vec_nbytes)
+        self.assertTrue(vec_space.vec_cache.num_evictions > 0)
+        vec_space.vec_cache.clear()
+        self.assertEqual(len(vec_space.vec_cache), 0)
+        self.assertEqual(vec_space.vec_cache.nbytes, 0)
+
+
+    #@unittest.skip('Testing other things')
+    def test_IP_array_store(self):
+        """Test that stored inner product arrays are loaded, not recomputed."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_states = 6
+        num_vecs = self.total_num_vecs_in_mem + 2
+        num_gets = _CountingVecHandle.num_gets
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        vec_handles = [
+            _CountingVecHandle(vec_path % i) for i in range(2 * num_vecs)]
+        vec_array = parallel.call_and_bcast(
+            np.random.random, (num_states, 2 * num_vecs))
+        if parallel.is_rank_zero():
+            for i, h in enumerate(vec_handles):
+                h.put(vec_array[:, i])
+        parallel.barrier()
+        row_vec_handles = vec_handles[:num_vecs]
+        col_vec_handles = vec_handles[num_vecs:]
+        IP_array_true = vec_array.T.dot(vec_array)
+        store_dir = join(self.test_dir, 'IP_arrays')
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot, verbosity=0, IP_array_store=store_dir)
+        vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+
+        # The second computation of each array loads it, with no gets
+        for compute_IP_array in [
+            lambda: vec_space.compute_inner_product_array(
+                row_vec_handles, col_vec_handles),
+            lambda: vec_space.compute_symm_inner_product_array(
+                row_vec_handles)]:
+            IP_array = compute_IP_array()
+            num_gets[0] = 0
+            np.testing.assert_allclose(
+                compute_IP_array(), IP_array, rtol=rtol, atol=atol)
+            self.assertEqual(num_gets[0], 0)
+        np.testing.assert_allclose(
+            IP_array, IP_array_true[:num_vecs, :num_vecs], rtol=rtol,
+            atol=atol)
+
+        # Only the arrays that are not stored are computed, and arrays
+        # computed together are stored separately
+        symm_IP_array, IP_array = vec_space.compute_inner_product_arrays([
+            (row_vec_handles, row_vec_handles),
+            (col_vec_handles, col_vec_handles)])
+        np.testing.assert_allclose(
+            IP_array, IP_array_true[num_vecs:, num_vecs:], rtol=rtol,
+            atol=atol)
+        num_gets[0] = 0
+        np.testing.assert_allclose(
+            vec_space.compute_inner_product_array(
+                col_vec_handles, col_vec_handles),
+            IP_array, rtol=rtol, atol=atol)
+        self.assertEqual(num_gets[0], 0)
+        if parallel.is_rank_zero():
+            stats = vec_space.IP_array_store.get_stats()
+            self.assertEqual(stats['num_arrays'], 4)
+            self.assertEqual(stats['num_hits'], 3)
+
+        # Changing a vec changes the key, so the array is recomputed
+        vec_array[:, 0] += 1.
+        if parallel.is_rank_zero():
+            os.remove(vec_path % 0)
+            vec_handles[0].put(vec_array[:, 0])
+        parallel.barrier()
+        np.testing.assert_allclose(
+            vec_space.compute_symm_inner_product_array(row_vec_handles),
+            vec_array[:, :num_vecs].T.dot(vec_array[:, :num_vecs]),
+            rtol=rtol, atol=atol)
+
+        # A store that fits only one array keeps the most recent one
+        if parallel.is_rank_zero():
+            vec_space.IP_array_store.clear()
+        parallel.barrier()
+        vec_space.compute_inner_product_array(
+            row_vec_handles, col_vec_handles)
+        if parallel.is_rank_zero():
+            stats = vec_space.IP_array_store.get_stats()
+            vec_space.IP_array_store.max_bytes = int(1.5 * stats['nbytes'])
+        vec_space.compute_inner_product_array(
+            col_vec_handles, row_vec_handles)
+        if parallel.is_rank_zero():
+            stats = vec_space.IP_array_store.get_stats()
+            self.assertEqual(stats['num_arrays'], 1)
+            self.assertEqual(stats['num_evictions'], 1)
+
+        # Arrays cannot be identified exactly if the inner product cannot be
+        # pickled, e.g., closures with different weights, so they are neither
+        # loaded nor stored
+        if parallel.is_rank_zero():
+            vec_space.IP_array_store.clear()
+            vec_space.IP_array_store.max_bytes = None
+        parallel.barrier()
+        for weight in [1., 2.]:
+            vec_space.inner_product = lambda v1, v2: weight * np.vdot(v1, v2)
+            np.testing.assert_allclose(
+                vec_space.compute_symm_inner_product_array(row_vec_handles),
+                weight * vec_array[:, :num_vecs].T.dot(
+                    vec_array[:, :num_vecs]),
+                rtol=rtol, atol=atol)
+        if parallel.is_rank_zero():
+            self.assertEqual(
+                vec_space.IP_array_store.get_stats()['num_arrays'], 0)
+
+        # The block inner product function is part of the key
+        if parallel.is_rank_zero():
+            key = vec_space.IP_array_store.get_key(np.vdot, (vec_handles,))
+            self.assertIsNotNone(key)
+            self.assertNotEqual(
+                vec_space.IP_array_store.get_key(
+                    np.vdot, (vec_handles,),
+                    inner_product_block=inner_product_block_array_uniform),
+                key)
+
+
+    #@unittest.skip('Testing other things')
+    def test_perf_stats(self):
+        """Test the statistics recorded by each operation."""
+        num_states = 6
+        num_vecs = self.total_num_vecs_in_mem + 2
+        num_sums = 3
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        sum_path = join(self.test_dir, 'sum_%03d.pkl')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        sum_handles = [VecHandlePickle(sum_path % i) for i in range(num_sums)]
+        vec_array = parallel.call_and_bcast(
+            np.random.random, (num_states, num_vecs))
+        if parallel.is_rank_zero():
+            for i, h in enumerate(vec_handles):
+                h.put(vec_array[:, i])
+        parallel.barrier()
+        vec_nbytes = vec_array[:, 0].nbytes
+        num_procs = parallel.get_num_procs()
+
+        # Every inner product is counted once, besides the burned and timed
+        # ones
+        self.vec_space.compute_inner_product_array(vec_handles, vec_handles)
+        summary = self.vec_space.perf_stats_summary
+        self.assertEqual(
+            summary['num_IPs']['sum'], num_vecs ** 2 + 2 * num_procs)
+        self.assertEqual(
+            summary['get_bytes']['sum'],
+            summary['num_gets']['sum'] * vec_nbytes)
+        self.assertEqual(summary['num_puts']['sum'], 0)
+        for field in ['get_time', 'IP_time', 'total_time']:
+            self.assertTrue(summary[field]['max'] > 0)
+            self.assertTrue(
+                summary[field]['min'] <= summary[field]['max'] <=
+                summary[field]['sum'])
+        self.assertEqual(
+            self.vec_space.perf_stats.to_dict()['num_IPs'],
+            self.vec_space.perf_stats.num_IPs)
+        if parallel.is_distributed():
+            self.assertTrue(summary['num_sends']['sum'] > 0)
+        else:
+            self.assertEqual(summary['num_sends']['sum'], 0)
+
+        # Each operation starts from zero, including nested ones
+        self.vec_space.compute_inner_product_arrays(
+            [(vec_handles, vec_handles)])
+        self.assertEqual(
+            self.vec_space.perf_stats_summary['num_IPs']['sum'],
+            num_vecs * (num_vecs + 1) // 2 + 2 * num_procs)
+        self.vec_space.lin_combine(
+            sum_handles, vec_handles,
+            parallel.call_and_bcast(np.random.random, (num_vecs, num_sums)))
+        summary = self.vec_space.perf_stats_summary
+        self.assertEqual(summary['num_IPs']['sum'], 0)
+        self.assertEqual(summary['num_puts']['sum'], num_sums)
+        self.assertEqual(summary['put_bytes']['sum'], num_sums * vec_nbytes)
+        self.assertTrue(summary['arithmetic_time']['sum'] > 0)
+
+
+    #@unittest.skip('Testing other things')
+    def test_tracer(self):
+        """Test that the spans of each MPI worker are written to a trace."""
+        num_states = 6
+        num_vecs = self.total_num_vecs_in_mem + 2
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        sum_path = join(self.test_dir, 'sum_%03d.pkl')
+        trace_path = join(self.test_dir, 'trace.json')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        sum_handles = [VecHandlePickle(sum_path % i) for i in range(2)]
+        vec_array = parallel.call_and_bcast(
+            np.random.random, (num_states, num_vecs))
+        if parallel.is_rank_zero():
+            for i, h in enumerate(vec_handles):
+                h.put(vec_array[:, i])
+        parallel.barrier()
+
+        tracer = vspc.Tracer()
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot, verbosity=0, tracer=tracer)
+        vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+        IP_array = vec_space.compute_symm_inner_product_array(vec_handles)
+        with vec_space.trace_span('eigensolve', num_vecs=num_vecs):
+            np.linalg.eigh(IP_array)
+        vec_space.lin_combine(
+            sum_handles, vec_handles, np.ones((num_vecs, 2)))
+        tracer.save(trace_path)
+
+        if parallel.is_rank_zero():
+            with open(trace_path) as file_obj:
+                events = json.load(file_obj)['traceEvents']
+            spans = [event for event in events if event['ph'] == 'X']
+            span_names = set(span['name'] for span in spans)
+            expected_span_names = set([
+                'compute_symm_inner_product_array', 'lin_combine', 'get',
+                'put', 'IP block', 'arithmetic', 'barrier', 'gather',
+                'eigensolve'])
+            if parallel.is_distributed():
+                expected_span_names |= set(['send', 'recv'])
+            self.assertEqual(expected_span_names - span_names, set())
+            self.assertEqual(
+                set(span['pid'] for span in spans),
+                set(range(parallel.get_num_procs())))
+            for span in spans:
+                self.assertTrue(span['ts'] >= 0)
+                self.assertTrue(span['dur'] >= 0)
+            eigensolve_span = [
+                span for span in spans if span['name'] == 'eigensolve'][0]
+            self.assertEqual(eigensolve_span['args'], {'num_vecs': num_vecs})
+
+            # The operations contain the spans of their parts
+            operation_span = [
+                span for span in spans
+                if span['name'] == 'compute_symm_inner_product_array'][0]
+            for span in spans:
+                if span['name'] == 'IP block' and span['pid'] == 0:
+                    self.assertTrue(
+                        operation_span['ts'] <= span['ts'] <=
+                        operation_span['ts'] + operation_span['dur'])
+                    break
+        tracer.clear()
+        self.assertEqual(tracer.spans, [])
+
+
+    #@unittest.skip('Testing other things')
+    def test_progress(self):
+        """Test that progress is reported from counts of completed tasks."""
+        num_states = 6
+        num_vecs = self.total_num_vecs_in_mem + 2
+        # Every MPI worker computes some of the sums, so it reports progress
+        num_sums = parallel.get_num_procs() + 2
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        sum_path = join(self.test_dir, 'sum_%03d.pkl')
+        vec_handles = [VecHandlePickle(vec_path % i) for i in range(num_vecs)]
+        sum_handles = [VecHandlePickle(sum_path % i) for i in range(num_sums)]
+        vec_array = parallel.call_and_bcast(
+            np.random.random, (num_states, num_vecs))
+        if parallel.is_rank_zero():
+            for i, h in enumerate(vec_handles):
+                h.put(vec_array[:, i])
+        parallel.barrier()
+
+        # Report as often as possible
+        progress_list = []
+        vec_space = vspc.VectorSpaceHandles(
+            inner_product=np.vdot, verbosity=0, print_interval=-1,
+            progress_callback=progress_list.append)
+        vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+        for compute, operation, num_tasks in [
+            (lambda: vec_space.compute_inner_product_array(
+                vec_handles, vec_handles[:-1]),
+            'compute_inner_product_array', num_vecs * (num_vecs - 1)),
+            (lambda: vec_space.compute_symm_inner_product_array(vec_handles),
+            'compute_symm_inner_product_array',
+            num_vecs * (num_vecs + 1) // 2),
+            (lambda: vec_space.lin_combine(
+                sum_handles, vec_handles, np.ones((num_vecs, num_sums))),
+            'lin_combine', num_vecs * num_sums)]:
+            del progress_list[:]
+            compute()
+            self.assertTrue(len(progress_list) > 1)
+            for progress in progress_list:
+                self.assertEqual(progress.operation, operation)
+                self.assertEqual(progress.num_tasks, num_tasks)
+                self.assertTrue(progress.num_completed <= num_tasks)
+            for progress in progress_list[:-1]:
+                self.assertFalse(progress.is_done)
+                self.assertTrue(progress.num_completed > 0)
+                self.assertTrue(progress.remaining_time >= 0)
+            self.assertEqual(
+                [progress.num_completed for progress in progress_list[:-1]],
+                sorted(progress.num_completed
+                    for progress in progress_list[:-1]))
+
+            # The last report counts the tasks of all MPI workers
+            self.assertTrue(progress_list[-1].is_done)
+            self.assertEqual(progress_list[-1].num_completed, num_tasks)
+            self.assertEqual(progress_list[-1].remaining_time, 0.)
+
+
+    #@unittest.skip('Testing other things')
+    def test_get_many_put_many(self):
+        """Test that chunks of vecs are retrieved and put in batches."""
+        rtol = 1e-10
+        atol = 1e-12
+        num_states = 6
+        num_vecs = self.total_num_vecs_in_mem + 2
+        num_sums = 4
+        get_batch_sizes = []
+        put_batch_sizes = []
+        class BatchHandle(VecHandlePickle):
+            @classmethod
+            def get_many(cls, vec_handles):
+                get_batch_sizes.append(len(vec_handles))
+                return VecHandlePickle.get_many(vec_handles)
+            @classmethod
+            def put_many(cls, vec_handles, vecs):
+                put_batch_sizes.append(len(vec_handles))
+                VecHandlePickle.put_many(vec_handles, vecs)
+        vec_path = join(self.test_dir, 'vec_%03d.pkl')
+        sum_path = join(self.test_dir, 'sum_%03d.pkl')
+        vec_handles = [BatchHandle(vec_path % i) for i in range(num_vecs)]
+        vec_array = parallel.call_and_bcast(
+            np.random.random, (num_states, num_vecs))
+        if parallel.is_rank_zero():
+            for i, h in enumerate(vec_handles):
+                h.put(vec_array[:, i])
+        parallel.barrier()
+        coeff_array = parallel.call_and_bcast(
+            np.random.random, (num_vecs, num_sums))
+        self.assertEqual(put_batch_sizes, [])
+
+        for write_behind in [0, 2]:
+            del get_batch_sizes[:]
+            del put_batch_sizes[:]
+            vec_space = vspc.VectorSpaceHandles(
+                inner_product=np.vdot, verbosity=0, write_behind=write_behind)
+            vec_space.max_vecs_per_proc = self.max_vecs_per_proc
+            np.testing.assert_allclose(
+                vec_space.compute_inner_product_array(
+                    vec_handles, vec_handles),
+                vec_array.T.dot(vec_array), rtol=rtol, atol=atol)
+
+            # Every vec is retrieved in a batch, and batches hold whole chunks
+            self.assertEqual(
+                sum(get_batch_sizes), vec_space.perf_stats.num_gets)
+            self.assertLess(len(get_batch_sizes), sum(get_batch_sizes))
+
+            sum_handles = [
+                BatchHandle(sum_path % i) for i in range(num_sums)]
+            vec_space.lin_combine(sum_handles, vec_handles, coeff_array)
+            sum_array = np.array([h.get() for h in sum_handles]).T
+            np.testing.assert_allclose(
+                sum_array, vec_array.dot(coeff_array), rtol=rtol, atol=atol)
+            self.assertEqual(
+                sum(parallel.allgather(sum(put_batch_sizes))), num_sums)
+
+
 if __name__=='__main__':
     unittest.main()
@@ -1,6 +1,7 @@
 """A group of useful functions"""
 import inspect
 import os
+import pickle
 
 import numpy as np
 
@@ -164,6 +165,32 @@ def get_data_members(obj):
     return data_members
 
 
+def get_available_memory():
+    """Returns the memory available on this node, in bytes, or ``None`` if it
+    cannot be determined.  Uses ``/proc/meminfo`` if it exists (Linux),
+    otherwise ``os.sysconf``."""
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def get_nbytes(obj):
+    """Returns the approximate size of ``obj`` in memory, in bytes.  Uses the
+    ``nbytes`` attribute if ``obj`` has one (e.g., numpy arrays), otherwise the
+    size of ``obj`` when pickled."""
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
 def sum_arrays(arr1, arr2):
     """Used for ``allreduce`` command."""
     return np.array(arr1) + np.array(arr2)
@@ -188,7 +215,18 @@ def smart_eq(arg1, arg2):
 
 
 class InnerProductBlock(object):
-    """Only used in tests. Takes inner product of all vectors."""
+    """Callable that takes inner products of all pairs of vectors, using a
+    function that computes the inner product of two vector objects.
+
+    Args:
+        ``inner_product``: Function that computes inner product of two vector
+        objects.
+
+    Calling an instance with lists ``vecs1`` and ``vecs2`` returns a 2D array
+    whose ``[i, j]`` element is ``inner_product(vecs1[i], vecs2[j])``.  This is
+    the fallback used by :py:class:`vectorspace.VectorSpaceHandles` when no
+    ``inner_product_block`` function is supplied.
+    """
     def __init__(self, inner_product):
         self.inner_product = inner_product
 
@@ -196,12 +234,16 @@ class InnerProductBlock(object):
     def __call__(self, vecs1, vecs2):
         n1 = len(vecs1)
         n2 = len(vecs2)
-        IP_array = np.zeros(
-            (n1, n2),
-            dtype=type(self.inner_product(vecs1[0], vecs2[0])))
+        IP_array = None
         for i in range(n1):
             for j in range(n2):
-                IP_array[i, j] = self.inner_product(vecs1[i], vecs2[j])
+                IP = self.inner_product(vecs1[i], vecs2[j])
+                # The type of the first inner product sets the dtype
+                if IP_array is None:
+                    IP_array = np.zeros((n1, n2), dtype=type(IP))
+                IP_array[i, j] = IP
+        if IP_array is None:
+            IP_array = np.zeros((n1, n2))
         return IP_array
 
 
@@ -4,17 +4,136 @@ We recommend using these functions and classes when possible.
 Otherwise, you can write your own vector class and/or vector handle,
 see documentation :ref:`sec_details`.
 """
+import bz2
+from collections import OrderedDict
+import functools
+import json
+import os
 import pickle
+import threading
+import zlib
+try:
+    import lzma
+except ImportError:
+    lzma = None
 
 import numpy as np
 
+from . import parallel
 from . import util
 
 
+def _get_storage_key(vec_handle):
+    """Returns a tuple identifying where a handle stores its vector, or None
+    if it does not have a ``vec_path``."""
+    vec_path = getattr(vec_handle, 'vec_path', None)
+    if vec_path is None:
+        return None
+    return (type(vec_handle), vec_path, getattr(vec_handle, 'index', None))
+
+
+class BaseVecCache(object):
+    """Least-recently-used cache of base vectors, keyed by their handles.
+
+    Kwargs:
+        ``max_num_vecs``: Maximum number of base vectors kept in the cache.
+
+    :py:class:`VecHandle` uses one instance, ``VecHandle.base_vec_cache``,
+    shared by all handles in a process, so that each distinct base vector is
+    retrieved only once, even when handles with different base vectors are
+    used in turn, e.g., the mean-subtracted direct and adjoint snapshots of a
+    BPOD.  Base vector handles are matched with ``==``, so they need not be
+    hashable.  An entry is dropped when a vector is put with the same handle,
+    or with a handle of the same class to the same file (see
+    :py:meth:`discard`).
+
+    The numbers of hits, misses, and evictions in this process are stored in
+    the attributes ``num_hits``, ``num_misses``, and ``num_evictions``, and
+    are returned with the size of the cache by :py:meth:`get_stats`.
+    """
+    def __init__(self, max_num_vecs=4):
+        self.max_num_vecs = max_num_vecs
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
+        # List of (base_vec_handle, base_vec), least recently used first
+        self._entries = []
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def _find(self, base_vec_handle):
+        for index, entry in enumerate(self._entries):
+            if entry[0] == base_vec_handle:
+                return index
+        return None
+
+
+    def get_vec(self, base_vec_handle):
+        """Returns the base vector of a handle, calling its ``get`` and adding
+        the result to the cache if it is not in the cache."""
+        with self._lock:
+            index = self._find(base_vec_handle)
+            if index is not None:
+                entry = self._entries.pop(index)
+                self._entries.append(entry)
+                self.num_hits += 1
+                return entry[1]
+            self.num_misses += 1
+        base_vec = base_vec_handle.get()
+        with self._lock:
+            index = self._find(base_vec_handle)
+            if index is not None:
+                self._entries.pop(index)
+            self._entries.append((base_vec_handle, base_vec))
+            while len(self._entries) > self.max_num_vecs:
+                self._entries.pop(0)
+                self.num_evictions += 1
+        return base_vec
+
+
+    def discard(self, vec_handle):
+        """Removes the base vector of a handle from the cache, if present.
+
+        Called whenever a vector is put, so handles are not compared with
+        ``==``, which can be expensive, e.g., for in-memory handles.  Instead,
+        an entry is removed if its handle is ``vec_handle``, or if both are of
+        the same class and have the same ``vec_path`` (and ``index``, if
+        any)."""
+        storage_key = _get_storage_key(vec_handle)
+        with self._lock:
+            self._entries = [
+                entry for entry in self._entries
+                if entry[0] is not vec_handle and (
+                    storage_key is None or
+                    _get_storage_key(entry[0]) != storage_key)]
+
+
+    def clear(self):
+        """Removes all base vectors from the cache."""
+        with self._lock:
+            del self._entries[:]
+
+
+    def get_stats(self):
+        """Returns a dictionary with the numbers of hits, misses, and
+        evictions, and the number of base vectors in the cache."""
+        with self._lock:
+            return {
+                'num_hits': self.num_hits, 'num_misses': self.num_misses,
+                'num_evictions': self.num_evictions,
+                'num_vecs': len(self._entries)}
+
+
 class VecHandle(object):
-    """Recommended base class for vector handles (not required)."""
-    cached_base_vec_handle = None
-    cached_base_vec = None
+    """Recommended base class for vector handles (not required).
+
+    Base vectors are retrieved through ``VecHandle.base_vec_cache``, a
+    :py:class:`BaseVecCache` shared by all handles in a process."""
+    base_vec_cache = BaseVecCache()
 
 
     def __init__(self, base_vec_handle=None, scale=None):
@@ -22,30 +141,58 @@ class VecHandle(object):
         self.scale = scale
 
 
+    def get_base_vec_handle(self):
+        """Returns the handle of the base vector subtracted from the vector,
+        or ``None`` if there is none."""
+        return self.__base_vec_handle
+
+
     def get(self):
         """Get a vector, using the private (user-overwritten) ``_get``
         function.  If available, the base vector will be subtracted from the
         specified vector.  Then, if a scale factor is specified, the
         base-subtracted vector will be scaled.  The scaled, base-subtracted
         vector is then returned."""
-        vec = self._get()
+        return self._process_vec(self._get())
+
+
+    def _process_vec(self, vec):
+        """Subtracts the base vector, if there is one, from a vector returned
+        by ``_get``, then scales it."""
         if self.__base_vec_handle is None:
             return self.__scale_vec(vec)
-        if self.__base_vec_handle == VecHandle.cached_base_vec_handle:
-            base_vec = VecHandle.cached_base_vec
-        else:
-            base_vec = self.__base_vec_handle.get()
-            VecHandle.cached_base_vec_handle = self.__base_vec_handle
-            VecHandle.cached_base_vec = base_vec
+        base_vec = VecHandle.base_vec_cache.get_vec(self.__base_vec_handle)
         return self.__scale_vec(vec - base_vec)
 
 
     def put(self, vec):
         """Put a vector to file or memory using the private (user-overwritten)
         ``_put`` function."""
+        VecHandle.base_vec_cache.discard(self)
         return self._put(vec)
 
 
+    @classmethod
+    def get_many(cls, vec_handles):
+        """Get a list of vectors, one for each handle in ``vec_handles``.  By
+        default, calls :py:meth:`get` on each handle.  Subclasses that can
+        retrieve many vectors with one I/O operation can overwrite this,
+        passing each retrieved vector to ``_process_vec``, which subtracts
+        the base vector and scales it as in :py:meth:`get`."""
+        return [vec_handle.get() for vec_handle in vec_handles]
+
+
+    @classmethod
+    def put_many(cls, vec_handles, vecs):
+        """Put a list of vectors, one for each handle in ``vec_handles``.  By
+        default, calls :py:meth:`put` on each handle.  Subclasses that can
+        store many vectors with one I/O operation can overwrite this, and
+        must then drop each handle from ``VecHandle.base_vec_cache`` with
+        :py:meth:`BaseVecCache.discard`, as :py:meth:`put` does."""
+        for vec_handle, vec in zip(vec_handles, vecs):
+            vec_handle.put(vec)
+
+
     def _get(self):
         """Subclass must overwrite, retrieves a vector."""
         raise NotImplementedError("must be implemented by subclasses")
@@ -134,6 +281,557 @@ class VecHandlePickle(VecHandle):
         return self.vec_path == other.vec_path
 
 
+class VecHandleArrayNpy(VecHandle):
+    """Gets and puts array vector objects from/in numpy ``.npy`` files.
+
+    Kwargs:
+        ``mmap_mode``: Mode in which files are memory-mapped by ``get``, as in
+        ``numpy.load``.  By default (``'r'``), ``get`` returns a read-only
+        array backed by the file, so no data is read or copied until it is
+        used, e.g., by an inner product, which then reads it from the page
+        cache.  Arithmetic, such as subtracting a base vector or scaling,
+        returns a new array in memory.  If None, the file is loaded into
+        memory.
+
+    ``put`` writes a new file and then replaces the old one, so that arrays
+    that are still mapped to the old file remain valid.
+    """
+    def __init__(
+        self, vec_path, base_vec_handle=None, scale=None, mmap_mode='r'):
+        VecHandle.__init__(self, base_vec_handle, scale)
+        self.vec_path = vec_path
+        self.mmap_mode = mmap_mode
+
+
+    def _get(self):
+        """Loads or memory-maps vector from path."""
+        return np.load(
+            self.vec_path, mmap_mode=self.mmap_mode, allow_pickle=False)
+
+
+    def _put(self, vec):
+        """Saves vector to path."""
+        temp_path = self.vec_path + '.tmp'
+        with open(temp_path, 'wb') as file_obj:
+            np.save(file_obj, np.asarray(vec), allow_pickle=False)
+        getattr(os, 'replace', os.rename)(temp_path, self.vec_path)
+
+
+    def __eq__(self, other):
+        if type(other) != type(self):
+            return False
+        return self.vec_path == other.vec_path
+
+
+def _compress_zlib(level, data):
+    return zlib.compress(data, -1 if level is None else level)
+
+
+def _compress_bz2(level, data):
+    return bz2.compress(data, 9 if level is None else level)
+
+
+def _compress_lzma(level, data):
+    return lzma.compress(data, preset=level)
+
+
+# Compression functions, called as compress(level, data), and decompression
+# functions of the codecs available to VecHandleCompressed.  zlib, bz2, and
+# lzma release the GIL, so chunks are (de)compressed in parallel by threads.
+_compression_codecs = {
+    'zlib': (_compress_zlib, zlib.decompress),
+    'bz2': (_compress_bz2, bz2.decompress)}
+if lzma is not None:
+    _compression_codecs['lzma'] = (_compress_lzma, lzma.decompress)
+
+# Thread pools shared by all compressed handles, by number of threads
+_compression_backends = {}
+
+
+def _get_compression_backend(num_threads):
+    if num_threads not in _compression_backends:
+        _compression_backends[num_threads] = parallel.ThreadPoolBackend(
+            num_workers=num_threads)
+    return _compression_backends[num_threads]
+
+
+class VecHandleCompressed(VecHandle):
+    """Gets and puts vector objects from/in compressed files.
+
+    Kwargs:
+        ``codec``: Name of the compression codec, ``'zlib'``, ``'bz2'``, or
+        ``'lzma'`` (Python 3 only).  Only used by ``put``; ``get`` reads the
+        codec from the file.
+
+        ``level``: Compression level of the codec, e.g., 0 to 9 for
+        ``'zlib'``.  If None, the codec's default is used.
+
+        ``chunk_nbytes``: Size in bytes of the chunks into which the data is
+        split before it is compressed.
+
+        ``num_threads``: Number of threads that (de)compress chunks in
+        parallel.  Defaults to the number of cores on the node divided by the
+        number of MPI workers on the node.
+
+    Arrays (other than arrays of Python objects) are stored as their raw
+    data, and any other vector object as a pickle.  The data is split into
+    chunks that are compressed independently, so that large vector objects
+    are (de)compressed by several threads.  Compressed files take less time
+    to read when the speed of the file system, not of the CPU, limits the
+    computation.
+    """
+    def __init__(
+        self, vec_path, base_vec_handle=None, scale=None, codec='zlib',
+        level=None, chunk_nbytes=2**20, num_threads=None):
+        VecHandle.__init__(self, base_vec_handle, scale)
+        if codec not in _compression_codecs:
+            raise ValueError(
+                'Compression codec %s is not one of %s' % (
+                    codec, ', '.join(sorted(_compression_codecs))))
+        self.vec_path = vec_path
+        self.codec = codec
+        self.level = level
+        self.chunk_nbytes = chunk_nbytes
+        self.num_threads = num_threads
+
+
+    def _get(self):
+        """Loads and decompresses vector from path."""
+        with open(self.vec_path, 'rb') as file_obj:
+            header = pickle.load(file_obj)
+            chunks = [
+                file_obj.read(chunk_nbytes)
+                for chunk_nbytes in header['chunk_nbytes']]
+        data_chunks = _get_compression_backend(self.num_threads).map(
+            _compression_codecs[header['codec']][1], chunks)
+        if header['dtype'] is None:
+            return pickle.loads(b''.join(data_chunks))
+
+        # Copy the chunks into one buffer, which the array then uses
+        data = bytearray(sum(len(chunk) for chunk in data_chunks))
+        offset = 0
+        for chunk in data_chunks:
+            data[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+        return np.frombuffer(data, dtype=header['dtype']).reshape(
+            header['shape'])
+
+
+    def _put(self, vec):
+        """Compresses and saves vector to path."""
+        if isinstance(vec, np.ndarray) and not vec.dtype.hasobject:
+            vec = np.ascontiguousarray(vec)
+            header = {'dtype': vec.dtype, 'shape': vec.shape}
+            data = memoryview(vec.reshape(-1).view(np.uint8))
+        else:
+            header = {'dtype': None, 'shape': None}
+            data = memoryview(pickle.dumps(vec, protocol=-1))
+        chunks = _get_compression_backend(self.num_threads).map(
+            functools.partial(_compression_codecs[self.codec][0], self.level),
+            [data[start:start + self.chunk_nbytes].tobytes()
+            for start in range(0, max(len(data), 1), self.chunk_nbytes)])
+        header['codec'] = self.codec
+        header['chunk_nbytes'] = [len(chunk) for chunk in chunks]
+        temp_path = self.vec_path + '.tmp'
+        with open(temp_path, 'wb') as file_obj:
+            pickle.dump(header, file_obj, protocol=-1)
+            for chunk in chunks:
+                file_obj.write(chunk)
+        getattr(os, 'replace', os.rename)(temp_path, self.vec_path)
+
+
+    def __eq__(self, other):
+        if type(other) != type(self):
+            return False
+        return self.vec_path == other.vec_path
+
+
+def _find_consecutive_runs(indices):
+    """Returns a list of (start, end) pairs of positions in ``indices`` such
+    that each ``indices[start:end]`` is a run of consecutive integers."""
+    runs = []
+    start = 0
+    for position in range(1, len(indices) + 1):
+        if (
+            position == len(indices) or
+            indices[position] != indices[position - 1] + 1):
+            runs.append((start, position))
+            start = position
+    return runs
+
+
+class SnapshotStore(object):
+    """File containing many array vector objects of the same shape and type,
+    stored one after another after a header.
+
+    Args:
+        ``path``: Path of the file.  If it does not exist, it is created when
+        the first vector object is added.
+
+    Kwargs:
+        ``shape``: Shape of each vector object.  If None, it is read from the
+        file, or found from the first vector object added.
+
+        ``dtype``: Type of the elements of each vector object, as for
+        ``shape``.
+
+        ``mmap_mode``: Mode in which the file is memory-mapped to read vector
+        objects, as in ``numpy.load``.  By default (``'r'``), vector objects
+        are read-only arrays backed by the file.  If None, they are read into
+        memory.
+
+    Storing all of the vector objects in one file avoids opening and closing
+    a file for each one, and consecutive vector objects are read with one
+    contiguous read (see :py:meth:`get_vecs`).  The file is a fixed-size
+    header, holding the shape and type, followed by the elements of each
+    vector object in C order, at a fixed stride.  The number of vector objects
+    is found from the size of the file, so adding vector objects only writes
+    to its end.
+
+    Each vector object is accessed through a :py:class:`VecHandleSnapshot`,
+    returned by :py:meth:`get_handle` and :py:meth:`get_handles`.  Usage::
+
+      store = SnapshotStore('snapshots.bin')
+      for vec in vecs:
+          store.append(vec)
+      vec_handles = store.get_handles()
+
+    When vector objects are put by several MPI workers, e.g., the modes
+    computed by :py:meth:`vectorspace.VectorSpaceHandles.lin_combine`, the
+    file must first be given its final size with :py:meth:`resize`, so that
+    each MPI worker only writes to its own vector objects.
+    """
+    magic = b'MODRED SNAPSHOTS'
+    header_size = 256
+
+    def __init__(self, path, shape=None, dtype=None, mmap_mode='r'):
+        self.path = path
+        self.mmap_mode = mmap_mode
+        self.shape = None
+        self.dtype = None
+        self._memmap = None
+        if os.path.exists(path):
+            self._read_header()
+            if shape is not None and tuple(shape) != self.shape:
+                raise ValueError(
+                    'Shape %s does not match shape %s in %s' % (
+                        str(tuple(shape)), str(self.shape), path))
+            if dtype is not None and np.dtype(dtype) != self.dtype:
+                raise ValueError(
+                    'Type %s does not match type %s in %s' % (
+                        np.dtype(dtype), self.dtype, path))
+        else:
+            if shape is not None:
+                self.shape = tuple(shape)
+            if dtype is not None:
+                self.dtype = np.dtype(dtype)
+
+
+    def __getstate__(self):
+        # Memory maps are not pickled, but recreated when needed
+        state = self.__dict__.copy()
+        state['_memmap'] = None
+        return state
+
+
+    def __eq__(self, other):
+        if type(other) != type(self):
+            return False
+        return self.path == other.path
+
+
+    def __len__(self):
+        if not os.path.exists(self.path):
+            return 0
+        return (
+            (os.path.getsize(self.path) - self.header_size) //
+            self._get_vec_nbytes())
+
+
+    def _get_vec_nbytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+
+    def _read_header(self):
+        with open(self.path, 'rb') as file_obj:
+            header = file_obj.read(self.header_size)
+        if not header.startswith(self.magic):
+            raise ValueError('%s is not a snapshot store' % self.path)
+        header = json.loads(header[len(self.magic):].decode().strip())
+        self.shape = tuple(header['shape'])
+        self.dtype = np.dtype(header['dtype'])
+
+
+    def _write_header(self):
+        header = self.magic + json.dumps(
+            {'shape': list(self.shape), 'dtype': self.dtype.str}).encode()
+        if len(header) >= self.header_size:
+            raise ValueError(
+                'Shape %s is too long for the header' % str(self.shape))
+        with open(self.path, 'wb') as file_obj:
+            file_obj.write(header.ljust(self.header_size - 1) + b'\n')
+
+
+    def _prepare_vec(self, vec):
+        """Returns ``vec`` as a contiguous array of the store's shape and
+        type, setting them if they are not known yet."""
+        vec = np.asarray(vec)
+        if self.shape is None:
+            self.shape = vec.shape
+        if self.dtype is None:
+            self.dtype = vec.dtype
+        if vec.shape != self.shape:
+            raise ValueError(
+                'Shape %s does not match shape %s of %s' % (
+                    str(vec.shape), str(self.shape), self.path))
+        if not np.can_cast(vec.dtype, self.dtype, casting='same_kind'):
+            raise ValueError(
+                'Type %s cannot be stored as type %s in %s' % (
+                    vec.dtype, self.dtype, self.path))
+        if not os.path.exists(self.path):
+            self._write_header()
+        return np.ascontiguousarray(vec, dtype=self.dtype)
+
+
+    def append(self, vec):
+        """Adds a vector object after the last one, and returns its
+        index."""
+        index = len(self)
+        self.put_range(index, [vec])
+        return index
+
+
+    def resize(self, num_vecs):
+        """Changes the number of vector objects in the file.  Added vector
+        objects are zero.  ``shape`` and ``dtype`` must be known."""
+        if self.shape is None or self.dtype is None:
+            raise ValueError(
+                'The shape and type of the vector objects must be known')
+        if not os.path.exists(self.path):
+            self._write_header()
+        with open(self.path, 'r+b') as file_obj:
+            file_obj.truncate(
+                self.header_size + num_vecs * self._get_vec_nbytes())
+        self._memmap = None
+
+
+    def put_range(self, start_index, vecs):
+        """Writes a list of vector objects at consecutive indices from
+        ``start_index``, with one contiguous write.  ``start_index`` may be
+        the number of vector objects, to add them at the end."""
+        vecs = [self._prepare_vec(vec) for vec in vecs]
+        num_vecs = len(self)
+        if not 0 <= start_index <= num_vecs:
+            raise IndexError(
+                'Index %d is out of range for %d vecs in %s' % (
+                    start_index, num_vecs, self.path))
+        if len(vecs) == 0:
+            return
+        with open(self.path, 'r+b') as file_obj:
+            file_obj.seek(
+                self.header_size + start_index * self._get_vec_nbytes())
+            file_obj.write(b''.join(vec.tobytes() for vec in vecs))
+
+
+    def put_vecs(self, indices, vecs):
+        """Writes a list of vector objects at ``indices``, writing each run of
+        consecutive indices with one contiguous write."""
+        for start, end in _find_consecutive_runs(indices):
+            self.put_range(indices[start], vecs[start:end])
+
+
+    def put(self, index, vec):
+        """Writes a vector object at ``index``, which may be the number of
+        vector objects, to add it at the end."""
+        self.put_range(index, [vec])
+
+
+    def get_range(self, start_index, end_index):
+        """Returns a list of the vector objects from ``start_index`` up to,
+        but not including, ``end_index``, read with one contiguous read."""
+        num_vecs = end_index - start_index
+        if num_vecs <= 0:
+            return []
+        if start_index < 0 or end_index > len(self):
+            raise IndexError(
+                'Indices %d to %d are out of range for %d vecs in %s' % (
+                    start_index, end_index, len(self), self.path))
+        if self.mmap_mode is not None:
+            if self._memmap is None or end_index > self._memmap.shape[0]:
+                self._memmap = np.memmap(
+                    self.path, dtype=self.dtype, mode=self.mmap_mode,
+                    offset=self.header_size,
+                    shape=(len(self),) + self.shape)
+            vecs = self._memmap[start_index:end_index]
+        else:
+            with open(self.path, 'rb') as file_obj:
+                file_obj.seek(
+                    self.header_size + start_index * self._get_vec_nbytes())
+                vecs = np.fromfile(
+                    file_obj, dtype=self.dtype,
+                    count=num_vecs * int(np.prod(self.shape))).reshape(
+                    (num_vecs,) + self.shape)
+        return list(vecs)
+
+
+    def get_vecs(self, indices):
+        """Returns a list of the vector objects at ``indices``, reading each
+        run of consecutive indices with one contiguous read."""
+        vecs = []
+        for start, end in _find_consecutive_runs(indices):
+            vecs.extend(self.get_range(indices[start], indices[end - 1] + 1))
+        return vecs
+
+
+    def get(self, index):
+        """Returns the vector object at ``index``."""
+        return self.get_range(index, index + 1)[0]
+
+
+    def get_handle(self, index, base_vec_handle=None, scale=None):
+        """Returns a :py:class:`VecHandleSnapshot` for the vector object at
+        ``index``."""
+        return VecHandleSnapshot(
+            self, index, base_vec_handle=base_vec_handle, scale=scale)
+
+
+    def get_handles(self, indices=None):
+        """Returns a list of :py:class:`VecHandleSnapshot` for the vector
+        objects at ``indices``, by default all of them."""
+        if indices is None:
+            indices = range(len(self))
+        return [self.get_handle(index) for index in indices]
+
+
+class VecHandleSnapshot(VecHandle):
+    """Gets and puts one array vector object in a :py:class:`SnapshotStore`.
+
+    Args:
+        ``store``: A :py:class:`SnapshotStore`, or the path of one.
+
+        ``index``: Index of the vector object in the store.
+
+    Handles made from the same :py:class:`SnapshotStore` share it, so its
+    file is memory-mapped only once.
+    """
+    def __init__(self, store, index, base_vec_handle=None, scale=None):
+        VecHandle.__init__(self, base_vec_handle, scale)
+        if not isinstance(store, SnapshotStore):
+            store = SnapshotStore(store)
+        self.store = store
+        self.index = index
+        self.vec_path = store.path
+
+
+    def _get(self):
+        """Reads the vector from the store."""
+        return self.store.get(self.index)
+
+
+    def _put(self, vec):
+        """Writes the vector to the store."""
+        self.store.put(self.index, vec)
+
+
+    @classmethod
+    def get_many(cls, vec_handles):
+        """Reads the vectors from their stores, reading vectors at
+        consecutive indices in a store with one contiguous read."""
+        vecs = [None] * len(vec_handles)
+        for store, positions in _group_by_store(vec_handles):
+            store_vecs = store.get_vecs(
+                [vec_handles[position].index for position in positions])
+            for position, vec in zip(positions, store_vecs):
+                vecs[position] = vec_handles[position]._process_vec(vec)
+        return vecs
+
+
+    @classmethod
+    def put_many(cls, vec_handles, vecs):
+        """Writes the vectors to their stores, writing vectors at consecutive
+        indices in a store with one contiguous write."""
+        for vec_handle in vec_handles:
+            VecHandle.base_vec_cache.discard(vec_handle)
+        for store, positions in _group_by_store(vec_handles):
+            store.put_vecs(
+                [vec_handles[position].index for position in positions],
+                [vecs[position] for position in positions])
+
+
+    def __eq__(self, other):
+        if type(other) != type(self):
+            return False
+        return self.store == other.store and self.index == other.index
+
+
+def _group_by_store(vec_handles):
+    """Returns a list of (store, positions) pairs, grouping the positions in
+    ``vec_handles`` of handles to the same :py:class:`SnapshotStore`."""
+    groups = OrderedDict()
+    for position, vec_handle in enumerate(vec_handles):
+        if vec_handle.store.path not in groups:
+            groups[vec_handle.store.path] = (vec_handle.store, [])
+        groups[vec_handle.store.path][1].append(position)
+    return list(groups.values())
+
+
+def _group_by_class(vec_handles):
+    """Returns a list of (class, positions) pairs, grouping the positions in
+    ``vec_handles`` of handles of the same class."""
+    groups = OrderedDict()
+    for position, vec_handle in enumerate(vec_handles):
+        groups.setdefault(type(vec_handle), []).append(position)
+    return list(groups.items())
+
+
+def get_vecs(vec_handles):
+    """Gets the vector objects for a list of handles.
+
+    Args:
+        ``vec_handles``: List of vector handles.
+
+    Returns:
+        ``vecs``: List of vector objects, one for each handle.
+
+    Handles of the same class are retrieved together by its ``get_many``
+    method (see :py:meth:`VecHandle.get_many`), so that the class can serve
+    them with one I/O operation.  Handles of classes without ``get_many`` are
+    retrieved one at a time with ``get``.
+    """
+    vecs = [None] * len(vec_handles)
+    for handle_class, positions in _group_by_class(vec_handles):
+        class_vec_handles = [vec_handles[position] for position in positions]
+        if hasattr(handle_class, 'get_many'):
+            class_vecs = handle_class.get_many(class_vec_handles)
+        else:
+            class_vecs = [vec_handle.get() for vec_handle in class_vec_handles]
+        for position, vec in zip(positions, class_vecs):
+            vecs[position] = vec
+    return vecs
+
+
+def put_vecs(vec_handles, vecs):
+    """Puts a list of vector objects using the corresponding handles.
+
+    Args:
+        ``vec_handles``: List of vector handles.
+
+        ``vecs``: List of vector objects, one for each handle.
+
+    Handles of the same class are put together by its ``put_many`` method
+    (see :py:meth:`VecHandle.put_many`).  Handles of classes without
+    ``put_many`` are put one at a time with ``put``.
+    """
+    for handle_class, positions in _group_by_class(vec_handles):
+        class_vec_handles = [vec_handles[position] for position in positions]
+        class_vecs = [vecs[position] for position in positions]
+        if hasattr(handle_class, 'put_many'):
+            handle_class.put_many(class_vec_handles, class_vecs)
+        else:
+            for vec_handle, vec in zip(class_vec_handles, class_vecs):
+                vec_handle.put(vec)
+
+
 def inner_product_array_uniform(vec1, vec2):
     """Takes inner product of numpy arrays without weighting. The first element
     is conjugated, i.e., IP = np.dot(vec1.conj().T, v2)
@@ -141,6 +839,78 @@ def inner_product_array_uniform(vec1, vec2):
     return np.vdot(vec1, vec2)
 
 
+def inner_product_block_array_uniform(vecs1, vecs2):
+    """Takes inner products of all pairs of numpy arrays in ``vecs1`` and
+    ``vecs2`` without weighting, i.e., element ``[i, j]`` of the returned array
+    is ``np.vdot(vecs1[i], vecs2[j])``.
+
+    The arrays are stacked so that the whole block is computed with a single
+    matrix product.  Use this as the ``inner_product_block`` argument of
+    :py:class:`vectorspace.VectorSpaceHandles`.
+    """
+    vecs1 = np.array([np.asarray(vec).ravel() for vec in vecs1])
+    vecs2 = np.array([np.asarray(vec).ravel() for vec in vecs2])
+    return np.dot(vecs1.conj(), vecs2.T)
+
+
+# Number of elements of the scratch buffer used by axpy for numpy arrays
+AXPY_CHUNK_SIZE = 2 ** 16
+
+
+def axpy(sum_vec, scalar, vec):
+    """Adds ``scalar * vec`` to the vector object ``sum_vec``, in place if
+    possible, and returns the result.
+
+    If both are numpy arrays and the result can be stored in ``sum_vec``, it is
+    updated in chunks of :py:data:`AXPY_CHUNK_SIZE` elements, so no full-size
+    temporary array is allocated (if it cannot, e.g., because ``sum_vec`` is
+    real and the result is complex, a new array is returned).  Otherwise, if
+    ``sum_vec`` has an ``axpy`` method (see :py:meth:`Vector.axpy`), it is
+    used.  Otherwise, the result is ``sum_vec += vec * scalar``.
+
+    Used by :py:meth:`vectorspace.VectorSpaceHandles.lin_combine` to
+    accumulate linear combinations.
+    """
+    if isinstance(sum_vec, np.ndarray) and isinstance(vec, np.ndarray):
+        if _can_axpy_array(sum_vec, scalar, vec):
+            return _axpy_array(sum_vec, scalar, vec)
+        return sum_vec + vec * scalar
+    elif hasattr(sum_vec, 'axpy'):
+        return sum_vec.axpy(scalar, vec)
+    sum_vec += vec * scalar
+    return sum_vec
+
+
+def _can_axpy_array(sum_array, scalar, array):
+    """Checks if ``scalar * array`` can be added to ``sum_array`` in place, in
+    chunks."""
+    return (
+        sum_array.shape == array.shape and
+        sum_array.flags.c_contiguous and sum_array.flags.writeable and
+        array.flags.c_contiguous and
+        not np.shares_memory(sum_array, array) and
+        np.can_cast(
+            np.result_type(
+                sum_array.dtype, array.dtype, np.asarray(scalar).dtype),
+            sum_array.dtype))
+
+
+def _axpy_array(sum_array, scalar, array):
+    """Adds ``scalar * array`` to ``sum_array`` in place, in chunks."""
+    flat_sum_array = sum_array.reshape(-1)
+    flat_array = array.reshape(-1)
+    scratch = np.empty(
+        min(flat_array.size, AXPY_CHUNK_SIZE), dtype=sum_array.dtype)
+    for start_index in range(0, flat_array.size, AXPY_CHUNK_SIZE):
+        end_index = min(start_index + AXPY_CHUNK_SIZE, flat_array.size)
+        chunk = scratch[:end_index - start_index]
+        np.multiply(flat_array[start_index:end_index], scalar, out=chunk)
+        np.add(
+            flat_sum_array[start_index:end_index], chunk,
+            out=flat_sum_array[start_index:end_index])
+    return sum_array
+
+
 class InnerProductTrapz(object):
     """Callable that computes inner product of n-dimensional arrays defined on
     a spatial grid, using the trapezoidal rule.
@@ -208,3 +978,16 @@ class Vector(object):
 
     def __sub__(self, other):
         return self + (-1 * other)
+
+
+    def axpy(self, scalar, other):
+        """Adds ``scalar * other`` to this vector object and returns the
+        result.
+
+        Used by :py:meth:`vectorspace.VectorSpaceHandles.lin_combine` to
+        accumulate linear combinations.  Overwrite this to update the data of
+        this vector object in place, without allocating a temporary vector
+        object for ``scalar * other``.  By default, ``+=`` is used."""
+        result = self
+        result += other * scalar
+        return result
@@ -1,13 +1,1049 @@
+from collections import namedtuple, OrderedDict
+import contextlib
 import copy
+import functools
+import hashlib
+import json
+import os
+import pickle
+import threading
 from time import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 import numpy as np
 
 from . import parallel
 from . import util
+from . import vectors
 from .py2to3 import print_msg, range
 
 
+# Description of how the vectors are split into chunks by the handle-based
+# algorithms in VectorSpaceHandles.  See VectorSpaceHandles.compute_chunk_plan.
+ChunkPlan = namedtuple(
+    'ChunkPlan',
+    ['num_rows_per_proc_chunk', 'num_cols_per_proc_chunk', 'num_row_chunks',
+    'num_col_chunks', 'num_row_gets_per_proc', 'num_col_gets_per_proc',
+    'num_sends_per_proc'])
+
+
+# Largest number of vector objects whose symmetric block of inner products is
+# computed in full with ``inner_product_block``, see
+# VectorSpaceHandles._compute_symm_IP_block
+SYMM_IP_BLOCK_LEAF_SIZE = 64
+
+# Largest number of columns of a set of rows of a symmetric inner product
+# array that are computed between chances to save a checkpoint, see
+# VectorSpaceHandles.compute_symm_inner_product_array
+CHECKPOINT_NUM_COLS = 64
+
+
+# Progress of an operation of VectorSpaceHandles, passed to the progress
+# callback.  See VectorSpaceHandles.
+Progress = namedtuple(
+    'Progress',
+    ['operation', 'num_completed', 'num_tasks', 'elapsed_time',
+    'remaining_time', 'is_done'])
+
+
+def _find_chunk_bounds(tasks, num_per_chunk, num_chunks):
+    """Splits a list of consecutive indices into ``num_chunks`` chunks with at
+    most ``num_per_chunk`` indices each, returning a list of ``(start, end)``
+    tuples.  Chunks past the end of ``tasks`` are empty."""
+    if len(tasks) == 0:
+        return [(0, 0)] * num_chunks
+    chunk_bounds = []
+    for chunk_index in range(num_chunks):
+        start_index = min(
+            tasks[0] + chunk_index * num_per_chunk, tasks[-1] + 1)
+        end_index = min(start_index + num_per_chunk, tasks[-1] + 1)
+        chunk_bounds.append((start_index, end_index))
+    return chunk_bounds
+
+
+def _prefetch_vec_chunks(get_vecs, handle_chunks):
+    """Generator that yields ``get_vecs(handles)`` for each list of handles in
+    ``handle_chunks``.  The next chunk is retrieved in a background thread
+    while the caller works on the current one, so at most one chunk is held in
+    memory ahead of the caller."""
+    retrieved_chunks = queue.Queue(maxsize=1)
+    free_slots = threading.Semaphore(1)
+    stop_event = threading.Event()
+
+    def retrieve():
+        for handles in handle_chunks:
+            free_slots.acquire()
+            if stop_event.is_set():
+                return
+            try:
+                retrieved_chunks.put((get_vecs(handles), None))
+            except Exception as error:
+                retrieved_chunks.put((None, error))
+                return
+
+    thread = threading.Thread(target=retrieve)
+    thread.daemon = True
+    thread.start()
+    try:
+        for chunk_index in range(len(handle_chunks)):
+            vecs, error = retrieved_chunks.get()
+            if error is not None:
+                raise error
+            # Let the background thread start on the next chunk
+            free_slots.release()
+            yield vecs
+            del vecs
+    finally:
+        stop_event.set()
+        free_slots.release()
+
+
+def _pipeline_exchanges(
+    send_chunks, dest, source, send_tag, recv_tag,
+    start_exchange_vecs=parallel.start_exchange_vecs):
+    """Generator that exchanges each ``(vecs, indices)`` tuple in the list
+    ``send_chunks`` with other MPI workers, using ``start_exchange_vecs`` (see
+    :py:func:`parallel.start_exchange_vecs`), and yields the received
+    ``(vecs, indices)`` tuples.  The next exchange is started before the
+    current one is yielded, so it proceeds while the caller computes."""
+    if len(send_chunks) == 0:
+        return
+    exchange = start_exchange_vecs(
+        send_chunks[0][0], send_chunks[0][1], dest, source, send_tag, recv_tag)
+    for vecs, indices in send_chunks[1:]:
+        recv_vecs_and_indices = exchange.wait()
+        exchange = start_exchange_vecs(
+            vecs, indices, dest, source, send_tag, recv_tag)
+        yield recv_vecs_and_indices
+    yield exchange.wait()
+
+
+def _cycle_vecs(
+    vecs, indices, dest, source, send_tag, recv_tag,
+    start_exchange_vecs=parallel.start_exchange_vecs):
+    """Generator that passes the vector objects ``vecs`` and their
+    ``indices`` around the ring of MPI workers, and yields the ``(vecs,
+    indices)`` tuple held by this MPI worker on each pass, starting with its
+    own.  The exchange for the next pass is started before the current tuple
+    is yielded, so it proceeds while the caller computes.  In serial, only
+    the own tuple is yielded."""
+    num_procs = parallel.get_num_procs()
+    for pass_index in range(num_procs):
+        if pass_index < num_procs - 1:
+            exchange = start_exchange_vecs(
+                vecs, indices, dest, source, send_tag, recv_tag)
+        yield vecs, indices
+        if pass_index < num_procs - 1:
+            vecs, indices = exchange.wait()
+
+
+def _group_mask_cols(IP_mask):
+    """Groups the columns of the 2D boolean array ``IP_mask`` that are true in
+    the same rows, returning a list of ``(row_indices, col_indices)`` tuples,
+    one for each group with at least one true entry."""
+    groups = {}
+    for col_index in range(IP_mask.shape[1]):
+        key = IP_mask[:, col_index].tobytes()
+        if key not in groups:
+            groups[key] = (
+                np.nonzero(IP_mask[:, col_index])[0].tolist(), [])
+        groups[key][1].append(col_index)
+    return [
+        (row_indices, col_indices)
+        for row_indices, col_indices in groups.values()
+        if len(row_indices) > 0]
+
+
+def _slice_mask(IP_mask, row_indices, col_indices):
+    """Returns the rows and columns of the 2D boolean array ``IP_mask`` with
+    the given indices, or ``None`` if ``IP_mask`` is ``None``."""
+    if IP_mask is None:
+        return None
+    return IP_mask[np.ix_(list(row_indices), list(col_indices))]
+
+
+def _find_distinct_handles(vec_handle_lists):
+    """Returns the list of the distinct handles in the lists of handles
+    ``vec_handle_lists``, identified by identity (``is``), in the order they
+    first appear, and for each list, a 1D array of the positions of its
+    handles in the list of distinct handles."""
+    distinct_vec_handles = []
+    positions = {}
+    list_positions = []
+    for vec_handles in vec_handle_lists:
+        for vec_handle in vec_handles:
+            if id(vec_handle) not in positions:
+                positions[id(vec_handle)] = len(distinct_vec_handles)
+                distinct_vec_handles.append(vec_handle)
+        list_positions.append(np.array(
+            [positions[id(vec_handle)] for vec_handle in vec_handles],
+            dtype=int))
+    return distinct_vec_handles, list_positions
+
+
+def _get_checkpoint_key(vec_handles, inner_product, IP):
+    """Returns a dict that identifies an inner product array computation, made
+    of the number of vectors, a hash of the pickled handles, and the name and
+    a sample value of the inner product function."""
+    handles_hash = hashlib.sha1()
+    for vec_handle in vec_handles:
+        try:
+            handles_hash.update(
+                pickle.dumps(vec_handle, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            handles_hash.update(type(vec_handle).__name__.encode())
+    return {
+        'num_vecs': len(vec_handles),
+        'handles_hash': handles_hash.hexdigest(),
+        'IP_name': getattr(
+            inner_product, '__name__', type(inner_product).__name__),
+        'IP_sample': np.asarray(IP).ravel()[0]}
+
+
+def _load_checkpoint(checkpoint_path, key):
+    """Returns the rows and the array of computed entries saved by
+    :py:func:`_save_checkpoint`, or ``(None, None)`` if there is no
+    checkpoint.  Raises ``ValueError`` if the checkpoint was saved for a
+    different computation."""
+    if not os.path.exists(checkpoint_path):
+        return None, None
+    with open(checkpoint_path, 'rb') as file_obj:
+        checkpoint = np.load(file_obj, allow_pickle=False)
+        if (
+            int(checkpoint['num_vecs']) != key['num_vecs'] or
+            str(checkpoint['handles_hash']) != key['handles_hash'] or
+            str(checkpoint['IP_name']) != key['IP_name'] or
+            checkpoint['rows'].dtype != np.asarray(key['IP_sample']).dtype or
+            not np.allclose(checkpoint['IP_sample'], key['IP_sample'])):
+            raise ValueError((
+                'Checkpoint %s was saved for different vecs or a different '
+                'inner product, remove it to start over') % checkpoint_path)
+        if 'done' in checkpoint.files:
+            return checkpoint['rows'], checkpoint['done']
+        return checkpoint['rows'], None
+
+
+def _save_checkpoint(checkpoint_path, key, rows, done=None):
+    """Saves the first rows of the upper triangle of an inner product array to
+    a ``.npz`` file.  If some of them are incomplete, ``done`` is a boolean
+    array that is true for the entries that were computed.  The file is
+    replaced at once, so an interrupted save leaves the previous checkpoint
+    intact."""
+    temp_path = checkpoint_path + '.tmp'
+    arrays = dict(key, rows=rows)
+    if done is not None:
+        arrays['done'] = done
+    with open(temp_path, 'wb') as file_obj:
+        np.savez(file_obj, **arrays)
+    getattr(os, 'replace', os.rename)(temp_path, checkpoint_path)
+
+
+def _count_complete_rows(IP_done):
+    """Returns the number of leading rows of the upper triangle of a symmetric
+    inner product array for which the boolean array ``IP_done`` is true."""
+    for row_index in range(IP_done.shape[0]):
+        if not IP_done[row_index, row_index:].all():
+            return row_index
+    return IP_done.shape[0]
+
+
+def _move_to_upper_triangle(IP_rows, IP_done=None):
+    """Moves the entries of the first rows of a symmetric inner product array
+    that were only computed below the diagonal above it, in place, and
+    returns the rows with zeros below the diagonal.
+
+    In parallel, some inner products between the vectors of a set of rows are
+    only computed below the diagonal.  Those entries are zero above the
+    diagonal but nonzero below it.  Where both were computed, e.g., for an
+    inner product that is not perfectly symmetric, the entry above the
+    diagonal is kept.  If the boolean array ``IP_done`` of the computed
+    entries is given, it is used to find them instead of the nonzero entries,
+    and it is moved to the upper triangle in the same way."""
+    num_rows = IP_rows.shape[0]
+    square_block = IP_rows[:, :num_rows]
+    if IP_done is None:
+        mask = np.multiply(square_block == 0., square_block.conj().T != 0)
+    else:
+        square_done = IP_done[:, :num_rows]
+        mask = np.multiply(~square_done, square_done.T)
+        IP_done[:, :num_rows] = np.triu(square_done | mask)
+    square_block += np.multiply(np.triu(square_block.conj().T, 1), mask)
+    IP_rows[:, :num_rows] = np.triu(square_block)
+    return IP_rows
+
+
+class PerfStats(object):
+    """Counters and timers of the work done by one MPI worker (processor)
+    during an operation of :py:class:`VectorSpaceHandles`.
+
+    Attributes:
+        ``num_gets``, ``get_bytes``, ``get_time``: Number of vector objects
+        retrieved with their handles, their size in bytes, and the time spent
+        retrieving them.
+
+        ``num_puts``, ``put_bytes``, ``put_time``: The same for the vector
+        objects put with their handles.
+
+        ``num_IPs``, ``IP_time``: Number of inner products and the time spent
+        computing them.
+
+        ``arithmetic_time``: Time spent scaling and adding vector objects.
+
+        ``num_sends``, ``send_bytes``, ``comm_time``: Number and size of the
+        vector objects sent to other MPI workers, and the time spent starting
+        the exchanges and waiting for the received vector objects.
+
+        ``barrier_time``: Time spent waiting for the other MPI workers at
+        barriers.
+
+        ``reduce_time``: Time spent assembling arrays from the rows held by
+        all MPI workers.
+
+        ``total_time``: Duration of the operation.
+
+        ``tracer``: A :py:class:`Tracer` in which each timed block is recorded
+        as a span, or None.
+
+    Sizes are only counted for vector objects with an ``nbytes`` attribute,
+    e.g., numpy arrays.  The times include work done in background threads,
+    e.g., when prefetching or writing behind, so they can add up to more than
+    ``total_time``.
+    """
+    fields = (
+        'num_gets', 'get_bytes', 'get_time', 'num_puts', 'put_bytes',
+        'put_time', 'num_IPs', 'IP_time', 'arithmetic_time', 'num_sends',
+        'send_bytes', 'comm_time', 'barrier_time', 'reduce_time', 'total_time')
+
+    # Names of the spans recorded in the tracer by each timer
+    span_names = {
+        'get_time': 'get', 'put_time': 'put', 'IP_time': 'IP block',
+        'arithmetic_time': 'arithmetic', 'comm_time': 'exchange',
+        'barrier_time': 'barrier', 'reduce_time': 'gather'}
+
+    # Shared by all instances, so that they can be copied
+    _lock = threading.Lock()
+
+    def __init__(self, tracer=None):
+        for field in self.fields:
+            setattr(self, field, 0)
+        self.tracer = tracer
+
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, PerfStats) and self.to_dict() == other.to_dict())
+
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+    def __repr__(self):
+        return 'PerfStats(%s)' % ', '.join(
+            '%s=%r' % (field, getattr(self, field)) for field in self.fields)
+
+
+    def add(self, **counts):
+        """Adds to the counters and timers given as keyword arguments."""
+        with self._lock:
+            for field, count in counts.items():
+                setattr(self, field, getattr(self, field) + count)
+
+
+    @contextlib.contextmanager
+    def timer(self, time_field, span_name=None, **counts):
+        """Context manager that adds the time spent in its block to the timer
+        ``time_field``, and adds to the counters given as keyword arguments.
+        If there is a ``tracer``, the block is recorded as a span named
+        ``span_name``, by default the name in ``span_names``."""
+        start_time = time()
+        try:
+            yield
+        finally:
+            end_time = time()
+            self.add(**dict(counts, **{time_field: end_time - start_time}))
+            if self.tracer is not None:
+                self.tracer.add_span(
+                    span_name or self.span_names[time_field], start_time,
+                    end_time, **counts)
+
+
+    def to_dict(self):
+        """Returns a dictionary of the counters and timers."""
+        return dict((field, getattr(self, field)) for field in self.fields)
+
+
+    def aggregate(self):
+        """Returns a dictionary with the sum, minimum, and maximum of each
+        counter and timer over all MPI workers, e.g.,
+        ``stats['get_time']['max']``.  Must be called on all MPI workers."""
+        all_stats = parallel.allgather(self.to_dict())
+        return dict(
+            (field, {
+                'sum': sum(stats[field] for stats in all_stats),
+                'min': min(stats[field] for stats in all_stats),
+                'max': max(stats[field] for stats in all_stats)})
+            for field in self.fields)
+
+
+class Tracer(object):
+    """Records timestamped spans of the work done by each MPI worker
+    (processor), and writes them to a file in the Chrome trace event format.
+
+    Attach a tracer to :py:class:`VectorSpaceHandles` with its ``tracer``
+    argument.  Each operation is then recorded as a span, containing spans for
+    retrieving (``'get'``) and putting (``'put'``) vector objects, computing
+    blocks of inner products (``'IP block'``) and of linear combinations
+    (``'arithmetic'``), sending (``'send'``) and waiting to receive
+    (``'recv'``) vector objects, waiting at barriers (``'barrier'``), and
+    gathering arrays (``'gather'``).  The high-level classes, e.g.,
+    :py:class:`pod.PODHandles`, add spans for their eigendecompositions.  The
+    counters of :py:class:`PerfStats` are stored as the arguments of the
+    spans.
+
+    Usage::
+
+      tracer = Tracer()
+      vec_space = VectorSpaceHandles(inner_product, tracer=tracer)
+      vec_space.compute_symm_inner_product_array(vec_handles)
+      tracer.save('trace.json')
+
+    The file can be opened with ``chrome://tracing`` or Perfetto, where each
+    MPI worker is shown as a process and each of its threads as a thread, so
+    that stalls and slow MPI workers stand out.  Times are measured by the
+    clock of each node.
+    """
+    def __init__(self):
+        self.spans = []
+        self.thread_names = {}
+
+
+    def add_span(self, name, start_time, end_time, **args):
+        """Records a span named ``name`` on the current thread, from
+        ``start_time`` to ``end_time`` (as returned by ``time.time``), with
+        the keyword arguments as its arguments."""
+        thread = threading.current_thread()
+        self.thread_names[thread.ident] = thread.name
+        self.spans.append(
+            (name, start_time, end_time - start_time, thread.ident, args))
+
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Context manager that records its block as a span named ``name``."""
+        start_time = time()
+        try:
+            yield
+        finally:
+            self.add_span(name, start_time, time(), **args)
+
+
+    def clear(self):
+        """Removes the recorded spans."""
+        self.spans = []
+
+
+    def save(self, path):
+        """Writes the spans recorded by all MPI workers to a JSON file in the
+        Chrome trace event format.  Times are relative to the earliest span.
+        Must be called on all MPI workers; the file is written by rank
+        zero."""
+        all_spans = parallel.allgather((self.spans, self.thread_names))
+        if parallel.is_rank_zero():
+            start_times = [
+                span[1] for spans, thread_names in all_spans for span in spans]
+            first_time = min(start_times) if start_times else 0.
+            events = []
+            for rank, (spans, thread_names) in enumerate(all_spans):
+                events.append({
+                    'name': 'process_name', 'ph': 'M', 'pid': rank,
+                    'args': {'name': 'rank %d' % rank}})
+                for thread_ID, thread_name in thread_names.items():
+                    events.append({
+                        'name': 'thread_name', 'ph': 'M', 'pid': rank,
+                        'tid': thread_ID, 'args': {'name': thread_name}})
+                for name, start_time, duration, thread_ID, args in spans:
+                    events.append({
+                        'name': name, 'ph': 'X', 'pid': rank,
+                        'tid': thread_ID,
+                        'ts': (start_time - first_time) * 1e6,
+                        'dur': duration * 1e6, 'args': args})
+            with open(path, 'w') as file_obj:
+                json.dump(
+                    {'traceEvents': events, 'displayTimeUnit': 'ms'},
+                    file_obj)
+        parallel.barrier()
+
+
+def _records_perf_stats(method):
+    """Decorator for the operations of :py:class:`VectorSpaceHandles`.  The
+    outermost operation replaces ``perf_stats`` with a new
+    :py:class:`PerfStats` and, when it returns, stores the statistics of all
+    MPI workers in ``perf_stats_summary``.  It also shuts down the pool of an
+    execution backend created by :py:class:`VectorSpaceHandles`."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._perf_stats_depth > 0:
+            return method(self, *args, **kwargs)
+        self.perf_stats = PerfStats(tracer=self.tracer)
+        self._perf_stats_depth += 1
+        start_time = time()
+        try:
+            with self.trace_span(method.__name__):
+                outputs = method(self, *args, **kwargs)
+        finally:
+            self._perf_stats_depth -= 1
+            self.perf_stats.add(total_time=time() - start_time)
+            if self._owns_backend:
+                self.backend.shutdown()
+        self.perf_stats_summary = self.perf_stats.aggregate()
+        return outputs
+    return wrapper
+
+
+class _TimedExchange(object):
+    """Wraps a :py:class:`parallel.VecExchange`, adding the time spent waiting
+    for it to the ``comm_time`` of a :py:class:`PerfStats`."""
+    def __init__(self, exchange, perf_stats):
+        self.exchange = exchange
+        self.perf_stats = perf_stats
+
+
+    def wait(self):
+        with self.perf_stats.timer('comm_time', span_name='recv'):
+            return self.exchange.wait()
+
+
+def _count_IPs(IP_mask, num_rows, num_cols):
+    """Returns the number of inner products in a block of ``num_rows`` by
+    ``num_cols`` for which the boolean array ``IP_mask`` is true, or all of
+    them if it is ``None``."""
+    if IP_mask is None:
+        return num_rows * num_cols
+    return int(IP_mask.sum())
+
+
+class _ProgressTracker(object):
+    """Counts the tasks of an operation completed by this MPI worker and
+    reports the progress of the operation every ``print_interval`` seconds of
+    a :py:class:`VectorSpaceHandles`, by printing from rank zero and by calling
+    its ``progress_callback``.
+
+    The tasks are assumed to be divided evenly among the MPI workers, so the
+    number completed by all of them is estimated from this worker's count,
+    and the remaining time from the rate at which it completes them.  The
+    counts of all MPI workers are added by :py:meth:`finish`."""
+    def __init__(self, vec_space, operation, num_tasks, task_name):
+        self.vec_space = vec_space
+        self.operation = operation
+        self.num_tasks = num_tasks
+        self.task_name = task_name
+        self.num_completed = 0
+        self.start_time = time()
+
+
+    def add(self, num_completed):
+        """Adds completed tasks, and reports the progress if it is time."""
+        self.num_completed += num_completed
+        if (
+            time() - self.vec_space.prev_print_time >
+            self.vec_space.print_interval):
+            self.report()
+
+
+    def report(self):
+        """Reports the estimated progress of all MPI workers."""
+        elapsed_time = time() - self.start_time
+        num_completed = min(
+            self.num_completed * parallel.get_num_MPI_workers(),
+            self.num_tasks)
+        if num_completed > 0:
+            remaining_time = (
+                elapsed_time * (self.num_tasks - num_completed) /
+                num_completed)
+            self.vec_space.print_msg(
+                'Completed %.1f%% of %s, about %.1f minutes remaining' % (
+                    num_completed * 100. / max(self.num_tasks, 1),
+                    self.task_name, remaining_time / 60.),
+                output_channel='stderr')
+        else:
+            remaining_time = None
+        self._call_back(Progress(
+            operation=self.operation, num_completed=num_completed,
+            num_tasks=self.num_tasks, elapsed_time=elapsed_time,
+            remaining_time=remaining_time, is_done=False))
+
+
+    def finish(self):
+        """Reports the completion of the operation, with the number of tasks
+        completed by all MPI workers.  Must be called on all MPI workers."""
+        num_completed = sum(parallel.allgather(self.num_completed))
+        self.vec_space.print_msg(
+            'Completed 100%% of %s' % self.task_name, output_channel='stderr')
+        self._call_back(Progress(
+            operation=self.operation, num_completed=num_completed,
+            num_tasks=self.num_tasks, elapsed_time=time() - self.start_time,
+            remaining_time=0., is_done=True))
+
+
+    def _call_back(self, progress):
+        if self.vec_space.progress_callback is not None:
+            self.vec_space.progress_callback(progress)
+        self.vec_space.prev_print_time = time()
+
+
+class _SymmCheckpoint(object):
+    """Saves the inner products of a symmetric inner product array computed
+    by a :py:class:`VectorSpaceHandles` to the ``.npz`` file
+    ``checkpoint_path``, at most once every ``checkpoint_interval`` seconds,
+    and restores those saved by a previous run.  Only rank zero reads and
+    writes the file, and keeps the saved rows.
+
+    The file holds the first rows of the upper triangle of the array and, if
+    some of them are incomplete, a boolean array of the entries that were
+    computed.  When resuming, the leading complete rows are skipped, and the
+    saved entries of the rows after them are not computed again."""
+    def __init__(
+        self, vec_space, checkpoint_path, checkpoint_interval, vec_handles,
+        IP):
+        self.vec_space = vec_space
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.num_vecs = len(vec_handles)
+        self.key = parallel.call_from_rank_zero(
+            _get_checkpoint_key, vec_handles, vec_space.inner_product, IP)
+        saved_rows, saved_done = None, None
+        try:
+            if parallel.is_rank_zero():
+                saved_rows, saved_done = _load_checkpoint(
+                    checkpoint_path, self.key)
+            error = None
+        except ValueError as load_error:
+            error = load_error
+        error = parallel.bcast(error)
+        if error is not None:
+            raise error
+
+        # Split the saved rows into the complete ones and the rest, of which
+        # only the columns of the remaining vecs are needed.
+        self.complete_rows = None
+        self.partial_rows = None
+        self.partial_done = None
+        num_saved_rows = 0
+        num_complete_rows = 0
+        if saved_rows is not None:
+            num_saved_rows = saved_rows.shape[0]
+            num_complete_rows = num_saved_rows
+            if saved_done is not None:
+                num_complete_rows = _count_complete_rows(saved_done)
+                self.partial_rows = saved_rows[
+                    num_complete_rows:, num_complete_rows:]
+                self.partial_done = saved_done[
+                    num_complete_rows:, num_complete_rows:]
+            self.complete_rows = saved_rows[:num_complete_rows]
+        self.num_saved_rows = parallel.bcast(num_saved_rows)
+        self.num_complete_rows = parallel.bcast(num_complete_rows)
+        self.prev_save_time = time()
+
+
+    def get_remaining_IP_mask(self, IP_mask):
+        """Returns the symmetric boolean array of the inner products between
+        the vecs after the complete rows that remain to be computed, given
+        the array ``IP_mask`` of those needed between all vecs, or ``None``
+        if all of them are needed and none were saved."""
+        if IP_mask is not None:
+            IP_mask = IP_mask[
+                self.num_complete_rows:, self.num_complete_rows:]
+        saved_mask = None
+        if self.partial_done is not None:
+            num_remaining_vecs = self.num_vecs - self.num_complete_rows
+            saved_mask = np.zeros(
+                (num_remaining_vecs, num_remaining_vecs), dtype=bool)
+            saved_mask[:self.partial_done.shape[0]] = self.partial_done
+            saved_mask |= saved_mask.T
+        saved_mask = parallel.bcast(saved_mask)
+        if saved_mask is None:
+            return IP_mask
+        if IP_mask is None:
+            return ~saved_mask
+        return np.multiply(IP_mask, ~saved_mask)
+
+
+    def save_if_due(self, IP_rows, IP_done, row_indices, num_rows):
+        """Saves the inner products computed so far if ``checkpoint_interval``
+        seconds have passed since the last save.  ``IP_rows`` are the rows of
+        the array of the remaining vecs held by this MPI worker, with indices
+        ``row_indices`` among the first ``num_rows`` rows, and ``IP_done`` is
+        true for their entries that were computed.  Must be called on all MPI
+        workers."""
+        if not parallel.bcast(
+            time() - self.prev_save_time > self.checkpoint_interval):
+            return
+        IP_rows = self.vec_space._gather_array_rows(
+            IP_rows, row_indices, num_rows, root_only=True)
+        IP_done = self.vec_space._gather_array_rows(
+            IP_done, row_indices, num_rows, root_only=True)
+        if parallel.is_rank_zero():
+            # In serial, the gathered rows are the ones still being computed
+            if not parallel.is_distributed():
+                IP_rows, IP_done = IP_rows.copy(), IP_done.copy()
+            IP_rows, IP_done = self.add_saved_rows(
+                _move_to_upper_triangle(IP_rows, IP_done), IP_done)
+            if _count_complete_rows(IP_done) == IP_done.shape[0]:
+                IP_done = None
+            _save_checkpoint(
+                self.checkpoint_path, self.key, IP_rows, done=IP_done)
+        self.prev_save_time = time()
+
+
+    def bcast_saved_rows(self):
+        """Broadcasts the saved rows from rank zero to all MPI workers."""
+        self.complete_rows, self.partial_rows, self.partial_done = (
+            parallel.bcast((
+                self.complete_rows, self.partial_rows, self.partial_done)))
+
+
+    def add_saved_rows(self, IP_rows, IP_done=None):
+        """Returns the rows of the symmetric inner product array of all vecs
+        made of the saved rows and ``IP_rows``, the rows of the array of the
+        remaining vecs, and does the same for the boolean array ``IP_done`` of
+        their computed entries if it is given.  The saved entries must not
+        have been computed again."""
+        if self.partial_rows is not None:
+            num_partial_rows, num_cols = self.partial_rows.shape
+            if IP_rows.shape[0] < num_partial_rows:
+                num_missing_rows = num_partial_rows - IP_rows.shape[0]
+                IP_rows = np.vstack((IP_rows, np.zeros(
+                    (num_missing_rows, num_cols), dtype=IP_rows.dtype)))
+                if IP_done is not None:
+                    IP_done = np.vstack((IP_done, np.zeros(
+                        (num_missing_rows, num_cols), dtype=bool)))
+            IP_rows[:num_partial_rows][self.partial_done] = (
+                self.partial_rows[self.partial_done])
+            if IP_done is not None:
+                IP_done[:num_partial_rows] |= self.partial_done
+        if IP_done is not None and self.complete_rows is not None:
+            IP_done = self.vec_space._append_checkpoint_rows(
+                np.ones(self.complete_rows.shape, dtype=bool), IP_done,
+                self.num_vecs)
+        IP_rows = self.vec_space._append_checkpoint_rows(
+            self.complete_rows, IP_rows, self.num_vecs)
+        return IP_rows, IP_done
+
+
+class _InnerProductArraysPlan(object):
+    """Plans the computation of several inner product arrays by
+    :py:meth:`VectorSpaceHandles.compute_inner_product_arrays`, given a list
+    of ``(row_vec_handles, col_vec_handles)`` tuples, one for each array.
+
+    As in :py:meth:`VectorSpaceHandles.compute_inner_product_array`, the rows
+    are split into sets, each of which is retrieved once, and for each set of
+    rows, chunks of columns are passed around the ring of MPI workers.  The
+    rows are the distinct handles of the rows of all of the arrays, and the
+    columns of a set are the distinct handles of the columns of the arrays
+    with rows in it, so each set of rows is shared by all of the arrays.  The
+    columns whose handles are rows of the set are taken from memory, and only
+    the others are retrieved.  For a symmetric array, whose rows and columns
+    are the same handles, only the columns from the diagonal onwards are
+    needed.  If ``transpose`` is true, the rows and columns of the arrays that
+    are not symmetric are swapped.
+
+    The number of vector objects retrieved, ``num_gets``, includes the three
+    used to time the get method and the inner product."""
+    def __init__(self, vec_space, requests, transpose=False):
+        num_procs = parallel.get_num_procs()
+        self.transpose = transpose
+        self.is_symm = [
+            len(row_vec_handles) == len(col_vec_handles) and all(
+                row_vec_handle is col_vec_handle
+                for row_vec_handle, col_vec_handle in zip(
+                    row_vec_handles, col_vec_handles))
+            for row_vec_handles, col_vec_handles in requests]
+        if transpose:
+            requests = [
+                request if is_symm else request[::-1]
+                for request, is_symm in zip(requests, self.is_symm)]
+        self.row_vec_handles, self.request_row_positions = (
+            _find_distinct_handles([request[0] for request in requests]))
+        self.col_vec_handles, self.request_col_positions = (
+            _find_distinct_handles([request[1] for request in requests]))
+        num_rows = len(self.row_vec_handles)
+        num_cols = len(self.col_vec_handles)
+
+        # Find the row with the same handle as each col, if any
+        row_positions = dict(
+            (id(vec_handle), row_position)
+            for row_position, vec_handle in enumerate(self.row_vec_handles))
+        self.col_row_positions = np.array([
+            row_positions.get(id(vec_handle), -1)
+            for vec_handle in self.col_vec_handles], dtype=int)
+
+        # Split the rows among the procs, and into sets, as in
+        # compute_inner_product_array
+        self.chunk_plan = vec_space.compute_chunk_plan(num_rows, num_cols)
+        self.row_tasks = parallel.find_assignments(list(range(num_rows)))
+        self.row_ranks = np.zeros(num_rows, dtype=int)
+        for rank, tasks in enumerate(self.row_tasks):
+            self.row_ranks[tasks] = rank
+        self.row_chunk_bounds = [
+            _find_chunk_bounds(
+                tasks, self.chunk_plan.num_rows_per_proc_chunk,
+                self.chunk_plan.num_row_chunks)
+            for tasks in self.row_tasks]
+
+        # For each set of rows, find the cols needed by the arrays with rows
+        # in it.  Those that are in memory are listed for each proc, and the
+        # others are split into chunks that are retrieved.
+        num_cols_per_chunk = (
+            self.chunk_plan.num_cols_per_proc_chunk * num_procs)
+        self.memory_cols = []
+        self.retrieved_col_chunks = []
+        self.num_gets = num_rows + 3
+        for chunk_index in range(self.chunk_plan.num_row_chunks):
+            is_set_row = np.zeros(num_rows, dtype=bool)
+            for chunk_bounds in self.row_chunk_bounds:
+                start_row_index, end_row_index = chunk_bounds[chunk_index]
+                is_set_row[start_row_index:end_row_index] = True
+            is_needed_col = np.zeros(num_cols, dtype=bool)
+            for row_positions, col_positions, is_symm in zip(
+                self.request_row_positions, self.request_col_positions,
+                self.is_symm):
+                set_row_indices = np.nonzero(is_set_row[row_positions])[0]
+                if len(set_row_indices) == 0:
+                    continue
+                if is_symm:
+                    is_needed_col[col_positions[set_row_indices[0]:]] = True
+                else:
+                    is_needed_col[col_positions] = True
+            is_memory_col = np.multiply(
+                is_needed_col, self.col_row_positions >= 0)
+            is_memory_col[is_memory_col] = is_set_row[
+                self.col_row_positions[is_memory_col]]
+            memory_cols = np.nonzero(is_memory_col)[0]
+            memory_col_ranks = self.row_ranks[
+                self.col_row_positions[memory_cols]]
+            self.memory_cols.append([
+                memory_cols[memory_col_ranks == rank]
+                for rank in range(num_procs)])
+            retrieved_cols = np.nonzero(
+                np.multiply(is_needed_col, ~is_memory_col))[0]
+            self.retrieved_col_chunks.append([
+                retrieved_cols[start_col_index:
+                    start_col_index + num_cols_per_chunk]
+                for start_col_index in range(
+                    0, len(retrieved_cols), num_cols_per_chunk)])
+            self.num_gets += len(retrieved_cols)
+
+
+class _PutQueue(object):
+    """Calls ``put`` on vector handles in background threads.
+
+    Args:
+        ``put_vecs``: Function that puts a list of vector objects using a list
+        of handles.
+
+        ``num_threads``: Number of threads calling ``put_vecs``.
+
+        ``max_num_pending``: Maximum number of vector objects waiting to be
+        put or being put.  Adding more blocks until there is room.
+
+    Each call to :py:meth:`put` splits the vector objects into contiguous
+    batches, one for each thread, and each batch is put with one call to
+    ``put_vecs``.  A batch counts against ``max_num_pending`` until its call
+    to ``put_vecs`` returns, so that the memory held by the queue is bounded.
+
+    Errors raised by ``put_vecs`` are raised by the next call to :py:meth:`put`
+    or by :py:meth:`close`.
+    """
+    def __init__(self, put_vecs, num_threads, max_num_pending):
+        self.put_vecs = put_vecs
+        self.max_num_pending = max(max_num_pending, 1)
+        self.num_pending = 0
+        self.num_pending_changed = threading.Condition()
+        self.pending = queue.Queue()
+        self.errors = []
+        self.threads = [
+            threading.Thread(target=self._run) for i in range(num_threads)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+
+    def _run(self):
+        while True:
+            item = self.pending.get()
+            try:
+                if item is None:
+                    return
+                if not self.errors:
+                    self.put_vecs(*item)
+            except Exception as error:
+                self.errors.append(error)
+            finally:
+                if item is not None:
+                    with self.num_pending_changed:
+                        self.num_pending -= len(item[0])
+                        self.num_pending_changed.notify_all()
+                self.pending.task_done()
+
+
+    def _raise_error(self):
+        if self.errors:
+            raise self.errors[0]
+
+
+    def put(self, vec_handles, vecs):
+        """Adds vector objects to be put using the corresponding handles."""
+        num_batches = max(min(len(self.threads), len(vec_handles)), 1)
+        batch_bounds = np.linspace(
+            0, len(vec_handles), num_batches + 1).astype(int)
+        for start, end in zip(batch_bounds[:-1], batch_bounds[1:]):
+            self._raise_error()
+            # Wait for room, but always accept a batch if nothing is pending
+            with self.num_pending_changed:
+                while (
+                    self.num_pending > 0 and
+                    self.num_pending + end - start > self.max_num_pending):
+                    self.num_pending_changed.wait()
+                self.num_pending += end - start
+            self.pending.put((vec_handles[start:end], vecs[start:end]))
+
+
+    def close(self, raise_errors=True):
+        """Waits for all vector objects to be put and stops the threads.  If
+        ``raise_errors`` is false, errors raised by ``put_vecs`` are not
+        raised, e.g., when already handling another error."""
+        for thread in self.threads:
+            self.pending.put(None)
+        for thread in self.threads:
+            thread.join()
+        if raise_errors:
+            self._raise_error()
+
+
+class _InnerProductRows(object):
+    """Callable that computes the 2D array of inner products of a list of row
+    vector objects with a fixed list of column vector objects, using
+    ``inner_product_block``.  Picklable if ``inner_product_block`` is."""
+    def __init__(self, inner_product_block, col_vecs):
+        self.inner_product_block = inner_product_block
+        self.col_vecs = col_vecs
+
+
+    def __call__(self, row_vecs):
+        return np.array(self.inner_product_block(row_vecs, self.col_vecs))
+
+
+class _SymmInnerProductRow(object):
+    """Callable that computes the inner products of ``vecs[row_index]`` with
+    ``vecs[row_index:]``.  Picklable if ``inner_product`` is."""
+    def __init__(self, inner_product, vecs):
+        self.inner_product = inner_product
+        self.vecs = vecs
+
+
+    def __call__(self, row_index):
+        return [
+            self.inner_product(self.vecs[row_index], col_vec)
+            for col_vec in self.vecs[row_index:]]
+
+
+class _SumLayerUpdate(object):
+    """Callable that adds the basis vector objects, scaled by a column of
+    coefficients, to a sum vector object (``None`` if there is no sum yet).
+    The sum is accumulated in place with :py:func:`vectors.axpy`.  Picklable
+    if the vector objects are."""
+    def __init__(self, basis_vecs):
+        self.basis_vecs = basis_vecs
+
+
+    def __call__(self, sum_layer_and_coeffs):
+        sum_layer, coeffs = sum_layer_and_coeffs
+        for basis_vec, coeff in zip(self.basis_vecs, coeffs):
+            if sum_layer is None:
+                sum_layer = basis_vec * coeff
+            else:
+                sum_layer = vectors.axpy(sum_layer, coeff, basis_vec)
+        return sum_layer
+
+
+class _ArrayLinCombiner(object):
+    """Callable that adds numpy array basis vector objects, scaled by a
+    coefficient array, to a block of sum vector objects with matrix products.
+
+    The sums are the rows of a 2D array whose trailing dimensions are the
+    shape of the basis arrays, allocated when the first chunk is added.  The
+    product is computed in groups of columns.  For each group, only those
+    columns of the basis arrays are stacked into the rows of a buffer, which
+    is reused for the following groups and chunks, so the temporary arrays
+    are about :py:data:`vectors.AXPY_CHUNK_SIZE` elements rather than a copy
+    of the whole chunk of basis arrays."""
+    def __init__(self):
+        self.basis_buffer = None
+
+
+    def can_combine(self, sum_layers, basis_vecs):
+        """Checks if the basis vector objects are numpy arrays of the same
+        shape and dtype, and if ``sum_layers`` is a block of sums from a
+        previous call or has no sums yet."""
+        if len(basis_vecs) == 0 or not all(
+            isinstance(basis_vec, np.ndarray) and
+            basis_vec.shape == basis_vecs[0].shape and
+            basis_vec.dtype == basis_vecs[0].dtype
+            for basis_vec in basis_vecs):
+            return False
+        if isinstance(sum_layers, np.ndarray):
+            return sum_layers.shape[1:] == basis_vecs[0].shape
+        return all(sum_layer is None for sum_layer in sum_layers)
+
+
+    def _stack(self, flat_basis_vecs, start_col_index, end_col_index):
+        """Returns a 2D array whose rows are a group of columns of the
+        flattened basis arrays."""
+        num_bases = len(flat_basis_vecs)
+        num_cols = end_col_index - start_col_index
+        if (
+            self.basis_buffer is None or
+            self.basis_buffer.shape[0] < num_bases or
+            self.basis_buffer.shape[1] < num_cols or
+            self.basis_buffer.dtype != flat_basis_vecs[0].dtype):
+            self.basis_buffer = np.empty(
+                (num_bases, num_cols), dtype=flat_basis_vecs[0].dtype)
+        basis_block = self.basis_buffer[:num_bases, :num_cols]
+        for basis_index, flat_basis_vec in enumerate(flat_basis_vecs):
+            basis_block[basis_index] = flat_basis_vec[
+                start_col_index:end_col_index]
+        return basis_block
+
+
+    def __call__(self, sum_layers, basis_vecs, coeff_array):
+        num_sums = coeff_array.shape[1]
+        dtype = np.result_type(basis_vecs[0].dtype, coeff_array.dtype)
+        if not isinstance(sum_layers, np.ndarray):
+            sum_layers = np.zeros(
+                (num_sums,) + basis_vecs[0].shape, dtype=dtype)
+        elif not np.can_cast(dtype, sum_layers.dtype):
+            sum_layers = sum_layers.astype(
+                np.result_type(dtype, sum_layers.dtype))
+        flat_sum_layers = sum_layers.reshape(num_sums, -1)
+        flat_basis_vecs = [basis_vec.reshape(-1) for basis_vec in basis_vecs]
+        num_elements = flat_sum_layers.shape[1]
+        num_cols_per_group = min(max(
+            vectors.AXPY_CHUNK_SIZE // max(num_sums, len(basis_vecs)), 1024),
+            num_elements)
+        coeff_array_T = coeff_array.T
+        for start_col_index in range(0, num_elements, num_cols_per_group):
+            end_col_index = min(
+                start_col_index + num_cols_per_group, num_elements)
+            flat_sum_layers[:, start_col_index:end_col_index] += np.dot(
+                coeff_array_T,
+                self._stack(flat_basis_vecs, start_col_index, end_col_index))
+        return sum_layers
+
+
 class VectorSpaceArrays(object):
     """Implements inner products and linear combinations using data stored in
     arrays.
@@ -64,6 +1100,283 @@ class VectorSpaceArrays(object):
         return not self.__eq__(other)
 
 
+class VecCache(object):
+    """Memory-bounded, least-recently-used cache of vector objects, keyed by
+    their handles.
+
+    Args:
+        ``max_bytes``: Maximum number of bytes of vector objects kept in the
+        cache, per MPI worker (processor).
+
+    Attach a cache to :py:class:`VectorSpaceHandles` with its ``vec_cache``
+    argument.  Vector objects retrieved by that instance are then kept in
+    memory, so that later operations on the same handles, e.g., the stages of
+    a POD, DMD, or BPOD, do not retrieve them again.  One cache can be shared
+    by several instances.  Handles are matched by identity, so the same handle
+    objects must be passed to each operation.  An entry is dropped when a
+    vector object is put with its handle by :py:meth:`VectorSpaceHandles.
+    lin_combine`.
+
+    In parallel, each MPI worker caches only the vector objects it retrieves,
+    not those it receives from other workers.  Operations that divide the
+    vectors among the workers differently, e.g., a symmetric inner product
+    array and a linear combination, may therefore retrieve some of them
+    again.
+
+    The cached vector objects are returned to the callers without being
+    copied, and must not be modified in place.  Their memory is not counted
+    against ``max_vecs_per_node`` or ``max_bytes_per_node``.
+
+    The numbers of hits, misses, and evictions are stored in the attributes
+    ``num_hits``, ``num_misses``, and ``num_evictions``, and are returned
+    with the size of the cache by :py:meth:`get_stats`.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
+        # Maps id(vec_handle) to (vec_handle, vec, nbytes), least recently
+        # used first.  The handle is kept so that its id is not reused.
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def get_vecs(self, vec_handles, get_vecs):
+        """Returns the vector objects for a list of handles, calling
+        ``get_vecs`` on the list of handles that are not in the cache and
+        adding the results to the cache."""
+        vecs = [None] * len(vec_handles)
+        missing_indices = []
+        with self._lock:
+            for index, vec_handle in enumerate(vec_handles):
+                entry = self._entries.pop(id(vec_handle), None)
+                if entry is None:
+                    missing_indices.append(index)
+                else:
+                    self._entries[id(vec_handle)] = entry
+                    vecs[index] = entry[1]
+            self.num_hits += len(vec_handles) - len(missing_indices)
+            self.num_misses += len(missing_indices)
+        if not missing_indices:
+            return vecs
+        missing_vecs = get_vecs([vec_handles[i] for i in missing_indices])
+        for index, vec in zip(missing_indices, missing_vecs):
+            vecs[index] = vec
+            self._add(vec_handles[index], vec)
+        return vecs
+
+
+    def _add(self, vec_handle, vec):
+        """Adds a vector object, evicting the least recently used ones until
+        it fits.  Vector objects larger than the cache are not added."""
+        nbytes = util.get_nbytes(vec)
+        with self._lock:
+            self._discard(vec_handle)
+            if nbytes > self.max_bytes:
+                return
+            while self.nbytes + nbytes > self.max_bytes:
+                evicted_key = next(iter(self._entries))
+                self.nbytes -= self._entries.pop(evicted_key)[2]
+                self.num_evictions += 1
+            self._entries[id(vec_handle)] = (vec_handle, vec, nbytes)
+            self.nbytes += nbytes
+
+
+    def _discard(self, vec_handle):
+        entry = self._entries.pop(id(vec_handle), None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+
+
+    def discard(self, vec_handle):
+        """Removes the vector object of a handle from the cache, if present."""
+        with self._lock:
+            self._discard(vec_handle)
+
+
+    def clear(self):
+        """Removes all vector objects from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+    def get_stats(self):
+        """Returns a dictionary with the numbers of hits, misses, and
+        evictions, and the number of vector objects and bytes in the
+        cache."""
+        with self._lock:
+            return {
+                'num_hits': self.num_hits, 'num_misses': self.num_misses,
+                'num_evictions': self.num_evictions,
+                'num_vecs': len(self._entries), 'nbytes': self.nbytes}
+
+
+def _get_vec_handle_signature(vec_handle):
+    """Returns bytes that identify a handle, made of the pickled handle and,
+    for the handle and its base handle, the size and modification time of the
+    file at ``vec_path`` if there is one.  Returns None if the handle cannot
+    be pickled, since it then cannot be identified exactly."""
+    try:
+        signature = pickle.dumps(vec_handle, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+    if hasattr(vec_handle, 'get_base_vec_handle'):
+        base_vec_handle = vec_handle.get_base_vec_handle()
+    else:
+        base_vec_handle = None
+    for handle in [vec_handle, base_vec_handle]:
+        vec_path = getattr(handle, 'vec_path', None)
+        if vec_path is not None and os.path.exists(vec_path):
+            stat = os.stat(vec_path)
+            signature += (' %d %r' % (
+                stat.st_size, getattr(stat, 'st_mtime_ns', stat.st_mtime))
+                ).encode()
+    return signature
+
+
+class InnerProductArrayStore(object):
+    """Directory of inner product arrays saved to file, so that computing them
+    again for unchanged vecs loads them instead.
+
+    Args:
+        ``directory``: Path of the directory in which the arrays are saved.
+        It is created when the first array is saved.
+
+    Kwargs:
+        ``max_bytes``: Maximum total size of the saved arrays, in bytes.  When
+        it is exceeded, the least recently used arrays are removed.  If None,
+        arrays are never removed.
+
+    Attach a store to :py:class:`VectorSpaceHandles` with its
+    ``IP_array_store`` argument.  Each array is identified by a hash of the
+    pickled handles of its rows and columns, the size and modification time of
+    the files they refer to (through a ``vec_path`` attribute, as for
+    :py:class:`vectors.VecHandlePickle`), and the pickled inner product
+    and block inner product functions, which include any weights they hold.
+    Handles of other types must change when their vector objects do, or the
+    store must be cleared.  Arrays whose handles or functions cannot be
+    pickled are not stored.
+
+    The numbers of hits, misses, and removed arrays are stored in the
+    attributes ``num_hits``, ``num_misses``, and ``num_evictions``, and are
+    returned with the size of the store by :py:meth:`get_stats`.
+    """
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
+
+
+    def get_key(self, inner_product, vec_handle_lists,
+        inner_product_block=None):
+        """Returns a string that identifies the inner product array of the
+        vector objects in a tuple of lists of handles, e.g., ``(row_vec_handles,
+        col_vec_handles)``, computed with ``inner_product`` and, if it is not
+        None, ``inner_product_block``.  Returns None if a function or a handle
+        cannot be pickled (e.g., a lambda or closure), since the array then
+        cannot be identified exactly."""
+        key_hash = hashlib.sha1()
+        try:
+            key_hash.update(
+                pickle.dumps(inner_product, protocol=pickle.HIGHEST_PROTOCOL))
+            if inner_product_block is not None:
+                key_hash.update(pickle.dumps(
+                    inner_product_block, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return None
+        for vec_handles in vec_handle_lists:
+            key_hash.update((' %d:' % len(vec_handles)).encode())
+            for vec_handle in vec_handles:
+                signature = _get_vec_handle_signature(vec_handle)
+                if signature is None:
+                    return None
+                key_hash.update(signature)
+        return key_hash.hexdigest()
+
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+
+    def load(self, key):
+        """Returns the array saved with ``key``, or ``None`` if there is
+        none."""
+        path = self._get_path(key)
+        if not os.path.exists(path):
+            self.num_misses += 1
+            return None
+        IP_array = np.load(path, allow_pickle=False)
+        os.utime(path, None)
+        self.num_hits += 1
+        return IP_array
+
+
+    def save(self, key, IP_array):
+        """Saves an array with ``key``, then removes the least recently used
+        arrays until the store fits in ``max_bytes``.  Arrays larger than
+        ``max_bytes`` are not saved."""
+        IP_array = np.asarray(IP_array)
+        if self.max_bytes is not None and IP_array.nbytes > self.max_bytes:
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = self._get_path(key)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as file_obj:
+            np.save(file_obj, IP_array)
+        getattr(os, 'replace', os.rename)(temp_path, path)
+        if self.max_bytes is not None:
+            self._evict(path)
+
+
+    def _list_files(self):
+        """Returns the paths of the saved arrays, least recently used first."""
+        if not os.path.isdir(self.directory):
+            return []
+        paths = [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory) if name.endswith('.npy')]
+        return sorted(paths, key=os.path.getmtime)
+
+
+    def _evict(self, keep_path):
+        paths = self._list_files()
+        total_bytes = sum(os.path.getsize(path) for path in paths)
+        for path in paths:
+            if total_bytes <= self.max_bytes:
+                break
+            if path == keep_path:
+                continue
+            total_bytes -= os.path.getsize(path)
+            os.remove(path)
+            self.num_evictions += 1
+
+
+    def clear(self):
+        """Removes all of the saved arrays."""
+        for path in self._list_files():
+            os.remove(path)
+
+
+    def get_stats(self):
+        """Returns a dictionary with the numbers of hits, misses, and removed
+        arrays, and the number of arrays and bytes in the store."""
+        paths = self._list_files()
+        return {
+            'num_hits': self.num_hits, 'num_misses': self.num_misses,
+            'num_evictions': self.num_evictions, 'num_arrays': len(paths),
+            'nbytes': sum(os.path.getsize(path) for path in paths)}
+
+
 class VectorSpaceHandles(object):
     """Provides efficient, parallel implementations of vector space operations,
     using handles.
@@ -80,6 +1393,64 @@ class VectorSpaceHandles(object):
         ``print_interval``: Minimum time (in seconds) between printed progress
         messages.
 
+        ``inner_product_block``: Function that computes the inner products of
+        a list of row vector objects with a list of column vector objects,
+        returning a 2D array.  If supplied, it is used for every chunk of
+        vectors in memory, e.g., so that the inner products of array-backed
+        vectors are computed with a single matrix product.  See
+        :py:func:`vectors.inner_product_block_array_uniform`.
+
+        ``prefetch``: If true, the next chunk of vector objects is retrieved
+        in a background thread while computations are done on the current
+        chunk.  Memory for the prefetched vectors counts against
+        ``max_vecs_per_node``.
+
+        ``write_behind``: Number of background threads that call ``put`` on
+        the results of :py:meth:`lin_combine`, so that writing a chunk of
+        sums overlaps the computation of the next chunk.  If zero, ``put`` is
+        called synchronously.  Memory for the sums waiting to be put counts
+        against ``max_vecs_per_node``.
+
+        ``backend``: Execution backend used to parallelize gets, inner
+        products, and linear combinations over the cores of each MPI worker
+        (processor), e.g., ``'threads'`` or ``'processes'``.  See
+        :py:func:`parallel.get_backend`.  The default runs serially within
+        each MPI worker.  Pools created from a string are shut down when each
+        operation returns, and by :py:meth:`close`.  Backend objects passed
+        in are left running, and must be shut down by the caller.
+
+        ``max_bytes_per_node``: Maximum number of bytes of vector objects that
+        can be stored in memory, per node, or ``'auto'`` to use half of the
+        memory available on rank zero when the object is constructed.  If
+        supplied, ``max_vecs_per_node`` is found from the size of a vector
+        object, measured when each operation starts, and the value passed to
+        the constructor is ignored.
+
+        ``vec_cache``: A :py:class:`VecCache`, or the maximum number of bytes
+        of a new one, that keeps retrieved vector objects in memory across
+        operations.  If None, vector objects are retrieved every time they are
+        needed.
+
+        ``IP_array_store``: An :py:class:`InnerProductArrayStore`, or the path
+        of the directory of a new one, in which computed inner product arrays
+        are saved, so that computing them again for unchanged vecs loads them
+        instead.
+
+        ``tracer``: A :py:class:`Tracer` in which the work done by each
+        operation is recorded as timestamped spans.  If None, no spans are
+        recorded.
+
+        ``progress_callback``: Function called with a :py:class:`Progress`,
+        a namedtuple with the attributes ``operation`` (the name of the
+        method), ``num_completed`` and ``num_tasks`` (numbers of inner products
+        or of scaled vectors added to sums), ``elapsed_time``,
+        ``remaining_time`` (in seconds, estimated from the rate so far, or
+        None), and ``is_done``.  It is called on every MPI worker at most once
+        every ``print_interval`` seconds while an operation runs, with
+        progress estimated from that worker's share of the tasks, and when the
+        operation completes, with the number of tasks completed by all MPI
+        workers.
+
     This class implements low-level functions for computing large numbers of
     vector sums and inner products.  These functions are used by high-level
     classes in :py:mod:`pod`, :py:mod:`bpod`, :py:mod:`dmd` and
@@ -89,25 +1460,85 @@ class VectorSpaceHandles(object):
     even if this lowers ``max_vecs_per_node`` proportionally.
     However, this depends on the computer and the nature of the functions
     supplied, and sometimes loading from file is slower with more processors.
+
+    Each operation records the work done by this MPI worker in a
+    :py:class:`PerfStats`, stored in the ``perf_stats`` attribute, and the
+    statistics aggregated over all MPI workers in ``perf_stats_summary`` (see
+    :py:meth:`PerfStats.aggregate`).  They show where the time is spent, e.g.,
+    in retrieving vectors, computing inner products, or waiting for other MPI
+    workers.
     """
     def __init__(
         self, inner_product=None, max_vecs_per_node=None, verbosity=1,
-        print_interval=10):
+        print_interval=10, inner_product_block=None, prefetch=False,
+        write_behind=0, backend=None, max_bytes_per_node=None, vec_cache=None,
+        IP_array_store=None, tracer=None, progress_callback=None):
         """Constructor."""
         self.inner_product = inner_product
+        self.inner_product_block = inner_product_block
+        self.prefetch = prefetch
+        self.write_behind = write_behind
+        self.backend = parallel.get_backend(backend)
+        self._owns_backend = backend is None or isinstance(backend, str)
         self.verbosity = verbosity
         self.print_interval = print_interval
         self.prev_print_time = 0.
+        self.progress_callback = progress_callback
+        self.chunk_plan = None
+        self.tracer = tracer
+        self.perf_stats = PerfStats(tracer=tracer)
+        self.perf_stats_summary = None
+        self._perf_stats_depth = 0
+        if vec_cache is not None and not isinstance(vec_cache, VecCache):
+            vec_cache = VecCache(vec_cache)
+        self.vec_cache = vec_cache
+        if (
+            IP_array_store is not None and
+            not isinstance(IP_array_store, InnerProductArrayStore)):
+            IP_array_store = InnerProductArrayStore(IP_array_store)
+        self.IP_array_store = IP_array_store
+
+        if max_bytes_per_node == 'auto':
+            available_memory = parallel.call_and_bcast(
+                util.get_available_memory)
+            if available_memory is None:
+                raise RuntimeError(
+                    'Could not determine the available memory, specify '
+                    'max_bytes_per_node or max_vecs_per_node instead')
+            max_bytes_per_node = available_memory // 2
+        self.max_bytes_per_node = max_bytes_per_node
 
         if max_vecs_per_node is None:
             self.max_vecs_per_node = 10000 # different default?
-            self.print_msg((
-                'Warning: max_vecs_per_node was not specified. Assuming %d '
-                'vecs can be in memory per node. Decrease max_vecs_per_node '
-                'if memory errors.') % self.max_vecs_per_node)
+            if self.max_bytes_per_node is None:
+                self.print_msg((
+                    'Warning: max_vecs_per_node was not specified. Assuming '
+                    '%d vecs can be in memory per node. Decrease '
+                    'max_vecs_per_node if memory errors.') %
+                    self.max_vecs_per_node)
         else:
             self.max_vecs_per_node = max_vecs_per_node
+        self._set_max_vecs_per_proc()
+
+
+    def close(self):
+        """Shuts down the pool of the execution backend, if it was created
+        from a string by the constructor.  Also called at the end of a
+        ``with`` statement."""
+        if self._owns_backend:
+            self.backend.shutdown()
+
+
+    def __enter__(self):
+        return self
+
 
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def _set_max_vecs_per_proc(self):
+        """Sets ``max_vecs_per_proc`` from ``max_vecs_per_node``."""
         if (
             self.max_vecs_per_node <
             2 * parallel.get_num_procs() / parallel.get_num_nodes()):
@@ -123,12 +1554,347 @@ class VectorSpaceHandles(object):
                 parallel.get_num_nodes() // parallel.get_num_procs())
 
 
+    def _set_max_vecs_from_nbytes(self, vec_nbytes):
+        """Sets ``max_vecs_per_node`` to the number of vector objects of size
+        ``vec_nbytes`` that fit in ``max_bytes_per_node``.  Does nothing if
+        ``max_bytes_per_node`` is None.
+
+        The size measured on rank zero is used by all MPI workers, so that
+        they all choose the same chunks."""
+        if self.max_bytes_per_node is None:
+            return
+        vec_nbytes = max(parallel.bcast(vec_nbytes), 1)
+        self.max_vecs_per_node = max(
+            int(self.max_bytes_per_node // vec_nbytes), 1)
+        self._set_max_vecs_per_proc()
+
+
+    @contextlib.contextmanager
+    def trace_span(self, name, **args):
+        """Context manager that records its block as a span named ``name`` in
+        ``tracer``, if there is one."""
+        if self.tracer is None:
+            yield
+        else:
+            with self.tracer.span(name, **args):
+                yield
+
+
     def _check_inner_product(self):
         """Check that ``inner_product`` is defined"""
         if self.inner_product is None:
             raise RuntimeError('inner product function is not defined')
 
 
+    def compute_chunk_plan(self, num_rows, num_cols, rows_are_put=False):
+        """Chooses how many row and column vector objects each MPI worker
+        (processor) keeps in memory at once.
+
+        Args:
+            ``num_rows``: Number of row vector objects, e.g., the number of sum
+            vectors in :py:meth:`lin_combine`.
+
+            ``num_cols``: Number of column vector objects, e.g., the number of
+            basis vectors in :py:meth:`lin_combine`.
+
+        Kwargs:
+            ``rows_are_put``: True if the rows are outputs that are put, as in
+            :py:meth:`lin_combine`.
+
+        Returns:
+            ``chunk_plan``: A namedtuple with the attributes
+            ``num_rows_per_proc_chunk``, ``num_cols_per_proc_chunk``,
+            ``num_row_chunks`` (number of times each column vector is
+            retrieved), ``num_col_chunks`` (number of column chunks per row
+            chunk), ``num_row_gets_per_proc``, ``num_col_gets_per_proc``, and
+            ``num_sends_per_proc`` (number of MPI messages).
+
+        The rows are split into as few chunks as fit in ``max_vecs_per_proc``
+        while leaving room for at least one column, since every row chunk
+        requires another retrieval of all of the columns.  This minimizes the
+        number of gets and the volume of data passed between MPI workers.  The
+        remaining memory is filled with columns, which minimizes the number of
+        MPI messages.  The plan used by the most recent operation is stored in
+        the ``chunk_plan`` attribute.
+
+        If ``prefetch`` is true, memory is reserved for a prefetched chunk of
+        rows or columns.  If ``write_behind`` is nonzero and ``rows_are_put``
+        is true, memory is reserved for a chunk of rows waiting to be put.
+        When running in parallel, memory is reserved for the send and receive
+        buffers of the columns passed between MPI workers.
+        """
+        num_procs = parallel.get_num_procs()
+
+        # Number of chunks of each kind that can be in memory at once
+        num_row_copies = 1
+        num_col_copies = 1
+        if self.prefetch:
+            num_row_copies += 1
+            num_col_copies += 1
+        if self.write_behind and rows_are_put:
+            num_row_copies += 1
+        if parallel.is_distributed():
+            num_col_copies += 2
+        max_num_row_tasks = max([
+            len(tasks) for tasks in
+            parallel.find_assignments(list(range(num_rows)))])
+        max_num_col_tasks = max([
+            len(tasks) for tasks in
+            parallel.find_assignments(list(range(num_cols)))])
+
+        # Use the fewest number of row chunks possible, then balance the number
+        # of rows in each chunk.
+        max_rows_per_proc_chunk = max(
+            (self.max_vecs_per_proc - num_col_copies) // num_row_copies, 1)
+        num_row_chunks = max(int(np.ceil(
+            max_num_row_tasks * 1. / max_rows_per_proc_chunk)), 1)
+        num_rows_per_proc_chunk = max(int(np.ceil(
+            max_num_row_tasks * 1. / num_row_chunks)), 1)
+
+        # Fill the remaining memory with cols
+        num_cols_per_proc_chunk = max(
+            min(
+                (self.max_vecs_per_proc -
+                    num_row_copies * num_rows_per_proc_chunk) //
+                num_col_copies,
+                max_num_col_tasks),
+            1)
+        num_col_chunks = max(int(np.ceil(
+            max_num_col_tasks * 1. / num_cols_per_proc_chunk)), 1)
+
+        return ChunkPlan(
+            num_rows_per_proc_chunk=num_rows_per_proc_chunk,
+            num_cols_per_proc_chunk=num_cols_per_proc_chunk,
+            num_row_chunks=num_row_chunks,
+            num_col_chunks=num_col_chunks,
+            num_row_gets_per_proc=max_num_row_tasks,
+            num_col_gets_per_proc=num_row_chunks * max_num_col_tasks,
+            num_sends_per_proc=(
+                num_row_chunks * num_col_chunks * (num_procs - 1)))
+
+
+    def _predict_num_gets(self, row_vec_handles, col_vec_handles=None):
+        """Returns the number of vector objects retrieved by
+        :py:meth:`compute_inner_product_array` for ``row_vec_handles`` and
+        ``col_vec_handles``, or by :py:meth:`compute_symm_inner_product_array`
+        for ``row_vec_handles`` if ``col_vec_handles`` is ``None``, including
+        those used to time the get method and the inner product."""
+        if col_vec_handles is None:
+            num_vecs = len(row_vec_handles)
+            chunk_plan = self.compute_chunk_plan(num_vecs, num_vecs)
+            num_rows_per_chunk = (
+                chunk_plan.num_rows_per_proc_chunk * parallel.get_num_procs())
+            return 2 + num_vecs + sum([
+                num_vecs - min(start_row_index + num_rows_per_chunk, num_vecs)
+                for start_row_index in range(
+                    0, num_vecs, num_rows_per_chunk)])
+        num_rows, num_cols = sorted([
+            len(row_vec_handles), len(col_vec_handles)])
+        chunk_plan = self.compute_chunk_plan(num_rows, num_cols)
+        return 3 + num_rows + num_cols * chunk_plan.num_row_chunks
+
+
+    def _get_vecs(self, vec_handles):
+        """Retrieves the vector objects for a list of handles, using
+        ``vec_cache`` if there is one."""
+        if self.vec_cache is not None:
+            return self.vec_cache.get_vecs(vec_handles, self._retrieve_vecs)
+        return self._retrieve_vecs(vec_handles)
+
+
+    def _retrieve_vecs(self, vec_handles):
+        """Gets the vector objects for a list of handles with
+        :py:func:`vectors.get_vecs`, recording it in ``perf_stats``.  The
+        handles are split into contiguous groups, one for each worker of the
+        execution backend, so that each group can be retrieved with one I/O
+        operation."""
+        num_groups = max(min(self.backend.num_workers, len(vec_handles)), 1)
+        group_bounds = np.linspace(
+            0, len(vec_handles), num_groups + 1).astype(int)
+        with self.perf_stats.timer('get_time', num_gets=len(vec_handles)):
+            vec_groups = self.backend.map(
+                vectors.get_vecs,
+                [vec_handles[start:end]
+                for start, end in zip(group_bounds[:-1], group_bounds[1:])])
+        vecs = [vec for vec_group in vec_groups for vec in vec_group]
+        self.perf_stats.add(
+            get_bytes=sum(getattr(vec, 'nbytes', 0) for vec in vecs))
+        return vecs
+
+
+    def _put_vecs(self, vec_handles, vecs):
+        """Puts the vector objects using the corresponding handles, with
+        :py:func:`vectors.put_vecs`."""
+        if self.vec_cache is not None:
+            for vec_handle in vec_handles:
+                self.vec_cache.discard(vec_handle)
+        with self.perf_stats.timer(
+            'put_time', num_puts=len(vec_handles),
+            put_bytes=sum(getattr(vec, 'nbytes', 0) for vec in vecs)):
+            vectors.put_vecs(vec_handles, vecs)
+
+
+    def _start_exchange_vecs(
+        self, vecs, indices, dest, source, send_tag, recv_tag):
+        """Calls :py:func:`parallel.start_exchange_vecs`, recording the
+        exchange in ``perf_stats``."""
+        with self.perf_stats.timer(
+            'comm_time', span_name='send', num_sends=len(vecs),
+            send_bytes=sum(getattr(vec, 'nbytes', 0) for vec in vecs)):
+            exchange = parallel.start_exchange_vecs(
+                vecs, indices, dest, source, send_tag, recv_tag)
+        return _TimedExchange(exchange, self.perf_stats)
+
+
+    def _gather_array_rows(self, rows, row_indices, num_rows, root_only=False):
+        """Calls :py:func:`parallel.gather_array_rows`, recording the time in
+        ``perf_stats``."""
+        with self.perf_stats.timer('reduce_time'):
+            return parallel.gather_array_rows(
+                rows, row_indices, num_rows, root_only=root_only)
+
+
+    def _barrier(self):
+        """Calls :py:func:`parallel.barrier`, recording the time in
+        ``perf_stats``."""
+        with self.perf_stats.timer('barrier_time'):
+            parallel.barrier()
+
+
+    def _iter_vec_chunks(self, handle_chunks):
+        """Returns an iterator over the lists of vector objects for each list
+        of handles in ``handle_chunks``, prefetching if ``prefetch`` is
+        true."""
+        if self.prefetch:
+            return _prefetch_vec_chunks(self._get_vecs, handle_chunks)
+        return (self._get_vecs(handles) for handles in handle_chunks)
+
+
+    def _compute_IP_block(self, row_vecs, col_vecs):
+        """Computes 2D array of inner products of the vector objects in
+        ``row_vecs`` with those in ``col_vecs``.  Uses ``inner_product_block``
+        if it is defined, otherwise takes one inner product at a time.  The
+        rows are split among the workers of the execution backend."""
+        if self.inner_product_block is not None:
+            inner_product_block = self.inner_product_block
+        else:
+            inner_product_block = util.InnerProductBlock(self.inner_product)
+        num_groups = max(min(self.backend.num_workers, len(row_vecs)), 1)
+        group_bounds = np.linspace(
+            0, len(row_vecs), num_groups + 1).astype(int)
+        with self.perf_stats.timer(
+            'IP_time', num_IPs=len(row_vecs) * len(col_vecs)):
+            return np.vstack(self.backend.map(
+                _InnerProductRows(inner_product_block, col_vecs),
+                [row_vecs[start:end]
+                for start, end in zip(group_bounds[:-1], group_bounds[1:])]))
+
+
+    def _compute_symm_IP_block(self, vecs):
+        """Computes upper-triangular portion (including the diagonal) of the
+        2D array of inner products of the vector objects in ``vecs`` with each
+        other.  The lower-triangular portion is zero.
+
+        With ``inner_product_block``, the vectors are split in half, and the
+        block of inner products between the halves is computed along with the
+        upper-triangular portions of the two diagonal blocks.  Blocks of at
+        most :py:data:`SYMM_IP_BLOCK_LEAF_SIZE` vectors are computed in full,
+        so that each call to ``inner_product_block`` is large enough to be
+        efficient, and only those entries below the diagonal are computed."""
+        num_vecs = len(vecs)
+        if self.inner_product_block is not None:
+            if num_vecs <= SYMM_IP_BLOCK_LEAF_SIZE:
+                return np.triu(self._compute_IP_block(vecs, vecs))
+            num_upper_vecs = num_vecs // 2
+            upper_IP_block = self._compute_symm_IP_block(
+                vecs[:num_upper_vecs])
+            off_diag_IP_block = self._compute_IP_block(
+                vecs[:num_upper_vecs], vecs[num_upper_vecs:])
+            lower_IP_block = self._compute_symm_IP_block(
+                vecs[num_upper_vecs:])
+            IP_block = np.zeros(
+                (num_vecs, num_vecs), dtype=np.result_type(
+                    upper_IP_block, off_diag_IP_block, lower_IP_block))
+            IP_block[:num_upper_vecs, :num_upper_vecs] = upper_IP_block
+            IP_block[:num_upper_vecs, num_upper_vecs:] = off_diag_IP_block
+            IP_block[num_upper_vecs:, num_upper_vecs:] = lower_IP_block
+            return IP_block
+        with self.perf_stats.timer(
+            'IP_time', num_IPs=num_vecs * (num_vecs + 1) // 2):
+            IP_rows = self.backend.map(
+                _SymmInnerProductRow(self.inner_product, vecs),
+                list(range(num_vecs)))
+        IP_block = np.zeros(
+            (num_vecs, num_vecs), dtype=np.array(IP_rows[0]).dtype)
+        for row_index, IP_row in enumerate(IP_rows):
+            IP_block[row_index, row_index:] = IP_row
+        return IP_block
+
+
+    def _compute_masked_IP_block(self, row_vecs, col_vecs, IP_mask):
+        """Computes the entries of the 2D array of inner products of the
+        vector objects in ``row_vecs`` with those in ``col_vecs`` for which the
+        boolean array ``IP_mask`` is true.  The other entries are zero, or may
+        also be computed.  If ``IP_mask`` is ``None``, all entries are
+        computed.
+
+        The columns are grouped by the rows they need, and each group is
+        computed as one block, so rectangular patterns cost no more than the
+        inner products they contain."""
+        if IP_mask is None or IP_mask.all():
+            return self._compute_IP_block(row_vecs, col_vecs)
+        IP_block = None
+        for row_indices, col_indices in _group_mask_cols(IP_mask):
+            IP_subblock = self._compute_IP_block(
+                [row_vecs[i] for i in row_indices],
+                [col_vecs[j] for j in col_indices])
+            if IP_block is None:
+                IP_block = np.zeros(IP_mask.shape, dtype=IP_subblock.dtype)
+            IP_block[np.ix_(row_indices, col_indices)] = IP_subblock
+        if IP_block is None:
+            IP_block = np.zeros(IP_mask.shape)
+        return IP_block
+
+
+    def _compute_masked_symm_IP_block(self, vecs, IP_mask):
+        """Computes the upper-triangular entries of the 2D array of inner
+        products of the vector objects in ``vecs`` with each other for which
+        the symmetric boolean array ``IP_mask`` is true, as in
+        :py:meth:`_compute_masked_IP_block`.  The lower-triangular portion is
+        zero."""
+        if IP_mask is None or IP_mask.all():
+            return self._compute_symm_IP_block(vecs)
+        IP_block = None
+        for row_indices, col_indices in _group_mask_cols(IP_mask):
+            # Only the rows up to the last col are in the upper triangle
+            row_indices = [i for i in row_indices if i <= col_indices[-1]]
+            if len(row_indices) == 0:
+                continue
+            if row_indices == col_indices:
+                IP_subblock = self._compute_symm_IP_block(
+                    [vecs[i] for i in col_indices])
+            else:
+                IP_subblock = self._compute_IP_block(
+                    [vecs[i] for i in row_indices],
+                    [vecs[j] for j in col_indices])
+            if IP_block is None:
+                IP_block = np.zeros(IP_mask.shape, dtype=IP_subblock.dtype)
+            IP_block[np.ix_(row_indices, col_indices)] = IP_subblock
+        if IP_block is None:
+            IP_block = np.zeros(IP_mask.shape)
+        return np.triu(IP_block)
+
+
+    def _add_to_sum_layers(self, sum_layers, basis_vecs, coeff_array):
+        """Returns the list of sum vector objects ``sum_layers`` after adding
+        the vector objects in ``basis_vecs`` scaled by ``coeff_array``, whose
+        rows correspond to the basis vectors and columns to the sums.  Entries
+        of ``sum_layers`` that are ``None`` are started from zero.  The sums
+        are split among the workers of the execution backend."""
+        return self.backend.map(
+            _SumLayerUpdate(basis_vecs), list(zip(sum_layers, coeff_array.T)))
+
+
     def print_msg(self, msg, output_channel='stdout'):
         """Print a message from rank zero MPI worker/processor."""
         if self.verbosity > 0 and parallel.is_rank_zero():
@@ -218,7 +1984,53 @@ class VectorSpaceHandles(object):
         self.print_msg('Passed the sanity check.')
 
 
-    def compute_inner_product_array(self, row_vec_handles, col_vec_handles):
+    def _compute_with_IP_array_store(self, requests, compute, root_only):
+        """Returns the inner product arrays for ``requests``, a list of tuples
+        of lists of handles, loading those that are in ``IP_array_store``.  The
+        others are computed by ``compute(missing_requests, root_only)``, which
+        returns a list of arrays, and are then stored.  Arrays without an exact
+        key (see :py:meth:`InnerProductArrayStore.get_key`) are neither loaded
+        nor stored.  The store is only read and written on rank zero."""
+        requests = [
+            tuple(util.make_iterable(vec_handles) for vec_handles in request)
+            for request in requests]
+        if parallel.is_rank_zero():
+            keys = [
+                self.IP_array_store.get_key(
+                    self.inner_product, request,
+                    inner_product_block=self.inner_product_block)
+                for request in requests]
+            if None in keys:
+                self.print_msg(
+                    'Warning: Not using the inner product array store, since '
+                    'an inner product function or a handle cannot be '
+                    'pickled')
+            IP_arrays = [
+                None if key is None else self.IP_array_store.load(key)
+                for key in keys]
+        else:
+            keys = [None] * len(requests)
+            IP_arrays = [None] * len(requests)
+        is_stored = parallel.bcast(
+            [IP_array is not None for IP_array in IP_arrays])
+        if not root_only and any(is_stored):
+            IP_arrays = parallel.bcast(IP_arrays)
+
+        missing_indices = [
+            index for index, stored in enumerate(is_stored) if not stored]
+        if missing_indices:
+            computed_IP_arrays = compute(
+                [requests[index] for index in missing_indices], root_only)
+            for index, IP_array in zip(missing_indices, computed_IP_arrays):
+                IP_arrays[index] = IP_array
+                if parallel.is_rank_zero() and keys[index] is not None:
+                    self.IP_array_store.save(keys[index], IP_array)
+        return IP_arrays
+
+
+    @_records_perf_stats
+    def compute_inner_product_array(
+        self, row_vec_handles, col_vec_handles, root_only=False):
         """Computes array whose elements are inner products of the vector
         objects in ``row_vec_handles`` and ``col_vec_handles``.
 
@@ -231,6 +2043,11 @@ class VectorSpaceHandles(object):
             corresponding to columns of the inner product array.  For example,
             in BPOD this is the direct snapshot array :math:`X`.
 
+        Kwargs:
+            ``root_only``: If True, the inner product array is only assembled
+            on rank zero, and ``None`` is returned on the other MPI workers
+            (processors).
+
         Returns:
             ``IP_array``: 2D array of inner products.
 
@@ -268,22 +2085,51 @@ class VectorSpaceHandles(object):
         processors, the processors are assigned unequal numbers of tasks.
         However, all processors are always part of the passing cycle.
 
+        The passing is pipelined: each MPI worker receives its next columns
+        while it computes the inner products for its current ones, and the MPI
+        workers do not synchronize between passes.
+
         The scaling is:
 
-        - num gets / processor ~ :math:`(n_r*n_c/((max-2)*n_p*n_p)) + n_r/n_p`
+        - num gets / processor ~ :math:`(n_r*n_c/((max-1)*n_p*n_p)) + n_r/n_p`
         - num MPI sends / processor ~
-          :math:`(n_p-1)*(n_r/((max-2)*n_p))*n_c/n_p`
+          :math:`(n_p-1)*(n_r/((max-1)*n_p))*n_c/(c*n_p)`
         - num inner products / processor ~ :math:`n_r*n_c/n_p`
 
         where :math:`n_r` is number of rows, :math:`n_c` number of columns,
         :math:`max` is
         ``max_vecs_per_proc = max_vecs_per_node/num_procs_per_node``,
-        and :math:`n_p` is the number of MPI workers (processors).
+        :math:`n_p` is the number of MPI workers (processors), and :math:`c`
+        is the number of columns each MPI worker has in memory at once.  See
+        :py:meth:`compute_chunk_plan` for how the chunks are chosen.
 
         If there are more rows than columns, then an internal transpose and
         un-transpose is performed to improve efficiency (since :math:`n_c` only
         appears in the scaling in the quadratic term).
+
+        Each MPI worker only stores the rows of the inner product array that it
+        computes.  They are gathered into the full array at the end, on all MPI
+        workers or, if ``root_only`` is true, on rank zero only.
+
+        If there is an ``IP_array_store``, the array is loaded from it when it
+        was stored for the same vecs and inner product, and otherwise is
+        stored after it is computed.
         """
+        if self.IP_array_store is not None:
+            return self._compute_with_IP_array_store(
+                [(row_vec_handles, col_vec_handles)],
+                lambda requests, root_only: [
+                    self._compute_inner_product_array(
+                        *request, root_only=root_only)
+                    for request in requests],
+                root_only)[0]
+        return self._compute_inner_product_array(
+            row_vec_handles, col_vec_handles, root_only=root_only)
+
+
+    def _compute_inner_product_array(
+        self, row_vec_handles, col_vec_handles, root_only=False):
+        """Implements :py:meth:`compute_inner_product_array`."""
         self._check_inner_product()
         row_vec_handles = util.make_iterable(row_vec_handles)
         col_vec_handles = util.make_iterable(col_vec_handles)
@@ -304,33 +2150,49 @@ class VectorSpaceHandles(object):
 
         # convenience
         rank = parallel.get_rank()
+        num_procs = parallel.get_num_procs()
+
+        # Col vecs are passed around a ring of MPI workers.  Determine with
+        # whom to communicate and create unique tags based on send/recv ranks.
+        dest = (rank + 1) % num_procs
+        source = (rank - 1) % num_procs
+        send_tag = rank * (num_procs + 1) + dest
+        recv_tag = source * (num_procs + 1) + rank
+
+        # Burn the first inner product, it sometimes contains slow imports
+        row_vec = self._get_vecs(row_vec_handles[:1])[0]
+        col_vec = self._get_vecs(col_vec_handles[:1])[0]
+        IP_burn = self._compute_IP_block([row_vec], [col_vec])
+
+        # Time the get method
+        start_time = time()
+        row_vec = self._get_vecs(row_vec_handles[:1])[0]
+        get_time = time() - start_time
+
+        # Time the inner product method and get inner product type (real or
+        # complex)
+        start_time = time()
+        IP = self._compute_IP_block([row_vec], [col_vec])
+        IP_time = time() - start_time
+        IP_type = IP.dtype
 
-        ## Old way that worked
-        # num_cols_per_proc_chunk is the number of cols each proc gets at once
-        num_cols_per_proc_chunk = 1
-        num_rows_per_proc_chunk = (
-            self.max_vecs_per_proc - num_cols_per_proc_chunk)
+        # Use the size of the vecs to find how many fit in memory
+        self._set_max_vecs_from_nbytes(
+            max(util.get_nbytes(row_vec), util.get_nbytes(col_vec)))
 
-        ## New way
-        #if self.max_vecs_per_node > max_num_row_tasks:
-        #    num_cols_per_proc_chunk =
-        #num_rows_per_proc_chunk = self.max_vecs_per_proc - \
-        #    num_cols_per_proc_chunk
+        # Choose the number of rows and cols each proc gets at once
+        self.chunk_plan = self.compute_chunk_plan(num_rows, num_cols)
+        num_rows_per_proc_chunk = self.chunk_plan.num_rows_per_proc_chunk
+        num_cols_per_proc_chunk = self.chunk_plan.num_cols_per_proc_chunk
 
         # Determine how the retrieving and inner products will be split up.
         row_tasks = parallel.find_assignments(list(range(num_rows)))
         col_tasks = parallel.find_assignments(list(range(num_cols)))
 
-        # Find max number of col tasks among all processors
-        max_num_row_tasks = max([len(tasks) for tasks in row_tasks])
-        max_num_col_tasks = max([len(tasks) for tasks in col_tasks])
-
         # These variables are the number of iters through loops that retrieve
         # ("get") row and column vecs.
-        num_row_get_loops = \
-            int(np.ceil(max_num_row_tasks*1./num_rows_per_proc_chunk))
-        num_col_get_loops = \
-            int(np.ceil(max_num_col_tasks*1./num_cols_per_proc_chunk))
+        num_row_get_loops = self.chunk_plan.num_row_chunks
+        num_col_get_loops = self.chunk_plan.num_col_chunks
         if num_row_get_loops > 1:
             self.print_msg((
                 'Warning: The column vecs, of which '
@@ -338,135 +2200,77 @@ class VectorSpaceHandles(object):
                 'number of nodes or max_vecs_per_node to reduce redundant '
                 'gets for a speedup.') % (num_cols, num_row_get_loops))
 
-        # Burn the first inner product, it sometimes contains slow imports
-        row_vec = row_vec_handles[0].get()
-        col_vec = col_vec_handles[0].get()
-        IP_burn = self.inner_product(row_vec, col_vec)
-
-        # Time the get method
-        start_time = time()
-        row_vec = row_vec_handles[0].get()
-        get_time = time() - start_time
-
-        # Time the inner product method and get inner product type (real or
-        # complex)
-        start_time = time()
-        IP = self.inner_product(row_vec, col_vec)
-        IP_time = time() - start_time
-        IP_type = type(IP)
-
         # Estimate time to compute entire inner product array
         total_IP_time = (
             num_rows * num_cols * IP_time / parallel.get_num_procs())
-        vecs_per_proc = (
-            self.max_vecs_per_node * parallel.get_num_nodes() /
-            parallel.get_num_procs())
-        num_gets =  (
-            num_rows * num_cols /
-            ((vecs_per_proc - 2) * parallel.get_num_procs() ** 2) +
-            num_rows / parallel.get_num_procs())
+        num_gets = (
+            self.chunk_plan.num_row_gets_per_proc +
+            self.chunk_plan.num_col_gets_per_proc)
         total_get_time = num_gets * get_time
         self.print_msg((
             'Computing the inner product array will take at least %.1f '
             'minutes.') % ((total_IP_time + total_get_time) / 60.))
         del row_vec, col_vec
 
-        # To find all of the inner product array chunks, each
-        # processor has a full IP_array with size
-        # num_rows x num_cols even though each processor is not responsible for
-        # filling in all of these entries. After each proc fills in what it is
-        # responsible for, the other entries remain 0's. Then, an allreduce
-        # is done and all the IP_arrays are summed. This is simpler than
-        # concatenating chunks of the IP_arrays.
-        # The efficiency is not an issue; the size of the arrays
-        # are small compared to the size of the vecs for large data.
-        IP_array = np.zeros((num_rows, num_cols), dtype=IP_type)
-        for row_get_index in range(num_row_get_loops):
-            if len(row_tasks[rank]) > 0:
-                start_row_index = min(
-                    row_tasks[rank][0] + (
-                        row_get_index * num_rows_per_proc_chunk),
-                    row_tasks[rank][-1] + 1)
-                end_row_index = min(
-                    row_tasks[rank][-1] + 1,
-                    start_row_index + num_rows_per_proc_chunk)
-                row_vecs = [
-                    row_vec_handle.get() for row_vec_handle in
-                    row_vec_handles[start_row_index:end_row_index]]
-            else:
-                row_vecs = []
-
-            for col_get_index in range(num_col_get_loops):
-                if len(col_tasks[rank]) > 0:
-                    start_col_index = min(
-                        col_tasks[rank][0] + (
-                            col_get_index * num_cols_per_proc_chunk),
-                        col_tasks[rank][-1] + 1)
-                    end_col_index = min(
-                        col_tasks[rank][-1] + 1,
-                        start_col_index + num_cols_per_proc_chunk)
-                else:
-                    start_col_index = 0
-                    end_col_index = 0
-
+        # Each processor only stores the rows of the IP_array it is
+        # responsible for, which are gathered at the end.  Row indices are
+        # offset by the first row this processor is responsible for.
+        IP_array = np.zeros((len(row_tasks[rank]), num_cols), dtype=IP_type)
+        if len(row_tasks[rank]) > 0:
+            first_row_index = row_tasks[rank][0]
+        else:
+            first_row_index = 0
+
+        # Find the chunks of rows and cols this proc is responsible for, and
+        # the order in which they are retrieved.
+        row_chunk_bounds = _find_chunk_bounds(
+            row_tasks[rank], num_rows_per_proc_chunk, num_row_get_loops)
+        col_chunk_bounds = _find_chunk_bounds(
+            col_tasks[rank], num_cols_per_proc_chunk, num_col_get_loops)
+        handle_chunks = []
+        for start_row_index, end_row_index in row_chunk_bounds:
+            handle_chunks.append(row_vec_handles[start_row_index:end_row_index])
+            for start_col_index, end_col_index in col_chunk_bounds:
+                handle_chunks.append(
+                    col_vec_handles[start_col_index:end_col_index])
+        vec_chunks = self._iter_vec_chunks(handle_chunks)
+        progress = _ProgressTracker(
+            self, 'compute_inner_product_array', num_rows * num_cols,
+            'inner products')
+
+        for start_row_index, end_row_index in row_chunk_bounds:
+            row_vecs = next(vec_chunks)
+
+            for start_col_index, end_col_index in col_chunk_bounds:
                 # Cycle the col vecs to proc with rank -> mod(rank+1,num_procs)
-                # Must do this for each processor, until data makes a circle
-                col_vecs_recv = (None, None)
+                # Must do this for each processor, until data makes a circle.
+                # On the first pass, get the col vecs.  In serial, the loop
+                # iterates once, with no send/recv.
                 col_indices = list(range(start_col_index, end_col_index))
-                for pass_index in range(parallel.get_num_procs()):
-                    # If on the first pass, get the col vecs, no send/recv
-                    # This is all that is called when in serial, loop iterates
-                    # once.
-                    if pass_index == 0:
-                        col_vecs = [
-                            col_handle.get() for col_handle in
-                            col_vec_handles[start_col_index:end_col_index]]
-                    else:
-                        # Determine with whom to communicate
-                        dest = (rank + 1) % parallel.get_num_procs()
-                        source = (rank - 1) % parallel.get_num_procs()
-
-                        # Create unique tag based on send/recv ranks
-                        send_tag = (
-                            rank * (parallel.get_num_procs() + 1) + dest)
-                        recv_tag = (
-                            source * (parallel.get_num_procs() + 1) + rank)
-
-                        # Collect data and send/receive
-                        col_vecs_send = (col_vecs, col_indices)
-                        request = parallel.comm.isend(
-                            col_vecs_send, dest=dest, tag=send_tag)
-                        col_vecs_recv = parallel.comm.recv(
-                            source=source, tag=recv_tag)
-                        request.Wait()
-                        parallel.barrier()
-                        col_indices = col_vecs_recv[1]
-                        col_vecs = col_vecs_recv[0]
+                col_vecs = next(vec_chunks)
+                for pass_index in range(num_procs):
+                    # Start passing the col vecs on, except on the last pass.
+                    # The next col vecs are received while the IPs for the
+                    # current ones are computed.
+                    if pass_index < num_procs - 1:
+                        exchange = self._start_exchange_vecs(
+                            col_vecs, col_indices, dest, source, send_tag,
+                            recv_tag)
 
                     # Compute the IPs for this set of data col_indices stores
                     # the indices of the IP_array columns to be filled in.
                     if len(row_vecs) > 0:
-                        for row_index in range(start_row_index, end_row_index):
-                            for col_vec_index, col_vec in enumerate(col_vecs):
-                                IP_array[
-                                    row_index,
-                                    col_indices[col_vec_index]
-                                ] = self.inner_product(
-                                    row_vecs[row_index - start_row_index],
-                                    col_vec)
-                        if (
-                            (time() - self.prev_print_time) >
-                            self.print_interval):
-                            num_completed_IPs = (np.abs(IP_array) > 0.).sum()
-                            percent_completed_IPs = (
-                                num_completed_IPs *
-                                parallel.get_num_MPI_workers() /
-                                (num_cols * num_rows)) * 100.
-                            self.print_msg(
-                                'Completed %.1f%% of inner products' %
-                                percent_completed_IPs,
-                                output_channel='stderr')
-                            self.prev_print_time = time()
+                        if len(col_vecs) > 0:
+                            IP_array[
+                                start_row_index - first_row_index:
+                                end_row_index - first_row_index,
+                                col_indices
+                            ] = self._compute_IP_block(row_vecs, col_vecs)
+                        progress.add(len(row_vecs) * len(col_vecs))
+
+                    # Finish receiving the col vecs for the next pass
+                    if pass_index < num_procs - 1:
+                        col_vecs, col_indices = exchange.wait()
 
                 # Clear the retrieved column vecs after done this pass cycle
                 del col_vecs
@@ -474,23 +2278,23 @@ class VectorSpaceHandles(object):
             # Completed a chunk of rows and all columns on all processors.
             del row_vecs
 
-        # Assign these chunks into IP_array.
-        if parallel.is_distributed():
-            IP_array = parallel.custom_comm.allreduce(IP_array)
+        # Assemble the rows from all processors into IP_array.
+        IP_array = self._gather_array_rows(
+            IP_array, row_tasks[rank], num_rows, root_only=root_only)
 
-        if transpose:
+        if transpose and IP_array is not None:
             IP_array = IP_array.conj().T
 
-        percent_completed_IPs = 100.
-        self.print_msg(
-            'Completed 100% of inner products', output_channel='stderr')
-        self.prev_print_time = time()
+        progress.finish()
 
-        parallel.barrier()
+        self._barrier()
         return IP_array
 
 
-    def compute_symm_inner_product_array(self, vec_handles):
+    @_records_perf_stats
+    def compute_symm_inner_product_array(
+        self, vec_handles, root_only=False, checkpoint_path=None,
+        checkpoint_interval=600.):
         """Computes symmetric array whose elements are inner products of the
         vector objects in ``vec_handles`` with each other.
 
@@ -499,6 +2303,19 @@ class VectorSpaceHandles(object):
             to both rows and columns.  For example, in POD this is the snapshot
             array :math:`X`.
 
+        Kwargs:
+            ``root_only``: If True, the inner product array is only assembled
+            on rank zero, and ``None`` is returned on the other MPI workers
+            (processors).
+
+            ``checkpoint_path``: Path to a ``.npz`` file in which the inner
+            products computed so far are saved.  If the file exists, the
+            computation resumes from it, skipping the inner products that
+            were already computed.
+
+            ``checkpoint_interval``: Minimum time (in seconds) between saves
+            of the checkpoint.
+
         Returns:
             ``IP_array``: 2D array of inner products.
 
@@ -509,22 +2326,118 @@ class VectorSpaceHandles(object):
         chunks.  The rectangular chunks are divided up among MPI workers
         (processors) as weighted tasks.  Once those have been computed, the
         triangular chunks are dealt with.
+
+        As in :py:meth:`compute_inner_product_array`, each MPI worker only
+        stores the rows of the inner product array that it computes until they
+        are gathered at the end.
+
+        The checkpoint is saved by rank zero at most once every
+        ``checkpoint_interval`` seconds, whenever the inner products of a group
+        of at most :py:data:`CHECKPOINT_NUM_COLS` columns or a pass of the
+        columns between MPI workers are completed, so it is saved during a set
+        of rows too.  It holds the completed rows, and the inner products of
+        the following rows computed so far, which are not computed again when
+        resuming.  It is identified
+        by the number of vecs, the pickled handles, and the name of the inner
+        product function and its value for the first vec, so a checkpoint
+        saved for a different computation raises a ``ValueError``.  A
+        computation can be resumed with a different number of MPI workers or
+        a different ``max_vecs_per_node``.  The file is not removed when the
+        computation completes.
+
+        As in :py:meth:`compute_inner_product_array`, the array is loaded from
+        or saved to ``IP_array_store`` if there is one.
         """
         # TODO: JON, write detailed documentation similar to
         # :py:meth:`compute_inner_product_array`.
+        if self.IP_array_store is not None:
+            return self._compute_with_IP_array_store(
+                [(vec_handles,)],
+                lambda requests, root_only: [
+                    self._compute_symm_inner_product_array(
+                        request[0], root_only=root_only,
+                        checkpoint_path=checkpoint_path,
+                        checkpoint_interval=checkpoint_interval)
+                    for request in requests],
+                root_only)[0]
+        return self._compute_symm_inner_product_array(
+            vec_handles, root_only=root_only, checkpoint_path=checkpoint_path,
+            checkpoint_interval=checkpoint_interval)
+
+
+    def _compute_symm_inner_product_array(
+        self, vec_handles, root_only=False, checkpoint_path=None,
+        checkpoint_interval=600., IP_mask=None):
+        """Implements :py:meth:`compute_symm_inner_product_array`.  If the
+        symmetric 2D boolean array ``IP_mask`` is given, only the inner
+        products for which it is true are computed, and the others are zero.
+        """
         self._check_inner_product()
         vec_handles = util.make_iterable(vec_handles)
         num_vecs = len(vec_handles)
-        total_num_IPs = num_vecs * (num_vecs + 1) / 2.
+        if IP_mask is None:
+            total_num_IPs = num_vecs * (num_vecs + 1) / 2.
+        else:
+            total_num_IPs = max(np.triu(IP_mask).sum(), 1)
+
+        # Col vecs of the rectangular chunks are passed around a ring of MPI
+        # workers.  Determine with whom to communicate and create unique tags
+        # based on send/recv ranks.
+        rank = parallel.get_rank()
+        num_procs = parallel.get_num_procs()
+        dest = (rank + 1) % num_procs
+        source = (rank - 1) % num_procs
+        send_tag = rank * (num_procs + 1) + dest
+        recv_tag = source * (num_procs + 1) + rank
+
+        # Burn the first inner product, as it sometimes contains slow imports
+        test_vec = self._get_vecs(vec_handles[:1])[0]
+        IP_burn = self._compute_IP_block([test_vec], [test_vec])
+
+        # Time the get method
+        start_time = time()
+        test_vec = self._get_vecs(vec_handles[:1])[0]
+        get_time = time() - start_time
+
+        # Time the inner product method and determine the inner product type
+        # (real or complex)
+        start_time = time()
+        IP = self._compute_IP_block([test_vec], [test_vec])
+        IP_time = time() - start_time
+        IP_type = IP.dtype
+
+        # Use the size of the vecs to find how many fit in memory
+        self._set_max_vecs_from_nbytes(util.get_nbytes(test_vec))
+
+        # Load the inner products computed in a previous run.  Only the vecs
+        # after the complete rows remain, and the rows of those vecs are only
+        # needed from the diagonal onwards, so the rest is the symmetric array
+        # of the remaining vecs, without the saved inner products.
+        checkpoint = None
+        if checkpoint_path is not None:
+            checkpoint = _SymmCheckpoint(
+                self, checkpoint_path, checkpoint_interval, vec_handles, IP)
+            if checkpoint.num_saved_rows > 0:
+                self.print_msg((
+                    'Resuming from checkpoint %s, %d of %d rows already '
+                    'computed') % (
+                    checkpoint_path, checkpoint.num_complete_rows, num_vecs))
+            vec_handles = vec_handles[checkpoint.num_complete_rows:]
+            num_vecs = len(vec_handles)
+            IP_mask = checkpoint.get_remaining_IP_mask(IP_mask)
+            if IP_mask is None:
+                total_num_IPs = num_vecs * (num_vecs + 1) / 2.
+            else:
+                total_num_IPs = max(np.triu(IP_mask).sum(), 1)
 
         # num_cols_per_chunk is the number of cols each proc gets at once.
         # Columns are retrieved if the array must be broken up into sets of
         # chunks.  Then symmetric upper triangular portions will be computed,
         # followed by a rectangular piece that uses columns not already in
         # memory.
-        num_cols_per_proc_chunk = 1
-        num_rows_per_proc_chunk = (
-            self.max_vecs_per_proc - num_cols_per_proc_chunk)
+        self.chunk_plan = self.compute_chunk_plan(num_vecs, num_vecs)
+        num_cols_per_proc_chunk = self.chunk_plan.num_cols_per_proc_chunk
+        num_rows_per_proc_chunk = self.chunk_plan.num_rows_per_proc_chunk
 
         # <nprocs> chunks are computed simulaneously, making up a set.
         num_cols_per_chunk = num_cols_per_proc_chunk * parallel.get_num_procs()
@@ -539,44 +2452,61 @@ class VectorSpaceHandles(object):
                 'to reduce redundant gets for a speedup.') %
                 (num_vecs,num_row_chunks))
 
-        # Burn the first inner product, as it sometimes contains slow imports
-        test_vec = vec_handles[0].get()
-        IP_burn = self.inner_product(test_vec, test_vec)
-
-        # Time the get method
-        start_time = time()
-        test_vec = vec_handles[0].get()
-        get_time = time() - start_time
-
-        # Time the inner product method and determine the inner product type
-        # (real or complex)
-        start_time = time()
-        IP = self.inner_product(test_vec, test_vec)
-        IP_time = time() - start_time
-        IP_type = type(IP)
-
         # Estimate the time to compute the total inner product array
         total_IP_time = (
             num_vecs ** 2 * IP_time / 2. / parallel.get_num_procs())
-        vecs_per_proc = (
-            self.max_vecs_per_node * parallel.get_num_nodes() /
-            parallel.get_num_procs())
-        num_gets =  (
-            (num_vecs ** 2 / 2.) / ((vecs_per_proc - 2) *
-            parallel.get_num_procs() ** 2) +
-            num_vecs / parallel.get_num_procs() / 2.)
+        num_gets = (
+            self.chunk_plan.num_row_gets_per_proc +
+            self.chunk_plan.num_col_gets_per_proc / 2.)
         total_get_time = num_gets * get_time
         self.print_msg((
             'Computing the inner product array will take at least %.1f '
             'minutes' % ((total_IP_time + total_get_time) / 60.)))
         del test_vec
 
-        # Use the same trick as in compute_IP_array, having each proc
-        # fill in elements of a num_rows x num_rows sized array, rather than
-        # assembling small chunks. This is done for the triangular portions.
-        # For the rectangular portions, the inner product array is filled
-        # in directly.
-        IP_array = np.zeros((num_vecs, num_vecs), dtype=IP_type)
+        # Find the chunks of vecs this proc retrieves, in order.  For each set
+        # of rows, these are the rows themselves followed by the cols of the
+        # rectangular portion next to the triangle.
+        handle_chunks = []
+        proc_row_indices = []
+        for start_row_index in range(0, num_vecs, num_rows_per_chunk):
+            end_row_index = min(num_vecs, start_row_index + num_rows_per_chunk)
+            proc_row_tasks = parallel.find_assignments(list(range(
+                start_row_index, end_row_index)))[parallel.get_rank()]
+            handle_chunks.append([vec_handles[i] for i in proc_row_tasks])
+            proc_row_indices.extend(proc_row_tasks)
+            for start_col_index in range(
+                end_row_index, num_vecs, num_cols_per_chunk):
+                end_col_index = min(
+                    start_col_index + num_cols_per_chunk, num_vecs)
+                proc_col_tasks = parallel.find_assignments(list(range(
+                    start_col_index, end_col_index)))[parallel.get_rank()]
+                handle_chunks.append([vec_handles[i] for i in proc_col_tasks])
+        vec_chunks = self._iter_vec_chunks(handle_chunks)
+
+        # As in compute_inner_product_array, each proc only stores the rows of
+        # the IP_array it is responsible for, in all of the triangular and
+        # rectangular portions.  They are gathered at the end.  Within each set
+        # of rows, local_row_index is the index of the first row of this proc
+        # in its IP_array.
+        IP_array = np.zeros((len(proc_row_indices), num_vecs), dtype=IP_type)
+        local_row_index = 0
+
+        # When checkpointing, the entries of IP_array that were computed are
+        # tracked, and the IPs between the vecs of each set of rows are
+        # computed in groups of at most CHECKPOINT_NUM_COLS columns, with a
+        # chance to save after each group.  The rectangular portions are
+        # saved after each pass of the col vecs around the ring.
+        if checkpoint is not None:
+            IP_done = np.zeros(IP_array.shape, dtype=bool)
+            num_cols_per_save = CHECKPOINT_NUM_COLS
+        else:
+            IP_done = None
+            num_cols_per_save = max(num_vecs, 1)
+        progress = _ProgressTracker(
+            self, 'compute_symm_inner_product_array', int(total_num_IPs),
+            'inner products')
+
         for start_row_index in range(0, num_vecs, num_rows_per_chunk):
             end_row_index = min(num_vecs, start_row_index + num_rows_per_chunk)
             proc_row_tasks_all = parallel.find_assignments(list(range(
@@ -584,12 +2514,10 @@ class VectorSpaceHandles(object):
             num_active_procs = len([
                 task for task in proc_row_tasks_all if task != []])
             proc_row_tasks = proc_row_tasks_all[parallel.get_rank()]
-            if len(proc_row_tasks)!=0:
-                row_vecs = [
-                    vec_handle.get() for vec_handle in
-                    vec_handles[proc_row_tasks[0]:proc_row_tasks[-1] + 1]]
-            else:
-                row_vecs = []
+            max_num_row_tasks = max([
+                len(tasks) for tasks in proc_row_tasks_all])
+            num_local_rows = local_row_index + len(proc_row_tasks)
+            row_vecs = next(vec_chunks)
 
             # Triangular chunks
             if len(proc_row_tasks) > 0:
@@ -598,20 +2526,53 @@ class VectorSpaceHandles(object):
                     proc_row_tasks[0], proc_row_tasks[-1] + 1)):
                     raise ValueError('Indices are not consecutive.')
 
-                # Per-processor triangles (using only vecs in memory)
-                for row_index in range(proc_row_tasks[0],
-                    proc_row_tasks[-1] + 1):
-                    # Diagonal term
-                    IP_array[row_index, row_index] = self.inner_product(
-                        row_vecs[row_index - proc_row_tasks[0]],
-                        row_vecs[row_index - proc_row_tasks[0]])
-
-                    # Off-diagonal terms
-                    for col_index in range(
-                        row_index + 1, proc_row_tasks[-1] + 1):
-                        IP_array[row_index, col_index] = self.inner_product(
-                            row_vecs[row_index - proc_row_tasks[0]],
-                            row_vecs[col_index - proc_row_tasks[0]])
+            # Per-processor triangles (using only vecs in memory), one group of
+            # columns at a time.  Every proc goes through the same number of
+            # groups, since saving a checkpoint involves all of them.
+            for start_col_index in range(
+                0, max_num_row_tasks, num_cols_per_save):
+                end_col_index = min(
+                    start_col_index + num_cols_per_save, len(proc_row_tasks))
+                if start_col_index < len(proc_row_tasks):
+                    col_tasks = proc_row_tasks[start_col_index:end_col_index]
+                    col_slice = slice(col_tasks[0], col_tasks[-1] + 1)
+                    triangle_IP_mask = _slice_mask(
+                        IP_mask, col_tasks, col_tasks)
+                    IP_array[
+                        local_row_index + start_col_index:
+                        local_row_index + end_col_index,
+                        col_slice
+                    ] = self._compute_masked_symm_IP_block(
+                        row_vecs[start_col_index:end_col_index],
+                        triangle_IP_mask)
+                    if triangle_IP_mask is None:
+                        progress.add(
+                            len(col_tasks) * (len(col_tasks) + 1) // 2)
+                    else:
+                        progress.add(int(np.triu(triangle_IP_mask).sum()))
+
+                    # The rows of the previous groups of columns
+                    if start_col_index > 0:
+                        block_IP_mask = _slice_mask(
+                            IP_mask, proc_row_tasks[:start_col_index],
+                            col_tasks)
+                        IP_array[
+                            local_row_index:local_row_index + start_col_index,
+                            col_slice
+                        ] = self._compute_masked_IP_block(
+                            row_vecs[:start_col_index],
+                            row_vecs[start_col_index:end_col_index],
+                            block_IP_mask)
+                        progress.add(_count_IPs(
+                            block_IP_mask, start_col_index, len(col_tasks)))
+                    if IP_done is not None:
+                        IP_done[
+                            local_row_index:local_row_index + end_col_index,
+                            col_slice] = True
+                if checkpoint is not None:
+                    checkpoint.save_if_due(
+                        IP_array[:num_local_rows], IP_done[:num_local_rows],
+                        proc_row_indices[:num_local_rows], end_row_index)
 
             # Number of square chunks to fill in is n * (n-1) / 2.  At each
             # iteration we fill in n of them, so we need (n-1) / 2
@@ -628,10 +2589,21 @@ class VectorSpaceHandles(object):
                 # The proc that data is received from is the "source"
                 source_rank = (my_rank - set_index - 1) % num_active_procs
 
-                # Find the maximum number of sends/recv to be done by any proc
-                max_num_to_send = int(np.ceil(1. * max([len(tasks) for \
-                    tasks in proc_row_tasks_all]) /\
-                    num_cols_per_proc_chunk))
+                # With an even number of active procs, on the last iteration
+                # the destination is also the source, so only the proc with
+                # the lower rank of each pair computes their IPs.
+                computes_IPs = not (
+                    num_active_procs % 2 == 0 and
+                    set_index == num_active_procs // 2 - 1 and
+                    my_rank > dest_rank)
+
+                # Find the maximum number of sends/recv to be done by any
+                # proc.  When checkpointing, the groups of rows sent are
+                # limited to num_cols_per_save.
+                num_cols_per_send = min(
+                    num_cols_per_proc_chunk, num_cols_per_save)
+                max_num_to_send = int(np.ceil(
+                    1. * max_num_row_tasks / num_cols_per_send))
                 '''
                 # Pad tasks with nan so that everyone has the same
                 # number of things to send.  Same for list of vecs with None.
@@ -645,63 +2617,56 @@ class VectorSpaceHandles(object):
                     my_row_indices += [np.nan] * (max_num_to_send - my_num_rows)
                     row_vecs += [[]] * (max_num_to_send - my_num_rows)
                 '''
-                for send_index in range(max_num_to_send):
-                    # Only processors responsible for rows communicate
-                    if my_num_rows > 0:
-                        # Send row vecs, in groups of num_cols_per_proc_chunk
-                        # These become columns in the ensuing computation
-                        start_col_index = send_index * num_cols_per_proc_chunk
+                # Only processors responsible for rows communicate
+                if my_num_rows > 0:
+                    # Send row vecs, in groups of num_cols_per_send
+                    # These become columns in the ensuing computation
+                    send_chunks = []
+                    for send_index in range(max_num_to_send):
+                        start_col_index = send_index * num_cols_per_send
                         end_col_index = min(
-                            start_col_index + num_cols_per_proc_chunk,
-                            my_num_rows)
-                        col_vecs_send = (
+                            start_col_index + num_cols_per_send, my_num_rows)
+                        send_chunks.append((
                             row_vecs[start_col_index:end_col_index],
-                            my_row_indices[start_col_index:end_col_index])
-
-                        # Create unique tags based on ranks
-                        send_tag = my_rank * (
-                            parallel.get_num_procs() + 1) + dest_rank
-                        recv_tag = source_rank * (
-                            parallel.get_num_procs() + 1) + my_rank
-
-                        # Send and receieve data.  The Wait() command after the
-                        # receive prevents a race condition not fixed by sync().
-                        # The Wait() is very important for the non-
-                        # blocking send (though we are unsure why).
-                        request = parallel.comm.isend(
-                            col_vecs_send, dest=dest_rank, tag=send_tag)
-                        col_vecs_recv = parallel.comm.recv(
-                            source=source_rank, tag=recv_tag)
-                        request.Wait()
-                        col_vecs = col_vecs_recv[0]
-                        my_col_indices = col_vecs_recv[1]
-
-                        for row_index in range(
-                            my_row_indices[0], my_row_indices[-1] + 1):
-                            for col_vec_index, col_vec in enumerate(col_vecs):
-                                IP_array[
-                                    row_index,
-                                    my_col_indices[col_vec_index]
-                                ] = self.inner_product(
-                                    row_vecs[row_index - my_row_indices[0]],
-                                    col_vec)
-                            if (
-                                (time() - self.prev_print_time) >
-                                self.print_interval):
-                                num_completed_IPs = np.sum(
-                                    np.abs(np.triu(IP_array)) > 0.)
-                                percent_completed_IPs = (
-                                    num_completed_IPs *
-                                    parallel.get_num_MPI_workers() /
-                                    total_num_IPs) * 100.
-                                self.print_msg(
-                                    'Completed %.1f%% of inner products' %
-                                    percent_completed_IPs,
-                                    output_channel='stderr')
-                                self.prev_print_time = time()
-
-                    # Sync after send/receive
-                    parallel.barrier()
+                            my_row_indices[start_col_index:end_col_index]))
+
+                    # Create unique tags based on ranks
+                    set_send_tag = my_rank * (num_procs + 1) + dest_rank
+                    set_recv_tag = source_rank * (num_procs + 1) + my_rank
+
+                    # Send and receive data.  Each group is received while the
+                    # IPs for the previous one are computed.
+                    for col_vecs, my_col_indices in _pipeline_exchanges(
+                        send_chunks, dest_rank, source_rank, set_send_tag,
+                        set_recv_tag,
+                        start_exchange_vecs=self._start_exchange_vecs):
+                        if computes_IPs and len(col_vecs) > 0:
+                            block_IP_mask = _slice_mask(
+                                IP_mask, my_row_indices, my_col_indices)
+                            IP_array[
+                                local_row_index:local_row_index + my_num_rows,
+                                my_col_indices
+                            ] = self._compute_masked_IP_block(
+                                row_vecs, col_vecs, block_IP_mask)
+                            progress.add(_count_IPs(
+                                block_IP_mask, my_num_rows, len(col_vecs)))
+                            if IP_done is not None:
+                                IP_done[
+                                    local_row_index:num_local_rows,
+                                    my_col_indices] = True
+                        if checkpoint is not None:
+                            checkpoint.save_if_due(
+                                IP_array[:num_local_rows],
+                                IP_done[:num_local_rows],
+                                proc_row_indices[:num_local_rows],
+                                end_row_index)
+                    del send_chunks
+                elif checkpoint is not None:
+                    for send_index in range(max_num_to_send):
+                        checkpoint.save_if_due(
+                            IP_array[:num_local_rows],
+                            IP_done[:num_local_rows],
+                            proc_row_indices[:num_local_rows], end_row_index)
 
             # Fill in the rectangular portion next to each triangle (if nec.).
             # Start at index after last row, continue to last column. This part
@@ -716,109 +2681,542 @@ class VectorSpaceHandles(object):
 
                 # Pass the col vecs to proc with rank -> mod(rank+1,numProcs)
                 # Must do this for each processor, until data makes a circle
-                col_vecs_recv = (None, None)
                 if len(proc_col_tasks) > 0:
                     col_indices = list(range(
                         proc_col_tasks[0], proc_col_tasks[-1] + 1))
                 else:
                     col_indices = []
 
-                for num_passes in range(parallel.get_num_procs()):
-                    # If on the first pass, get the col vecs, no send/recv
-                    # This is all that is called when in serial, loop iterates
-                    # once.
-                    if num_passes == 0:
-                        if len(col_indices) > 0:
-                            col_vecs = [
-                                col_handle.get() for col_handle in
-                                vec_handles[col_indices[0]:col_indices[-1] + 1]]
-                        else:
-                            col_vecs = []
-                    else:
-                        # Determine whom to communicate with
-                        dest = (
-                            (parallel.get_rank() + 1) %
-                            parallel.get_num_procs())
-                        source = (
-                            (parallel.get_rank() - 1) %
-                            parallel.get_num_procs())
-
-                        # Create unique tag based on ranks
-                        send_tag = parallel.get_rank() * (
-                            parallel.get_num_procs() + 1) + dest
-                        recv_tag = source * (
-                            parallel.get_num_procs() + 1) + parallel.get_rank()
-
-                        # Collect data and send/receive
-                        col_vecs_send = (col_vecs, col_indices)
-                        request = parallel.comm.isend(
-                            col_vecs_send, dest=dest, tag=send_tag)
-                        col_vecs_recv = parallel.comm.recv(
-                            source=source, tag=recv_tag)
-                        request.Wait()
-                        parallel.barrier()
-                        col_indices = col_vecs_recv[1]
-                        col_vecs = col_vecs_recv[0]
+                # On the first pass, get the col vecs.  In serial, the loop
+                # iterates once, with no send/recv.
+                col_vecs = next(vec_chunks)
+                for pass_index in range(num_procs):
+                    # Start passing the col vecs on, except on the last pass.
+                    # The next col vecs are received while the IPs for the
+                    # current ones are computed.
+                    if pass_index < num_procs - 1:
+                        exchange = self._start_exchange_vecs(
+                            col_vecs, col_indices, dest, source, send_tag,
+                            recv_tag)
 
                     # Compute the IPs for this set of data col_indices stores
                     # the indices of the IP_array columns to be
                     # filled in.
                     if len(proc_row_tasks) > 0:
-                        for row_index in range(
-                            proc_row_tasks[0], proc_row_tasks[-1] + 1):
-                            for col_vec_index, col_vec in enumerate(col_vecs):
-                                IP_array[
-                                    row_index,
-                                    col_indices[col_vec_index]
-                                ] = self.inner_product(
-                                    row_vecs[row_index - proc_row_tasks[0]],
-                                    col_vec)
-                        if (
-                            (time() - self.prev_print_time) >
-                            self.print_interval):
-                            num_completed_IPs = np.sum(
-                                np.abs(np.triu(IP_array)) > 0.)
-                            percent_completed_IPs = (
-                                num_completed_IPs *
-                                parallel.get_num_MPI_workers() /
-                                total_num_IPs) * 100.
-                            self.print_msg(
-                                'Completed %.1f%% of inner products' %
-                                percent_completed_IPs,
-                                output_channel='stderr')
-                            self.prev_print_time = time()
+                        if len(col_vecs) > 0:
+                            block_IP_mask = _slice_mask(
+                                IP_mask, proc_row_tasks, col_indices)
+                            IP_array[
+                                local_row_index:
+                                local_row_index + len(proc_row_tasks),
+                                col_indices
+                            ] = self._compute_masked_IP_block(
+                                row_vecs, col_vecs, block_IP_mask)
+                            progress.add(_count_IPs(
+                                block_IP_mask, len(proc_row_tasks),
+                                len(col_vecs)))
+                            if IP_done is not None:
+                                IP_done[
+                                    local_row_index:num_local_rows,
+                                    col_indices] = True
+
+                    # Finish receiving the col vecs for the next pass
+                    if pass_index < num_procs - 1:
+                        col_vecs, col_indices = exchange.wait()
+                    if checkpoint is not None:
+                        checkpoint.save_if_due(
+                            IP_array[:num_local_rows],
+                            IP_done[:num_local_rows],
+                            proc_row_indices[:num_local_rows], end_row_index)
+
+                # Clear the retrieved column vecs after done this pass cycle
+                del col_vecs
 
             # Completed a chunk of rows and all columns on all processors.
             # Finished row_vecs loop, delete memory used
             del row_vecs
+            local_row_index += len(proc_row_tasks)
+        del IP_done
+
+        # Assemble the rows from all processors into IP_array.
+        IP_array = self._gather_array_rows(
+            IP_array, proc_row_indices, num_vecs, root_only=root_only)
+
+        # Combine with the inner products from the checkpoint
+        if checkpoint is not None and checkpoint.num_saved_rows > 0:
+            if not root_only:
+                checkpoint.bcast_saved_rows()
+            if IP_array is not None:
+                IP_array = checkpoint.add_saved_rows(IP_array)[0]
+            del checkpoint
+
+        # Collect the values computed only below the diagonal and symmetrize
+        # the array.  This is only done where the array was assembled.
+        if IP_array is not None:
+            IP_array = _move_to_upper_triangle(IP_array)
+            IP_array += np.triu(IP_array, 1).conj().T
 
-        # Assign the triangular portion chunks into IP_array.
-        if parallel.is_distributed():
-            IP_array = parallel.custom_comm.allreduce(IP_array)
+        # Print progress
+        progress.finish()
 
-        # Create a mask for the repeated values.  Select values that are zero
-        # in the upper triangular portion (not computed there) but nonzero in
-        # the lower triangular portion (computed there).  For the case where
-        # the inner product is not perfectly symmetric, this will select the
-        # computation done in the upper triangular portion.
-        mask = np.multiply(IP_array == 0., IP_array.conj().T != 0)
+        # Return inner product array
+        self._barrier()
+        return IP_array
 
-        # Collect values below diagonal
-        IP_array += np.multiply(np.triu(IP_array.conj().T, 1), mask)
 
-        # Symmetrize array
-        IP_array = np.triu(IP_array) + np.triu(IP_array, 1).conj().T
+    def _append_checkpoint_rows(self, checkpoint_rows, rows, num_vecs):
+        """Returns the rows of a symmetric inner product array, made of the
+        rows saved in a checkpoint followed by the rows of the vecs after them,
+        whose columns also start after them."""
+        if checkpoint_rows is None or checkpoint_rows.shape[0] == 0:
+            return rows
+        num_checkpoint_rows = checkpoint_rows.shape[0]
+        all_rows = np.zeros(
+            (num_checkpoint_rows + rows.shape[0], num_vecs),
+            dtype=np.result_type(checkpoint_rows, rows))
+        all_rows[:num_checkpoint_rows] = checkpoint_rows
+        all_rows[num_checkpoint_rows:, num_checkpoint_rows:] = rows
+        return all_rows
 
-        # Print progress
-        self.print_msg(
-            'Completed 100% of inner products', output_channel='stderr')
-        self.prev_print_time = time()
 
-        # Return inner product array
-        parallel.barrier()
+    @_records_perf_stats
+    def compute_inner_product_arrays(self, requests, root_only=False):
+        """Computes several arrays of inner products of vector objects
+        together, retrieving the vector objects shared by the arrays fewer
+        times than if the arrays were computed separately.
+
+        Args:
+            ``requests``: List of ``(row_vec_handles, col_vec_handles)``
+            tuples, one for each inner product array.  A request whose rows and
+            columns are the same handles is a symmetric array.
+
+        Kwargs:
+            ``root_only``: If True, the inner product arrays are only assembled
+            on rank zero, and ``None`` is returned in their place on the other
+            MPI workers (processors).
+
+        Returns:
+            ``IP_arrays``: List of 2D arrays of inner products, one for each
+            request.
+
+        Handles that appear in several requests, or as both rows and columns,
+        are identified by identity (``is``), not equality.  The arrays are
+        computed with the algorithm of :py:meth:`compute_inner_product_array`,
+        with the rows of all of the arrays as rows.  Each set of rows is
+        retrieved once and shared by all of the arrays, and only the columns
+        needed by the arrays with rows in the set are passed around the MPI
+        workers.  Columns whose handles are rows of the set are not retrieved
+        again, and for symmetric arrays, only the inner products on or above
+        the diagonal are computed, as in
+        :py:meth:`compute_symm_inner_product_array`.  Each MPI worker only
+        stores its rows of each array until they are gathered.  The arrays are
+        computed separately instead if that retrieves no more vector objects,
+        as predicted from the chunks of each method.  For example, the
+        correlation and cross-correlation arrays of DMD are computed with::
+
+          correlation_array, cross_correlation_array =\\
+              vec_space.compute_inner_product_arrays([
+                  (vec_handles, vec_handles), (vec_handles, adv_vec_handles)])
+
+        The inner product is assumed to be symmetric (Hermitian), i.e., the
+        inner product of two vectors in reverse order is the complex conjugate.
+
+        If there is an ``IP_array_store``, the arrays stored for the same vecs
+        and inner product are loaded from it, only the others are computed,
+        and they are then stored.
+        """
+        if self.IP_array_store is not None:
+            return self._compute_with_IP_array_store(
+                requests, self._compute_inner_product_arrays, root_only)
+        return self._compute_inner_product_arrays(
+            requests, root_only=root_only)
+
+
+    def _compute_inner_product_arrays(self, requests, root_only=False):
+        """Implements :py:meth:`compute_inner_product_arrays`."""
+        self._check_inner_product()
+        requests = [
+            (util.make_iterable(row_vec_handles),
+                util.make_iterable(col_vec_handles))
+            for row_vec_handles, col_vec_handles in requests]
+
+        # The number of vecs that fit in memory determines the chunks
+        if self.max_bytes_per_node is not None:
+            self._set_max_vecs_from_nbytes(max([
+                util.get_nbytes(vec) for vec in self._get_vecs([
+                    requests[0][0][0], requests[0][1][0]])]))
+
+        # Compute the arrays together, with the rows and cols in whichever
+        # orientation retrieves fewer vecs, only if that retrieves fewer vecs
+        # than computing them separately.
+        plan = min(
+            [
+                _InnerProductArraysPlan(self, requests, transpose=transpose)
+                for transpose in [False, True]],
+            key=lambda plan: plan.num_gets)
+        num_separate_gets = sum([
+            self._predict_num_gets(
+                row_vec_handles, None if is_symm else col_vec_handles)
+            for (row_vec_handles, col_vec_handles), is_symm in zip(
+                requests, plan.is_symm)])
+        if plan.num_gets >= num_separate_gets:
+            return [
+                self._compute_symm_inner_product_array(
+                    row_vec_handles, root_only=root_only)
+                if is_symm else
+                self._compute_inner_product_array(
+                    row_vec_handles, col_vec_handles, root_only=root_only)
+                for (row_vec_handles, col_vec_handles), is_symm in zip(
+                    requests, plan.is_symm)]
+
+        # Col vecs are passed around a ring of MPI workers.  Determine with
+        # whom to communicate and create unique tags based on send/recv ranks.
+        rank = parallel.get_rank()
+        num_procs = parallel.get_num_procs()
+        dest = (rank + 1) % num_procs
+        source = (rank - 1) % num_procs
+        send_tag = rank * (num_procs + 1) + dest
+        recv_tag = source * (num_procs + 1) + rank
+
+        # Burn the first inner product, it sometimes contains slow imports
+        row_vec = self._get_vecs(plan.row_vec_handles[:1])[0]
+        col_vec = self._get_vecs(plan.col_vec_handles[:1])[0]
+        IP_burn = self._compute_IP_block([row_vec], [col_vec])
+
+        # Time the get method
+        start_time = time()
+        row_vec = self._get_vecs(plan.row_vec_handles[:1])[0]
+        get_time = time() - start_time
+
+        # Time the inner product method and get inner product type (real or
+        # complex)
+        start_time = time()
+        IP = self._compute_IP_block([row_vec], [col_vec])
+        IP_time = time() - start_time
+        IP_type = IP.dtype
+        del row_vec, col_vec
+
+        self.chunk_plan = plan.chunk_plan
+        num_row_chunks = plan.chunk_plan.num_row_chunks
+        num_cols_per_proc_chunk = plan.chunk_plan.num_cols_per_proc_chunk
+        if num_row_chunks > 1:
+            self.print_msg((
+                'Warning: The column vecs will be retrieved up to %d times '
+                'each. Increase number of nodes or max_vecs_per_node to '
+                'reduce redundant gets for a speedup.') % num_row_chunks)
+
+        # Estimate time to compute all of the inner product arrays
+        num_IPs = sum([
+            len(row_positions) * (len(row_positions) + 1) // 2 if is_symm
+            else len(row_positions) * len(col_positions)
+            for row_positions, col_positions, is_symm in zip(
+                plan.request_row_positions, plan.request_col_positions,
+                plan.is_symm)])
+        self.print_msg((
+            'Computing the inner product arrays will take at least %.1f '
+            'minutes.') % (
+            (num_IPs * IP_time + plan.num_gets * get_time) / num_procs / 60.))
+
+        # Each processor only stores the rows of each array whose handles are
+        # among the rows it is responsible for, which are gathered at the end.
+        my_request_rows = [
+            np.nonzero(plan.row_ranks[row_positions] == rank)[0]
+            for row_positions in plan.request_row_positions]
+        IP_arrays = [
+            np.zeros((len(my_rows), len(col_positions)), dtype=IP_type)
+            for my_rows, col_positions in zip(
+                my_request_rows, plan.request_col_positions)]
+
+        # Find the chunks of rows and retrieved cols this proc is responsible
+        # for, and the order in which they are retrieved.
+        my_col_chunks = [
+            [
+                parallel.find_assignments(col_chunk.tolist())[rank]
+                for col_chunk in col_chunks]
+            for col_chunks in plan.retrieved_col_chunks]
+        handle_chunks = []
+        for chunk_index in range(num_row_chunks):
+            start_row_index, end_row_index = plan.row_chunk_bounds[rank][
+                chunk_index]
+            handle_chunks.append(
+                plan.row_vec_handles[start_row_index:end_row_index])
+            for col_positions in my_col_chunks[chunk_index]:
+                handle_chunks.append(
+                    [plan.col_vec_handles[i] for i in col_positions])
+        vec_chunks = self._iter_vec_chunks(handle_chunks)
+        progress = _ProgressTracker(
+            self, 'compute_inner_product_arrays', num_IPs, 'inner products')
+
+        for chunk_index in range(num_row_chunks):
+            start_row_index, end_row_index = plan.row_chunk_bounds[rank][
+                chunk_index]
+            row_vecs = next(vec_chunks)
+
+            # Find the rows of each array among row_vecs, and among the rows
+            # stored by this proc
+            chunk_rows = []
+            for row_positions, my_rows in zip(
+                plan.request_row_positions, my_request_rows):
+                row_indices = np.nonzero(np.multiply(
+                    row_positions >= start_row_index,
+                    row_positions < end_row_index))[0]
+                chunk_rows.append((
+                    row_indices, row_positions[row_indices] - start_row_index,
+                    np.searchsorted(my_rows, row_indices)))
+
+            # The cols whose handles are rows in memory on this proc, e.g.,
+            # the diagonal blocks of symmetric arrays, are used first, then
+            # passed to the other procs in groups of num_cols_per_proc_chunk.
+            memory_cols = plan.memory_cols[chunk_index][rank]
+            memory_col_vecs = [
+                row_vecs[i] for i in
+                plan.col_row_positions[memory_cols] - start_row_index]
+            progress.add(self._compute_IP_blocks_of_arrays(
+                plan, IP_arrays, chunk_rows, row_vecs, memory_col_vecs,
+                memory_cols))
+            num_memory_col_groups = max([
+                int(np.ceil(len(cols) * 1. / num_cols_per_proc_chunk))
+                for cols in plan.memory_cols[chunk_index]])
+            for group_index in range(num_memory_col_groups):
+                group_slice = slice(
+                    group_index * num_cols_per_proc_chunk,
+                    (group_index + 1) * num_cols_per_proc_chunk)
+                for pass_index, (col_vecs, col_positions) in enumerate(
+                    _cycle_vecs(
+                        memory_col_vecs[group_slice],
+                        memory_cols[group_slice].tolist(), dest, source,
+                        send_tag, recv_tag,
+                        start_exchange_vecs=self._start_exchange_vecs)):
+                    if pass_index > 0:
+                        progress.add(self._compute_IP_blocks_of_arrays(
+                            plan, IP_arrays, chunk_rows, row_vecs, col_vecs,
+                            col_positions))
+            del memory_col_vecs
+
+            # The other cols are retrieved, and passed around the ring as in
+            # compute_inner_product_array
+            for col_positions in my_col_chunks[chunk_index]:
+                for col_vecs, col_positions in _cycle_vecs(
+                    next(vec_chunks), col_positions, dest, source, send_tag,
+                    recv_tag, start_exchange_vecs=self._start_exchange_vecs):
+                    progress.add(self._compute_IP_blocks_of_arrays(
+                        plan, IP_arrays, chunk_rows, row_vecs, col_vecs,
+                        col_positions))
+                del col_vecs
+            del row_vecs
+
+        # Assemble the rows of each array from all processors.  Only the
+        # upper-triangular portions of the symmetric arrays were computed.
+        for request_index, (my_rows, row_positions, is_symm) in enumerate(
+            zip(my_request_rows, plan.request_row_positions, plan.is_symm)):
+            IP_array = self._gather_array_rows(
+                IP_arrays[request_index], my_rows, len(row_positions),
+                root_only=root_only)
+            if IP_array is not None:
+                if is_symm:
+                    IP_array = np.triu(IP_array)
+                    IP_array += np.triu(IP_array, 1).conj().T
+                elif plan.transpose:
+                    IP_array = IP_array.conj().T
+            IP_arrays[request_index] = IP_array
+
+        progress.finish()
+
+        self._barrier()
+        return IP_arrays
+
+
+    def _compute_IP_blocks_of_arrays(
+        self, plan, IP_arrays, chunk_rows, row_vecs, col_vecs, col_positions):
+        """Computes the inner products of the vector objects ``row_vecs`` with
+        ``col_vecs`` needed by each of the arrays planned by the
+        :py:class:`_InnerProductArraysPlan` ``plan``, and fills them into the
+        rows of the arrays ``IP_arrays`` stored by this MPI worker.  For each
+        array, ``chunk_rows`` holds the indices of its rows among
+        ``row_vecs``, their indices in the array and among its stored rows,
+        and ``col_positions`` are the positions of ``col_vecs`` among the
+        distinct cols.  Returns the number of inner products computed."""
+        col_positions = np.array(col_positions, dtype=int)
+        col_sorter = np.argsort(col_positions)
+        num_IPs = 0
+        for (
+            IP_array, (row_indices, row_vec_indices, local_row_indices),
+            request_col_positions, is_symm) in zip(
+            IP_arrays, chunk_rows, plan.request_col_positions, plan.is_symm):
+            if len(row_indices) == 0 or len(col_positions) == 0:
+                continue
+            col_indices = np.nonzero(
+                np.isin(request_col_positions, col_positions))[0]
+            if len(col_indices) == 0:
+                continue
+            col_vec_indices = col_sorter[np.searchsorted(
+                col_positions, request_col_positions[col_indices],
+                sorter=col_sorter)]
+            block_row_vecs = [row_vecs[i] for i in row_vec_indices]
+            block_col_vecs = [col_vecs[j] for j in col_vec_indices]
+
+            # Of a symmetric array, only the entries on or above the diagonal
+            # are computed
+            if not is_symm:
+                IP_block = self._compute_IP_block(
+                    block_row_vecs, block_col_vecs)
+                num_IPs += len(row_indices) * len(col_indices)
+            elif np.array_equal(row_indices, col_indices):
+                IP_block = self._compute_symm_IP_block(block_row_vecs)
+                num_IPs += len(row_indices) * (len(row_indices) + 1) // 2
+            else:
+                IP_mask = (
+                    col_indices[np.newaxis, :] >= row_indices[:, np.newaxis])
+                if not IP_mask.any():
+                    continue
+                IP_block = self._compute_masked_IP_block(
+                    block_row_vecs, block_col_vecs, IP_mask)
+                num_IPs += int(IP_mask.sum())
+            IP_array[np.ix_(local_row_indices, col_indices)] = IP_block
+        return num_IPs
+
+
+    @_records_perf_stats
+    def extend_inner_product_array(
+        self, IP_array, row_vec_handles, col_vec_handles,
+        new_row_vec_handles=None, new_col_vec_handles=None, root_only=False):
+        """Extends an inner product array computed by
+        :py:meth:`compute_inner_product_array` with the inner products of new
+        vector objects, without recomputing the existing inner products.
+
+        Args:
+            ``IP_array``: 2D array of inner products of the vector objects in
+            ``row_vec_handles`` and ``col_vec_handles``.
+
+            ``row_vec_handles``: List of handles for the vector objects
+            corresponding to the rows of ``IP_array``.
+
+            ``col_vec_handles``: List of handles for the vector objects
+            corresponding to the columns of ``IP_array``.
+
+        Kwargs:
+            ``new_row_vec_handles``: List of handles for vector objects
+            corresponding to new rows, appended after the existing ones.
+
+            ``new_col_vec_handles``: List of handles for vector objects
+            corresponding to new columns, appended after the existing ones.
+
+            ``root_only``: If True, the inner product array is only assembled
+            on rank zero, and ``None`` is returned on the other MPI workers
+            (processors).  ``IP_array`` is only needed on rank zero.
+
+        Returns:
+            ``IP_array``: 2D array of inner products of the vector objects in
+            ``row_vec_handles + new_row_vec_handles`` and ``col_vec_handles +
+            new_col_vec_handles``.
+
+        Only the inner products of the existing rows with the new columns and
+        of the new rows with all of the columns are computed, so the cost is
+        proportional to the number of new vectors.
+        """
+        row_vec_handles = util.make_iterable(row_vec_handles)
+        col_vec_handles = util.make_iterable(col_vec_handles)
+        if new_row_vec_handles is None:
+            new_row_vec_handles = []
+        if new_col_vec_handles is None:
+            new_col_vec_handles = []
+        new_row_vec_handles = util.make_iterable(new_row_vec_handles)
+        new_col_vec_handles = util.make_iterable(new_col_vec_handles)
+        if IP_array is not None and IP_array.shape != (
+            len(row_vec_handles), len(col_vec_handles)):
+            raise ValueError((
+                'Shape of IP_array %s does not match number of row (%d) and '
+                'column (%d) handles') % (
+                str(IP_array.shape), len(row_vec_handles),
+                len(col_vec_handles)))
+
+        # Existing rows with new columns
+        if len(row_vec_handles) > 0 and len(new_col_vec_handles) > 0:
+            new_cols_IP_array = self.compute_inner_product_array(
+                row_vec_handles, new_col_vec_handles, root_only=root_only)
+            if IP_array is not None and new_cols_IP_array is not None:
+                IP_array = np.hstack((IP_array, new_cols_IP_array))
+            del new_cols_IP_array
+
+        # New rows with all columns
+        if len(new_row_vec_handles) > 0:
+            new_rows_IP_array = self.compute_inner_product_array(
+                new_row_vec_handles,
+                list(col_vec_handles) + list(new_col_vec_handles),
+                root_only=root_only)
+            if IP_array is not None and new_rows_IP_array is not None:
+                IP_array = np.vstack((IP_array, new_rows_IP_array))
+            del new_rows_IP_array
+
+        if root_only and not parallel.is_rank_zero():
+            return None
         return IP_array
 
 
+    @_records_perf_stats
+    def extend_symm_inner_product_array(
+        self, IP_array, vec_handles, new_vec_handles, root_only=False):
+        """Extends a symmetric inner product array computed by
+        :py:meth:`compute_symm_inner_product_array` with the inner products of
+        new vector objects, without recomputing the existing inner products.
+
+        Args:
+            ``IP_array``: 2D array of inner products of the vector objects in
+            ``vec_handles`` with each other.
+
+            ``vec_handles``: List of handles for the vector objects
+            corresponding to the rows and columns of ``IP_array``.
+
+            ``new_vec_handles``: List of handles for new vector objects,
+            appended after the existing ones.
+
+        Kwargs:
+            ``root_only``: If True, the inner product array is only assembled
+            on rank zero, and ``None`` is returned on the other MPI workers
+            (processors).  ``IP_array`` is only needed on rank zero.
+
+        Returns:
+            ``IP_array``: 2D array of inner products of the vector objects in
+            ``vec_handles + new_vec_handles`` with each other.
+
+        Only the inner products of the existing vectors with the new vectors
+        and of the new vectors with each other are computed, so the cost is
+        proportional to the number of new vectors.  For example, if snapshots
+        are added to a POD dataset::
+
+          IP_array = vec_space.compute_symm_inner_product_array(vec_handles)
+          IP_array = vec_space.extend_symm_inner_product_array(
+              IP_array, vec_handles, new_vec_handles)
+        """
+        vec_handles = util.make_iterable(vec_handles)
+        new_vec_handles = util.make_iterable(new_vec_handles)
+        num_vecs = len(vec_handles)
+        if IP_array is not None and IP_array.shape != (num_vecs, num_vecs):
+            raise ValueError((
+                'Shape of IP_array %s does not match number of handles '
+                '(%d)') % (str(IP_array.shape), num_vecs))
+        if len(new_vec_handles) == 0:
+            if root_only and not parallel.is_rank_zero():
+                return None
+            return IP_array
+
+        # Existing vecs with new vecs, and new vecs with each other
+        if num_vecs > 0:
+            cross_IP_array = self.compute_inner_product_array(
+                vec_handles, new_vec_handles, root_only=root_only)
+        new_IP_array = self.compute_symm_inner_product_array(
+            new_vec_handles, root_only=root_only)
+
+        if num_vecs == 0:
+            return new_IP_array
+        if (root_only and not parallel.is_rank_zero()) or IP_array is None:
+            return None
+        return np.vstack((
+            np.hstack((IP_array, cross_IP_array)),
+            np.hstack((cross_IP_array.conj().T, new_IP_array))))
+
+
+    @_records_perf_stats
     def lin_combine(
         self, sum_vec_handles, basis_vec_handles, coeff_array,
         coeff_array_col_indices=None):
@@ -851,106 +3249,87 @@ class VectorSpaceHandles(object):
 
         Scaling is:
 
-          num gets/worker = :math:`n_s/(n_p*(max-2)) * n_b/n_p`
+          num gets/worker = :math:`n_s/(n_p*(max-1)) * n_b/n_p`
 
-          passes/worker = :math:`(n_p-1) * n_s/(n_p*(max-2)) * (n_b/n_p)`
+          passes/worker = :math:`(n_p-1) * n_s/(n_p*(max-1)) * n_b/(b*n_p)`
 
           scalar multiplies/worker = :math:`n_s*n_b/n_p`
 
         where :math:`n_s` is number of sum vecs, :math:`n_b` is
         number of basis vecs,
         :math:`n_p` is number of processors,
-        :math:`max` = ``max_vecs_per_node``.
+        :math:`max` = ``max_vecs_per_node``, and :math:`b` is the number of
+        basis vectors each MPI worker has in memory at once.  See
+        :py:meth:`compute_chunk_plan` for how the chunks are chosen.
+
+        If the basis vector objects are numpy arrays of the same shape and
+        dtype, each chunk of them is stacked into a 2D array and the sums are
+        computed with matrix products, in one block per chunk of sums.  The
+        sum arrays that are put are then views of the rows of that block.
+        Otherwise, the sums are accumulated one basis vector at a time with
+        :py:func:`vectors.axpy`.
         """
         sum_vec_handles = util.make_iterable(sum_vec_handles)
         basis_vec_handles = util.make_iterable(basis_vec_handles)
         num_bases = len(basis_vec_handles)
         num_sums = len(sum_vec_handles)
-
-        # Force coefficients to be array
-        coeff_array = np.array(coeff_array)
-
-        # Check for 1d coefficient arrays
-        if coeff_array.ndim < 2:
-
-            # If there is only one basis vector, then force the coefficient
-            # array to be a row vector.
-            if num_bases == 1:
-                coeff_array = util.atleast_2d_row(coeff_array)
-
-            # Otherwise, force it to be a column vector.
-            else:
-                coeff_array = util.atleast_2d_col(coeff_array)
-
-        # Slice coeff array.  If only one column of the array is chosen, slicing
-        # will produce a 1d array, which we do not want for matrix
-        # multiplication.  So use atleast_2d_col method to force it to be a
-        # column vector.
-        if coeff_array_col_indices is not None:
-            coeff_array = util.atleast_2d_col(
-                coeff_array[:, coeff_array_col_indices])
-
-        # Check dimensions of coeff array
-        if num_bases != coeff_array.shape[0]:
-            raise ValueError((
-                'Number of coeff_array rows (%d) does not equal number of '
-                'basis handles (%d)') % (coeff_array.shape[0], num_bases))
-        if num_sums != coeff_array.shape[1]:
-            raise ValueError((
-                'Number of coeff_array cols (%d) does not equal number of '
-                'output handles (%d)') % (coeff_array.shape[1], num_sums))
+        coeff_array = self._format_coeff_array(
+            coeff_array, num_bases, num_sums,
+            coeff_array_col_indices=coeff_array_col_indices)
 
         # Burn the first operations to allow for slow imports
-        test_vec_burn = basis_vec_handles[0].get()
+        test_vec_burn = self._get_vecs(basis_vec_handles[:1])[0]
         test_vec_burn_3 = test_vec_burn + 2. * test_vec_burn
         del test_vec_burn, test_vec_burn_3
 
         # Time get method
         start_time = time()
-        test_vec = basis_vec_handles[0].get()
+        test_vec = self._get_vecs(basis_vec_handles[:1])[0]
         get_time = time() - start_time
 
         # Time vector space operations
         start_time = time()
         test_vec_3 = test_vec + 2.*test_vec
         add_scale_time = time() - start_time
+
+        # Use the size of the vecs to find how many fit in memory
+        self._set_max_vecs_from_nbytes(util.get_nbytes(test_vec))
         del test_vec, test_vec_3
 
+        # Choose the number of sums and bases each proc has in memory at once.
+        # The sums play the role of rows, since all of the bases must be
+        # retrieved again for each chunk of sums.
+        self.chunk_plan = self.compute_chunk_plan(
+            num_sums, num_bases, rows_are_put=True)
+        num_bases_per_proc_chunk = self.chunk_plan.num_cols_per_proc_chunk
+        num_sums_per_proc_chunk = self.chunk_plan.num_rows_per_proc_chunk
+
         # Estimate time for all linear combinations
-        vecs_per_worker = (
-            self.max_vecs_per_node * parallel.get_num_nodes() /
-            parallel.get_num_MPI_workers())
-        num_gets = (
-            num_sums /
-            (parallel.get_num_MPI_workers()* (vecs_per_worker - 2)) +
-            num_bases / parallel.get_num_MPI_workers())
+        num_gets = self.chunk_plan.num_col_gets_per_proc
         num_add_scales = num_sums * num_bases / parallel.get_num_MPI_workers()
         self.print_msg(
             'Linear combinations will take at least %.1f minutes' %
             (num_gets * get_time / 60. + num_add_scales * add_scale_time / 60.))
 
-        # Convenience variable
+        # Convenience variables
         rank = parallel.get_rank()
+        num_procs = parallel.get_num_procs()
 
-        # num_bases_per_proc_chunk is the num of bases each proc gets at once.
-        num_bases_per_proc_chunk = 1
-        num_sums_per_proc_chunk = (
-            self.max_vecs_per_proc - num_bases_per_proc_chunk)
+        # Basis vecs are passed around a ring of MPI workers.  Figure out with
+        # whom to communicate and create unique tags based on ranks.
+        dest = (rank + 1) % num_procs
+        source = (rank - 1) % num_procs
+        send_tag = rank * (num_procs + 1) + dest
+        recv_tag = source * (num_procs + 1) + rank
 
         # Divide up tasks
         basis_tasks = parallel.find_assignments(list(range(num_bases)))
         sum_tasks = parallel.find_assignments(list(range(num_sums)))
 
-        # Find max number tasks among all processors
-        max_num_basis_tasks = max([len(tasks) for tasks in basis_tasks])
-        max_num_sum_tasks = max([len(tasks) for tasks in sum_tasks])
-
         # These variables are the number of iters through loops that get and put
         # basis and sum vecs.
-        num_basis_get_iters = int(np.ceil(
-            max_num_basis_tasks*1./num_bases_per_proc_chunk))
-        num_sum_put_iters = int(np.ceil(
-            max_num_sum_tasks*1./num_sums_per_proc_chunk))
+        num_basis_get_iters = self.chunk_plan.num_col_chunks
+        num_sum_put_iters = self.chunk_plan.num_row_chunks
         if num_sum_put_iters > 1:
             self.print_msg((
                 'Warning: The basis vecs, of which there are %d, will be '
@@ -958,110 +3337,175 @@ class VectorSpaceHandles(object):
                 'nodes or max_vecs_per_node to reduce redundant retrieves and '
                 'get a big speedup.') % (num_bases, num_sum_put_iters))
 
-        for sum_put_index in range(num_sum_put_iters):
-            if len(sum_tasks[rank]) > 0:
-                start_sum_index = min(
-                    sum_tasks[rank][0] + (
-                        sum_put_index * num_sums_per_proc_chunk),
-                    sum_tasks[rank][-1] + 1)
-                end_sum_index = min(
-                    start_sum_index + num_sums_per_proc_chunk,
-                    sum_tasks[rank][-1] + 1)
+        # Find the chunks of sums and bases this proc is responsible for.  All
+        # of the basis chunks are retrieved for each chunk of sums.
+        sum_chunk_bounds = _find_chunk_bounds(
+            sum_tasks[rank], num_sums_per_proc_chunk, num_sum_put_iters)
+        basis_chunk_bounds = _find_chunk_bounds(
+            basis_tasks[rank], num_bases_per_proc_chunk, num_basis_get_iters)
+        vec_chunks = self._iter_vec_chunks([
+            basis_vec_handles[start_basis_index:end_basis_index]
+            for sum_chunk in sum_chunk_bounds
+            for start_basis_index, end_basis_index in basis_chunk_bounds])
+
+        # Sums of numpy arrays are computed with matrix products, reusing the
+        # buffer into which the basis arrays are stacked
+        array_combiner = _ArrayLinCombiner()
+        progress = _ProgressTracker(
+            self, 'lin_combine', num_sums * num_bases, 'linear combinations')
+
+        # Sums are put in background threads if writing behind
+        if self.write_behind:
+            put_queue = _PutQueue(
+                self._put_vecs, self.write_behind, num_sums_per_proc_chunk)
+            put_vecs = put_queue.put
+        else:
+            put_vecs = self._put_vecs
 
+        try:
+            for start_sum_index, end_sum_index in sum_chunk_bounds:
                 # Create empty list on each processor
                 sum_layers = [None] * (end_sum_index - start_sum_index)
-            else:
-                start_sum_index = 0
-                end_sum_index = 0
-                sum_layers = []
-
-            for basis_get_index in range(num_basis_get_iters):
-                if len(basis_tasks[rank]) > 0:
-                    start_basis_index = min(
-                        basis_tasks[rank][0] +(
-                            basis_get_index*num_bases_per_proc_chunk),
-                        basis_tasks[rank][-1] + 1)
-                    end_basis_index = min(
-                        start_basis_index + num_bases_per_proc_chunk,
-                        basis_tasks[rank][-1] + 1)
-                    basis_indices = list(range(
-                        start_basis_index, end_basis_index))
-                else:
-                    basis_indices = []
 
-                # Pass the basis vecs to proc with rank -> mod(rank+1,num_procs)
-                # Must do this for each processor, until data makes a circle
-                basis_vecs_recv = (None, None)
-                for pass_index in range(parallel.get_num_procs()):
-                    # If on the first pass, retrieve the basis vecs,
+                for start_basis_index, end_basis_index in basis_chunk_bounds:
+                    basis_indices = list(
+                        range(start_basis_index, end_basis_index))
+
+                    # Pass the basis vecs to proc with rank ->
+                    # mod(rank+1,num_procs).  Must do this for each processor,
+                    # until data makes a circle.  On the first pass, retrieve
+                    # the basis vecs.  In serial, the loop iterates once, with
                     # no send/recv.
-                    # This is all that is called when in serial,
-                    # loop iterates once.
-                    if pass_index == 0:
-                        if len(basis_indices) > 0:
-                            basis_vecs = [
-                                basis_handle.get() for basis_handle in
-                                basis_vec_handles[
-                                    basis_indices[0]:basis_indices[-1] + 1]]
-                        else:
-                            basis_vecs = []
-                    else:
-                        # Figure out with whom to communicate
-                        source = (
-                            parallel.get_rank() - 1) % parallel.get_num_procs()
-                        dest = (
-                            parallel.get_rank() + 1) % parallel.get_num_procs()
-
-                        #Create unique tags based on ranks
-                        send_tag = (
-                            parallel.get_rank() *
-                            (parallel.get_num_procs() + 1) + dest)
-                        recv_tag = source * (
-                            parallel.get_num_procs() + 1) + parallel.get_rank()
-
-                        # Send/receive data
-                        basis_vecs_send = (basis_vecs, basis_indices)
-                        request = parallel.comm.isend(
-                            basis_vecs_send, dest=dest, tag=send_tag)
-                        basis_vecs_recv = parallel.comm.recv(
-                            source=source, tag=recv_tag)
-                        request.Wait()
-                        parallel.barrier()
-                        basis_indices = basis_vecs_recv[1]
-                        basis_vecs = basis_vecs_recv[0]
-
-                    # Compute the scalar multiplications for this set of data.
-                    # basis_indices stores the indices of the coeff_array to
-                    # use.
-                    for sum_index in range(start_sum_index, end_sum_index):
-                        for basis_index, basis_vec in enumerate(basis_vecs):
-                            sum_layer = basis_vec * coeff_array[
-                                    basis_indices[basis_index], sum_index]
-                            if sum_layers[sum_index - start_sum_index] is None:
-                                sum_layers[
-                                    sum_index-start_sum_index] = sum_layer
-                            else:
-                                sum_layers[
-                                    sum_index - start_sum_index] += sum_layer
-                        if (
-                            (time() - self.prev_print_time) >
-                            self.print_interval):
-                            self.print_msg(
-                                'Completed %.1f%% of linear combinations' %
-                                (sum_index * 100. / len(sum_tasks[rank])),
-                                output_channel='stderr')
-                            self.prev_print_time = time()
-
-            # Completed this set of sum vecs, puts them to memory or file
-            for sum_index in range(start_sum_index, end_sum_index):
-                sum_vec_handles[sum_index].put(
-                    sum_layers[sum_index - start_sum_index])
-            del sum_layers
+                    basis_vecs = next(vec_chunks)
+                    for pass_index in range(num_procs):
+                        # Start passing the basis vecs on, except on the last
+                        # pass.  The next basis vecs are received while the
+                        # current ones are scaled and added.
+                        if pass_index < num_procs - 1:
+                            exchange = self._start_exchange_vecs(
+                                basis_vecs, basis_indices, dest, source,
+                                send_tag, recv_tag)
+
+                        # Compute the scalar multiplications for this set of
+                        # data.  basis_indices stores the indices of the
+                        # coeff_array to use.
+                        if len(sum_layers) > 0 and len(basis_vecs) > 0:
+                            layer_coeff_array = coeff_array[
+                                basis_indices, start_sum_index:end_sum_index]
+                            with self.perf_stats.timer('arithmetic_time'):
+                                if array_combiner.can_combine(
+                                    sum_layers, basis_vecs):
+                                    sum_layers = array_combiner(
+                                        sum_layers, basis_vecs,
+                                        layer_coeff_array)
+                                else:
+                                    sum_layers = self._add_to_sum_layers(
+                                        sum_layers, basis_vecs,
+                                        layer_coeff_array)
+                            progress.add(len(sum_layers) * len(basis_vecs))
+
+                        # Finish receiving the basis vecs for the next pass
+                        if pass_index < num_procs - 1:
+                            basis_vecs, basis_indices = exchange.wait()
+                    del basis_vecs
+
+                # Completed this set of sum vecs, puts them to memory or file
+                put_vecs(
+                    sum_vec_handles[start_sum_index:end_sum_index], sum_layers)
+                del sum_layers
+        except BaseException:
+            # Stop the threads, without hiding the original error
+            if self.write_behind:
+                put_queue.close(raise_errors=False)
+            raise
+
+        # Wait for the remaining sums to be put
+        if self.write_behind:
+            put_queue.close()
+
+        progress.finish()
+        self._barrier()
+
+
+    def _format_coeff_array(
+        self, coeff_array, num_bases, num_sums, coeff_array_col_indices=None):
+        """Returns the coefficient array for :py:meth:`lin_combine` as a 2D
+        array with only the columns in ``coeff_array_col_indices``, and checks
+        that its shape matches the numbers of basis and sum vectors."""
+        # Force coefficients to be array
+        coeff_array = np.array(coeff_array)
 
-        self.print_msg(
-            'Completed 100% of linear combinations', output_channel='stderr')
-        self.prev_print_time = time()
-        parallel.barrier()
+        # Check for 1d coefficient arrays
+        if coeff_array.ndim < 2:
+
+            # If there is only one basis vector, then force the coefficient
+            # array to be a row vector.
+            if num_bases == 1:
+                coeff_array = util.atleast_2d_row(coeff_array)
+
+            # Otherwise, force it to be a column vector.
+            else:
+                coeff_array = util.atleast_2d_col(coeff_array)
+
+        # Slice coeff array.  If only one column of the array is chosen, slicing
+        # will produce a 1d array, which we do not want for matrix
+        # multiplication.  So use atleast_2d_col method to force it to be a
+        # column vector.
+        if coeff_array_col_indices is not None:
+            coeff_array = util.atleast_2d_col(
+                coeff_array[:, coeff_array_col_indices])
+
+        # Check dimensions of coeff array
+        if num_bases != coeff_array.shape[0]:
+            raise ValueError((
+                'Number of coeff_array rows (%d) does not equal number of '
+                'basis handles (%d)') % (coeff_array.shape[0], num_bases))
+        if num_sums != coeff_array.shape[1]:
+            raise ValueError((
+                'Number of coeff_array cols (%d) does not equal number of '
+                'output handles (%d)') % (coeff_array.shape[1], num_sums))
+        return coeff_array
+
+
+    @_records_perf_stats
+    def lin_combine_multiple(self, basis_vec_handles, requests):
+        """Computes several sets of linear combinations of the same basis
+        vector objects in one pass, and calls ``put`` on the results, using
+        handles.
+
+        Args:
+            ``basis_vec_handles``: List of handles for the basis vector
+            objects.
+
+            ``requests``: List of ``(sum_vec_handles, coeff_array)`` or
+            ``(sum_vec_handles, coeff_array, coeff_array_col_indices)``
+            tuples, one for each set of sums, with the same meaning as the
+            arguments of :py:meth:`lin_combine`.
+
+        The coefficient arrays are stacked side by side and the sums are
+        computed by a single call to :py:meth:`lin_combine`, so the basis
+        vectors are retrieved as if there were one set of sums, rather than
+        once for each set.  For example, the projected and adjoint DMD modes
+        are built from the same snapshots with::
+
+          vec_space.lin_combine_multiple(vec_handles, [
+              (proj_mode_handles, build_coeffs_proj),
+              (adjoint_mode_handles, build_coeffs_adjoint)])
+        """
+        basis_vec_handles = util.make_iterable(basis_vec_handles)
+        all_sum_vec_handles = []
+        coeff_arrays = []
+        for request in requests:
+            sum_vec_handles = util.make_iterable(request[0])
+            coeff_array_col_indices = None
+            if len(request) > 2:
+                coeff_array_col_indices = request[2]
+            coeff_arrays.append(self._format_coeff_array(
+                request[1], len(basis_vec_handles), len(sum_vec_handles),
+                coeff_array_col_indices=coeff_array_col_indices))
+            all_sum_vec_handles.extend(sum_vec_handles)
+        self.lin_combine(
+            all_sum_vec_handles, basis_vec_handles, np.hstack(coeff_arrays))
 
 
     def __eq__(self, other):